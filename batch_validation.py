@@ -0,0 +1,255 @@
+"""
+Validacion vectorizada de muchas builds candidatas a la vez (busqueda,
+reparacion, evaluacion offline).
+
+Las builds van como matrices NumPy de forma (builds, componentes):
+- prices: precio cotizado de cada componente
+- slots: codigo de slot (SLOT_CODES, OTHER_SLOT; PAD_SLOT = posicion vacia)
+- rows: fila del catalogo (NO_ROW fuera del catalogo, NOT_FOUND_ROW si la URL
+  no existe) para los chequeos de precio real y compatibilidad
+
+validate_builds() calcula totales, multiplicador GPU/CPU, porcentaje del case,
+compatibilidad y la cantidad de errores por build en una pasada, con las
+mismas reglas y la misma aritmetica que validate_build(). Los mensajes de
+error solo se arman con explain() para las builds que se muestran.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from catalog import PRICE_TOLERANCE
+from classifier import classify_name
+from compatibility import PSU_MARGIN, get_compatibility
+from validation import (
+    BUDGET_MARGIN, CASE_MIN_PERCENTAGE, CASE_MAX_PERCENTAGE, ABSOLUTE_MAX_CASE,
+    get_multiplier_range, validate_build
+)
+
+# --- CONSTANTES ---
+SLOT_CODES = {"gpu": 0, "cpu": 1, "case": 2, "motherboard": 3, "ram": 4, "psu": 5}
+OTHER_SLOT = len(SLOT_CODES)
+PAD_SLOT = -1
+NO_ROW = -1
+NOT_FOUND_ROW = -2
+GPU, CPU, CASE = SLOT_CODES["gpu"], SLOT_CODES["cpu"], SLOT_CODES["case"]
+
+
+class BatchColumns:
+    """Columnas NumPy del catalogo: precio, slot, socket, DDR, watts de fuente y consumo."""
+
+    def __init__(self, catalog):
+        compat = get_compatibility(catalog)
+        columns = compat.columns
+        self.prices = np.array(catalog.prices, dtype=np.float64)
+        self.slots = np.full(len(catalog), OTHER_SLOT, dtype=np.int8)
+        for slot, code in SLOT_CODES.items():
+            self.slots[np.array(catalog.sorted_prices(slot)[1], dtype=np.int64)] = code
+        self.sockets = np.array(columns.socket_codes, dtype=np.int16)
+        self.ddr_masks = np.array(columns.ddr_masks, dtype=np.uint8)
+        self.watts = np.array(columns.watts, dtype=np.float64)
+        # Consumo estimado (GPU/CPU) con el que se calcula la fuente requerida
+        self.power = np.zeros(len(catalog), dtype=np.float64)
+        for row, watts in compat.watts.items():
+            self.power[row] = watts
+
+
+@lru_cache(maxsize=4)
+def get_batch_columns(catalog):
+    """Columnas compartidas por proceso, una por indice de catalogo."""
+    return BatchColumns(catalog)
+
+
+def component_code(item, catalog=None):
+    """(codigo de slot, fila) de un componente cotizado, como lo clasifica validate_build()."""
+    row = catalog.find_component(item) if catalog is not None else None
+    if row is not None:
+        return SLOT_CODES.get(catalog.slot(row), OTHER_SLOT), row
+    code = SLOT_CODES.get(classify_name(item.get("name", "")), OTHER_SLOT)
+    cited = item.get("url") or item.get("id") is not None
+    return code, NOT_FOUND_ROW if catalog is not None and cited else NO_ROW
+
+
+def encode_builds(builds, catalog=None):
+    """Listas de componentes (dicts) -> matrices (prices, slots, rows) para validate_builds()."""
+    width = max((len(components) for components in builds), default=0)
+    prices = np.zeros((len(builds), width), dtype=np.float64)
+    slots = np.full((len(builds), width), PAD_SLOT, dtype=np.int8)
+    rows = np.full((len(builds), width), NO_ROW, dtype=np.int64)
+    for i, components in enumerate(builds):
+        for j, item in enumerate(components):
+            prices[i, j] = float(item.get("price", 0))
+            slots[i, j], rows[i, j] = component_code(item, catalog)
+    return prices, slots, rows
+
+
+def catalog_builds(rows, catalog):
+    """Matriz de filas del catalogo (NO_ROW = vacio) -> (prices, slots, rows) a precio de catalogo."""
+    rows = np.asarray(rows, dtype=np.int64)
+    columns = get_batch_columns(catalog)
+    present = rows >= 0
+    safe = np.where(present, rows, 0)
+    prices = np.where(present, columns.prices[safe], 0.0)
+    slots = np.where(present, columns.slots[safe], PAD_SLOT).astype(np.int8)
+    return prices, slots, rows
+
+
+class BatchValidation:
+    """
+    Resultado de validate_builds(): arrays alineados por build.
+    valid, error_counts, total, gpu_price, cpu_price, case_price, multiplier
+    y rules (regla de validate_build() -> mascara de builds que la violan).
+    """
+
+    def __init__(self, budget, prices, slots, rows, catalog, builds=None):
+        self.budget = budget
+        self.prices = prices
+        self.slots = slots
+        self.rows = rows
+        self.catalog = catalog
+        self.builds = builds
+        self.rules = {}
+
+    def __len__(self):
+        return len(self.valid)
+
+    def components(self, i):
+        """Componentes de la build i (los originales si vinieron de encode_builds())."""
+        if self.builds is not None:
+            return self.builds[i]
+        result = []
+        for j in np.flatnonzero(self.slots[i] != PAD_SLOT):
+            row = int(self.rows[i, j])
+            item = {"price": float(self.prices[i, j])}
+            if row >= 0:
+                item.update(name=self.catalog.names[row], url=self.catalog.item(row)["l"])
+            result.append(item)
+        return result
+
+    def explain(self, i):
+        """(es_valida, errores, detalles) de validate_build() para la build i."""
+        return validate_build(self.budget, self.components(i), self.catalog)
+
+
+def _first_in_slot(mask):
+    """Indice del primer componente de cada build que cumple mask, y si existe."""
+    return mask.argmax(axis=1), mask.any(axis=1)
+
+
+def validate_builds(budget, prices, slots, rows=None, catalog=None, builds=None):
+    """
+    Version vectorizada de validate_build() para N builds de hasta K componentes.
+    Sin catalogo (o sin rows) se omiten los chequeos de precio real y de
+    compatibilidad, igual que validate_build(catalog=None).
+    Retorna BatchValidation; error_counts coincide con len(errores) del escalar.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    slots = np.asarray(slots)
+    n, width = prices.shape
+    result = BatchValidation(budget, prices, slots, rows, catalog, builds)
+    rules = result.rules
+    present = slots != PAD_SLOT
+    counts = np.zeros(n, dtype=np.int64)
+
+    # 0. PRECIOS CONTRA EL CATALOGO (uno por componente)
+    if catalog is not None and rows is not None:
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = get_batch_columns(catalog)
+        in_catalog = present & (rows >= 0)
+        safe_rows = np.where(in_catalog, rows, 0)
+        wrong_price = in_catalog & (np.abs(prices - columns.prices[safe_rows]) > PRICE_TOLERANCE)
+        not_found = present & (rows == NOT_FOUND_ROW)
+        rules["PRECIO INCORRECTO"] = wrong_price.any(axis=1)
+        rules["PRODUCTO NO ENCONTRADO"] = not_found.any(axis=1)
+        counts += wrong_price.sum(axis=1) + not_found.sum(axis=1)
+
+    # 1-2. TOTAL Y MARGEN (suma columna a columna: mismo redondeo que sum())
+    total = np.zeros(n, dtype=np.float64)
+    for j in range(width):
+        total += np.where(present[:, j], prices[:, j], 0.0)
+    min_budget = budget * (1 - BUDGET_MARGIN)
+    max_budget = budget * (1 + BUDGET_MARGIN)
+    rules["PRESUPUESTO SUBUTILIZADO"] = total < min_budget
+    rules["PRESUPUESTO EXCEDIDO"] = total > max_budget
+
+    # 3. PRECIOS CRITICOS (el mayor de cada slot)
+    gpu_price = np.where(present & (slots == GPU), prices, 0.0).max(axis=1, initial=0.0)
+    cpu_price = np.where(present & (slots == CPU), prices, 0.0).max(axis=1, initial=0.0)
+    case_price = np.where(present & (slots == CASE), prices, 0.0).max(axis=1, initial=0.0)
+
+    # 4. MULTIPLICADOR GPU/CPU
+    both = (gpu_price > 0) & (cpu_price > 0)
+    multiplier = np.divide(gpu_price, cpu_price, out=np.zeros(n), where=cpu_price > 0)
+    min_m, max_m, critical_m = get_multiplier_range(budget)
+    low = both & (multiplier < min_m)
+    bottleneck = both & ~low & (multiplier > critical_m)
+    rules["DESBALANCE CRITICO"] = low
+    rules["CUELLO DE BOTELLA"] = bottleneck
+    rules["ADVERTENCIA"] = both & ~low & ~bottleneck & (multiplier > max_m)
+    no_gpu = ~both & (gpu_price == 0)
+    no_cpu = ~both & (cpu_price == 0)
+    rules["ERROR CRITICO"] = no_gpu | no_cpu
+    counts += no_gpu.astype(np.int64) + no_cpu
+
+    # 5. CASE 3-5%
+    min_case = budget * CASE_MIN_PERCENTAGE
+    max_case = min(budget * CASE_MAX_PERCENTAGE, ABSOLUTE_MAX_CASE)
+    has_case = case_price > 0
+    rules["CASE SOBREVALORADO"] = has_case & (case_price > max_case)
+    rules["CASE INFRAUTILIZADO"] = has_case & ~rules["CASE SOBREVALORADO"] & (case_price < min_case)
+
+    # 6. COMPATIBILIDAD: primer componente del catalogo de cada slot, como check_build()
+    if catalog is not None and rows is not None:
+        catalog_slots = np.where(in_catalog, columns.slots[safe_rows], PAD_SLOT)
+        picked = {}
+        for slot in ("cpu", "motherboard", "ram", "gpu", "psu"):
+            index, has = _first_in_slot(catalog_slots == SLOT_CODES[slot])
+            picked[slot] = (safe_rows[np.arange(n), index], has)
+        cpu, has_cpu = picked["cpu"]
+        board, has_board = picked["motherboard"]
+        ram, has_ram = picked["ram"]
+        gpu, has_gpu = picked["gpu"]
+        psu, has_psu = picked["psu"]
+
+        cpu_socket, board_socket = columns.sockets[cpu], columns.sockets[board]
+        sockets_known = has_cpu & has_board & (cpu_socket > 0) & (board_socket > 0)
+        cpu_mask, board_mask, ram_mask = columns.ddr_masks[cpu], columns.ddr_masks[board], columns.ddr_masks[ram]
+        rules["INCOMPATIBILIDAD DE SOCKET"] = sockets_known & (cpu_socket != board_socket)
+        rules["INCOMPATIBILIDAD DE MEMORIA"] = (
+            sockets_known & (cpu_socket == board_socket)
+            & (cpu_mask > 0) & (board_mask > 0) & ((cpu_mask & board_mask) == 0)
+        )
+        rules["INCOMPATIBILIDAD DE RAM"] = (
+            has_board & has_ram & (board_mask > 0) & (ram_mask > 0) & ((board_mask & ram_mask) == 0)
+        )
+        required = (np.where(has_gpu, columns.power[gpu], 0.0)
+                    + np.where(has_cpu, columns.power[cpu], 0.0)) * (1 + PSU_MARGIN)
+        available = columns.watts[psu]
+        rules["FUENTE INSUFICIENTE"] = (
+            has_psu & (has_gpu | has_cpu) & (available > 0) & (available < required)
+        )
+
+    for rule in ("PRESUPUESTO SUBUTILIZADO", "PRESUPUESTO EXCEDIDO", "DESBALANCE CRITICO",
+                 "CUELLO DE BOTELLA", "ADVERTENCIA", "CASE SOBREVALORADO", "CASE INFRAUTILIZADO",
+                 "INCOMPATIBILIDAD DE SOCKET", "INCOMPATIBILIDAD DE MEMORIA",
+                 "INCOMPATIBILIDAD DE RAM", "FUENTE INSUFICIENTE"):
+        if rule in rules:
+            counts += rules[rule]
+
+    # Sin componentes: un unico error ("No se proporcionaron componentes...")
+    empty = ~present.any(axis=1)
+    counts = np.where(empty, 1, counts)
+
+    result.total = total
+    result.gpu_price = gpu_price
+    result.cpu_price = cpu_price
+    result.case_price = case_price
+    result.multiplier = multiplier
+    result.error_counts = counts
+    result.valid = counts == 0
+    return result
+
+
+def validate_build_lists(budget, builds, catalog=None):
+    """validate_builds() sobre listas de componentes (dicts), con explain() sobre los originales."""
+    prices, slots, rows = encode_builds(builds, catalog)
+    return validate_builds(budget, prices, slots, rows, catalog, builds=builds)
@@ -0,0 +1,554 @@
+"""
+Benchmark offline del pipeline de cotizacion (sin red ni API key).
+
+Un cliente falso reproduce respuestas grabadas (validas, invalidas o JSON roto)
+con latencia configurable y se mide el overhead de Python por etapa:
+extract_budget -> prompt (solver/retrieval) -> modelo -> parse -> validate -> render.
+
+Uso:
+    python bench.py --turns 200 --latency 0.05
+    python bench.py --scenario retry --no-solver --streaming
+    python bench.py --conversation --scenario retry [--no-compact]   # crecimiento del historial
+    python bench.py --burst 64 --latency 0.2 [--no-pool]   # rafaga contra un proveedor con 429
+    python bench.py --validate-batch 20000   # validate_build() vs validate_builds() (NumPy)
+    python bench.py --prefetch 10 --latency 0.5 --think 1.0 [--no-prefetch]   # respuesta "solo torre"
+    python bench.py --recorded respuestas.jsonl   # una respuesta por linea: {"text": "..."}
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from catalog import get_catalog_index
+from validation import MAX_RETRIES, extract_budget, validate_build
+from solver import PC_TYPE_SLOTS, slot_candidates, solve_builds
+from batch_validation import NO_ROW, catalog_builds, validate_builds
+from engine import StageTimer, detect_pc_type, run_quote_turn
+from quote_cache import QuoteCache, quote_cache_key
+from history import HISTORY_TOKEN_BUDGET, history_tokens
+from llm_client import RATE_LIMIT_RETRIES, FairLimiter, Overloaded, PooledClient, is_rate_limited
+from prefetch import Prefetcher
+
+# --- CONSTANTES ---
+DEFAULT_PROMPTS = (
+    "Tengo 3000 soles para solo torre gamer",
+    "Hola, necesito una PC completa con S/ 6000 para edicion de video",
+    "Presupuesto 4500 soles, solo torre para jugar y streamear",
+    "Quiero una PC completa de 9000 soles",
+    "Tengo S/ 12,000 para una torre de alto rendimiento",
+)
+# Respuestas del modelo falso por turno segun escenario
+SCENARIOS = {
+    "valid": ("valid",),
+    "retry": ("invalid", "valid"),
+    "malformed": ("malformed", "valid"),
+    "exhausted": ("invalid",) * MAX_RETRIES,
+}
+STREAM_CHUNK_SIZE = 40  # caracteres por chunk en modo streaming
+PROVIDER_LIMIT = 8  # llamadas simultaneas que acepta el proveedor falso antes de responder 429
+
+
+# --- CLIENTE FALSO ---
+class StubUsage:
+    def __init__(self, prompt, text):
+        self.prompt_token_count = len(prompt) // 4
+        self.cached_content_token_count = 0
+        self.candidates_token_count = len(text) // 4
+
+
+class StubResponse:
+    def __init__(self, prompt, text):
+        self.text = text
+        self.usage_metadata = StubUsage(prompt, text)
+
+
+class StubConfig:
+    """Imita GenerateContentConfig.model_copy() usado por la carrera especulativa."""
+
+    def model_copy(self, update=None):
+        return self
+
+
+class StubRateLimitError(Exception):
+    code = 429
+
+
+class StubScript:
+    """Cola de respuestas compartida por todos los chats del cliente."""
+
+    def __init__(self, latency=0.0, jitter=0.0, provider_limit=None):
+        self.queue = []
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self.provider_limit = provider_limit
+        self.active = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        """Por encima de provider_limit llamadas simultaneas el proveedor responde 429."""
+        with self.lock:
+            if self.provider_limit and self.active >= self.provider_limit:
+                self.rejected += 1
+                raise StubRateLimitError("429 RESOURCE_EXHAUSTED")
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def next(self, prompt):
+        self.calls += 1
+        text = self.queue.pop(0) if self.queue else '{"is_quote": false, "message": "ok"}'
+        return text
+
+    def delay(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+
+class SolverScript(StubScript):
+    """Sin cola: a las builds del solver responde con una opcion redactada por build."""
+
+    def next(self, prompt):
+        with self.lock:
+            self.calls += 1
+        if "COTIZACIONES PRE-VALIDADAS" not in prompt:
+            return '{"is_quote": false, "message": "ok"}'
+        quotes = [{"title": f"Opcion {i + 1}", "strategy": "Balance GPU/CPU", "components": []}
+                  for i in range(prompt.count("\nBUILD "))]
+        return json.dumps({"is_quote": True, "needs_info": False, "message": "Opciones:", "quotes": quotes})
+
+
+class StubChat:
+    def __init__(self, script, history=None):
+        self.script = script
+        self.history = list(history or [])
+
+    def _record(self, prompt, text):
+        self.history.append({"role": "user", "parts": [{"text": prompt}]})
+        self.history.append({"role": "model", "parts": [{"text": text}]})
+
+    def send_message(self, prompt):
+        with self.script.slot():
+            time.sleep(self.script.delay())
+            text = self.script.next(prompt)
+        self._record(prompt, text)
+        return StubResponse(prompt, text)
+
+    def send_message_stream(self, prompt):
+        text = self.script.next(prompt)
+        chunks = [text[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(text), STREAM_CHUNK_SIZE)] or [""]
+        per_chunk = self.script.delay() / len(chunks)
+        for chunk in chunks:
+            time.sleep(per_chunk)
+            yield StubResponse(prompt, chunk)
+        self._record(prompt, text)
+
+    def get_history(self):
+        return list(self.history)
+
+
+class StubAsyncChat(StubChat):
+    async def send_message(self, prompt):
+        await asyncio.sleep(self.script.delay())
+        text = self.script.next(prompt)
+        self._record(prompt, text)
+        return StubResponse(prompt, text)
+
+
+class StubChats:
+    def __init__(self, script, chat_class):
+        self.script = script
+        self.chat_class = chat_class
+
+    def create(self, model=None, config=None, history=None):
+        return self.chat_class(self.script, history)
+
+
+class StubAio:
+    def __init__(self, script):
+        self.chats = StubChats(script, StubAsyncChat)
+
+
+class StubClient:
+    """Reemplazo de genai.Client: mismas llamadas, respuestas de StubScript."""
+
+    def __init__(self, script):
+        self.script = script
+        self.chats = StubChats(script, StubChat)
+        self.aio = StubAio(script)
+
+
+# --- RESPUESTAS SINTETICAS ---
+def synthetic_responses(catalog, budget, pc_type):
+    """Respuestas tipo del modelo para un presupuesto: valida, invalida y JSON roto."""
+    builds = solve_builds(budget, pc_type, catalog) if budget and pc_type else []
+    quotes = []
+    for i, build in enumerate(builds):
+        quotes.append({
+            "title": f"Opcion {i + 1}",
+            "strategy": "Balance GPU/CPU",
+            "components": [
+                {"name": c["name"], "price": c["price"], "url": c["url"], "insight": "Buen precio"}
+                for c in build["components"]
+            ],
+        })
+    valid = {"is_quote": True, "needs_info": False, "message": "Aqui tienes tus opciones:", "quotes": quotes}
+    invalid = json.loads(json.dumps(valid))
+    for quote in invalid["quotes"]:
+        for item in quote["components"]:
+            item["price"] = round(item["price"] * 1.15, 2)  # precios inventados
+    valid_text = json.dumps(valid, ensure_ascii=False)
+    return {
+        "valid": valid_text,
+        "invalid": json.dumps(invalid, ensure_ascii=False),
+        "malformed": valid_text[:len(valid_text) // 2],
+    }
+
+
+def load_recorded(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+# --- REPORTE ---
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(samples, attempts, failures, elapsed, history_sizes=()):
+    stages = {}
+    for timer in samples:
+        for name, total in timer.totals.items():
+            stages.setdefault(name, []).append(total * 1000)
+    return {
+        "turns": len(attempts),
+        "elapsed_s": elapsed,
+        "throughput_tps": len(attempts) / elapsed if elapsed else 0.0,
+        "mean_attempts": sum(attempts) / len(attempts) if attempts else 0.0,
+        "failures": failures,
+        "stages_ms": {
+            name: {
+                "mean": sum(v) / len(v),
+                "p50": percentile(v, 50),
+                "p99": percentile(v, 99),
+                "max": max(v),
+            }
+            for name, v in sorted(stages.items())
+        },
+        "history_tokens": {
+            "mean": sum(history_sizes) / len(history_sizes),
+            "max": max(history_sizes),
+            "last": history_sizes[-1],
+        } if history_sizes else None,
+    }
+
+
+def print_report(report):
+    print(f"turnos: {report['turns']}  tiempo: {report['elapsed_s']:.2f} s  "
+          f"throughput: {report['throughput_tps']:.1f} turnos/s")
+    print(f"intentos promedio: {report['mean_attempts']:.2f}  fallidos: {report['failures']}")
+    print(f"{'etapa':<16}{'media ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, s in report["stages_ms"].items():
+        print(f"{name:<16}{s['mean']:>10.3f}{s['p50']:>10.3f}{s['p99']:>10.3f}{s['max']:>10.3f}")
+    if report.get("history_tokens"):
+        h = report["history_tokens"]
+        print(f"historial (tokens estimados): media {h['mean']:.0f}  max {h['max']}  ultimo turno {h['last']}")
+
+
+# --- BENCHMARK ---
+def run_benchmark(turns=100, scenario="valid", latency=0.0, jitter=0.0, streaming=False,
+                  candidates=1, use_solver=True, retry_delay=0.0, use_quote_cache=False,
+                  recorded=None, prompts=DEFAULT_PROMPTS, conversation=False,
+                  history_budget=HISTORY_TOKEN_BUDGET, repair=True):
+    """
+    conversation: todos los turnos en un mismo chat (mide el crecimiento del historial);
+    history_budget None desactiva la compactacion.
+    """
+    catalog = get_catalog_index()
+    script = StubScript(latency, jitter)
+    client = StubClient(script)
+    config = StubConfig()
+    quote_cache = QuoteCache() if use_quote_cache else None
+
+    fixtures = {}
+    samples = []
+    attempts = []
+    failures = 0
+    history_sizes = []
+    chat_session = client.chats.create()
+    start = time.perf_counter()
+    for i in range(turns):
+        prompt = prompts[i % len(prompts)]
+        timer = StageTimer()
+        with timer.stage("extract_budget"):
+            budget = extract_budget(prompt)
+            pc_type = detect_pc_type(prompt)
+
+        # Respuestas que "devolvera el modelo" en este turno
+        if recorded:
+            script.queue = [recorded[i % len(recorded)]] * MAX_RETRIES
+        else:
+            if budget not in fixtures:
+                fixtures[budget] = synthetic_responses(catalog, budget, pc_type)
+            script.queue = [fixtures[budget][kind] for kind in SCENARIOS[scenario]]
+
+        cache_key = quote_cache_key(prompt, budget, pc_type, catalog.content_hash) if quote_cache is not None else None
+        try:
+            with timer.stage("turn"):
+                turn = run_quote_turn(
+                    client, "stub-model", chat_session if conversation else client.chats.create(),
+                    config, prompt, budget, pc_type, catalog,
+                    quote_cache=quote_cache, cache_key=cache_key, timer=timer, streaming=streaming,
+                    candidates=candidates, retry_delay=retry_delay, use_solver=use_solver,
+                    history_budget=history_budget, repair=repair
+                )
+            if conversation:
+                chat_session = turn.chat_session
+                history_sizes.append(history_tokens(chat_session.get_history()))
+            attempts.append(turn.attempts)
+            failures += not turn.is_valid
+        except json.JSONDecodeError:
+            attempts.append(MAX_RETRIES - len(script.queue))
+            failures += 1
+        samples.append(timer)
+
+    return summarize(samples, attempts, failures, time.perf_counter() - start, history_sizes)
+
+
+def run_burst(requests=64, latency=0.2, provider_limit=PROVIDER_LIMIT, distinct=16, use_pool=True):
+    """
+    Rafaga de llamadas simultaneas (distinct prompts distintos, el resto
+    repetidos) contra un proveedor que responde 429 por encima de
+    provider_limit. Sin pool cada llamada reintenta los 429 con backoff por su
+    cuenta; con pool pasan por el limitador y el single-flight de llm_client.
+    """
+    script = StubScript(latency, provider_limit=provider_limit)
+    client = StubClient(script)
+    if use_pool:
+        client = PooledClient(client, FairLimiter(provider_limit, requests, timeout=60))
+    prompts = [f"Tengo {3000 + 100 * (i % distinct)} soles para solo torre gamer" for i in range(requests)]
+    barrier = threading.Barrier(requests)
+
+    def call(prompt):
+        chat = client.chats.create(model="stub-model", config=StubConfig())
+        barrier.wait()
+        start = time.perf_counter()
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            try:
+                chat.send_message(prompt)
+                return time.perf_counter() - start
+            except Overloaded:
+                return None
+            except Exception as e:
+                if use_pool or attempt == RATE_LIMIT_RETRIES or not is_rate_limited(e):
+                    return None
+                time.sleep(latency * 2 ** attempt * random.uniform(0.8, 1.2))
+        return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(requests) as pool:
+        latencies = list(pool.map(call, prompts))
+    done = [v * 1000 for v in latencies if v is not None]
+    return {
+        "requests": requests,
+        "completed": len(done),
+        "failed": requests - len(done),
+        "api_calls": script.calls,
+        "rate_limited": script.rejected,
+        "elapsed_s": time.perf_counter() - start,
+        "latency_ms": {"p50": percentile(done, 50), "p99": percentile(done, 99)},
+    }
+
+
+def print_burst_report(report):
+    print(f"rafaga: {report['requests']} llamadas  completadas: {report['completed']}  "
+          f"fallidas: {report['failed']}  tiempo: {report['elapsed_s']:.2f} s")
+    print(f"llamadas a la API: {report['api_calls']}  respuestas 429: {report['rate_limited']}  "
+          f"latencia p50 {report['latency_ms']['p50']:.0f} ms  p99 {report['latency_ms']['p99']:.0f} ms")
+
+
+def run_validation_batch(builds=20000, budget=6000):
+    """
+    Evaluacion offline: builds del solver con un componente cambiado al azar,
+    validadas una por una con validate_build() y juntas con validate_builds().
+    mismatches cuenta las builds donde validez o cantidad de errores difieren.
+    """
+    catalog = get_catalog_index()
+    candidates = slot_candidates(catalog)
+    base = [b["components"] for pc_type in PC_TYPE_SLOTS for b in solve_builds(budget, pc_type, catalog)]
+    rng = random.Random(0)
+    rows = np.full((builds, max(len(components) for components in base)), NO_ROW, dtype=np.int64)
+    for i in range(builds):
+        components = base[i % len(base)]
+        for j, item in enumerate(components):
+            rows[i, j] = catalog.find_component(item)
+        if i >= len(base):
+            j = rng.randrange(len(components))
+            slot_rows = candidates[catalog.slot(int(rows[i, j]))][1]
+            rows[i, j] = slot_rows[rng.randrange(len(slot_rows))]
+
+    start = time.perf_counter()
+    batch = validate_builds(budget, *catalog_builds(rows, catalog), catalog=catalog)
+    batch_s = time.perf_counter() - start
+
+    components = [batch.components(i) for i in range(builds)]
+    start = time.perf_counter()
+    scalar = [validate_build(budget, c, catalog) for c in components]
+    scalar_s = time.perf_counter() - start
+
+    mismatches = sum(
+        valid != batch.valid[i] or len(errors) != batch.error_counts[i]
+        for i, (valid, errors, _) in enumerate(scalar)
+    )
+    return {
+        "builds": builds,
+        "valid": int(batch.valid.sum()),
+        "scalar_ms": scalar_s * 1000,
+        "batch_ms": batch_s * 1000,
+        "speedup": scalar_s / batch_s if batch_s else 0.0,
+        "mismatches": mismatches,
+    }
+
+
+def run_prefetch(conversations=10, latency=0.5, think=1.0, use_prefetch=True):
+    """
+    Conversaciones simultaneas que dan el presupuesto, tardan `think` segundos
+    en responder "solo torre" y reciben la cotizacion. Mide la latencia de ese
+    ultimo turno y las llamadas a la API (el prefetch genera las dos opciones).
+    """
+    catalog = get_catalog_index()
+    script = SolverScript(latency)
+    client = PooledClient(StubClient(script), FairLimiter(timeout=60))
+    prefetcher = Prefetcher(client.limiter) if use_prefetch else None
+    barrier = threading.Barrier(conversations)
+
+    def converse(i):
+        budget = 3000 + 500 * (i % 10)
+        chat = client.chats.create(model="stub-model", config=StubConfig())
+        barrier.wait()
+        if prefetcher is not None:
+            def run(pc_type, on_progress):
+                fork = client.chats.create(model="stub-model", config=StubConfig(), history=chat.get_history())
+                return run_quote_turn(client, "stub-model", fork, StubConfig(), pc_type, budget, pc_type,
+                                      catalog, on_progress=on_progress, streaming=True, candidates=1,
+                                      max_attempts=1, retry_delay=0, fast_path=False)
+            prefetcher.schedule(i, budget, catalog.content_hash, run)
+        time.sleep(think)
+        start = time.perf_counter()
+        prefetched = None
+        if prefetcher is not None:
+            prefetched = prefetcher.take(i, budget, "Solo Torre", catalog.content_hash)
+        turn = run_quote_turn(client, "stub-model", chat, StubConfig(), "solo torre", budget, "Solo Torre",
+                              catalog, retry_delay=0, prefetched=prefetched)
+        return time.perf_counter() - start, turn.prefetched, turn.is_valid
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(conversations) as pool:
+        results = list(pool.map(converse, range(conversations)))
+    latencies = [r[0] * 1000 for r in results]
+    return {
+        "conversations": conversations,
+        "prefetch": use_prefetch,
+        "served_prefetched": sum(r[1] for r in results),
+        "valid": sum(r[2] for r in results),
+        "api_calls": script.calls,
+        "elapsed_s": time.perf_counter() - start,
+        "answer_latency_ms": {"p50": percentile(latencies, 50), "p99": percentile(latencies, 99)},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline del cotizador Kiwigeek")
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="valid")
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos por llamada al modelo")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--candidates", type=int, default=1, help="K de la carrera especulativa")
+    parser.add_argument("--no-solver", action="store_true", help="el modelo elige los componentes")
+    parser.add_argument("--retry-delay", type=float, default=0.0)
+    parser.add_argument("--quote-cache", action="store_true")
+    parser.add_argument("--recorded", help="JSONL con respuestas grabadas ({\"text\": ...})")
+    parser.add_argument("--conversation", action="store_true", help="todos los turnos en un mismo chat")
+    parser.add_argument("--no-compact", action="store_true", help="sin compactar el historial")
+    parser.add_argument("--no-repair", action="store_true", help="sin reparacion local antes del reintento")
+    parser.add_argument("--burst", type=int, default=0, help="N llamadas simultaneas contra un proveedor con 429")
+    parser.add_argument("--no-pool", action="store_true", help="rafaga sin limitador ni single-flight")
+    parser.add_argument("--validate-batch", type=int, default=0, help="N builds: validacion escalar vs NumPy")
+    parser.add_argument("--prefetch", type=int, default=0, help="N conversaciones que responden el tipo de PC")
+    parser.add_argument("--think", type=float, default=1.0, help="segundos que tarda el usuario en responder")
+    parser.add_argument("--no-prefetch", action="store_true", help="sin cotizaciones especulativas")
+    parser.add_argument("--json", action="store_true", help="reporte en JSON")
+    args = parser.parse_args(argv)
+
+    if args.prefetch:
+        report = run_prefetch(args.prefetch, args.latency, args.think, use_prefetch=not args.no_prefetch)
+        if args.json:
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            print(f"conversaciones: {report['conversations']}  servidas por prefetch: "
+                  f"{report['served_prefetched']}  validas: {report['valid']}  "
+                  f"llamadas a la API: {report['api_calls']}")
+            print(f"latencia del turno 'solo torre': p50 {report['answer_latency_ms']['p50']:.0f} ms  "
+                  f"p99 {report['answer_latency_ms']['p99']:.0f} ms")
+        return
+
+    if args.validate_batch:
+        report = run_validation_batch(args.validate_batch)
+        if args.json:
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            print(f"builds: {report['builds']}  validas: {report['valid']}  "
+                  f"escalar: {report['scalar_ms']:.1f} ms  NumPy: {report['batch_ms']:.1f} ms  "
+                  f"({report['speedup']:.0f}x)  diferencias: {report['mismatches']}")
+        return
+
+    if args.burst:
+        report = run_burst(args.burst, args.latency, use_pool=not args.no_pool)
+        if args.json:
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            print_burst_report(report)
+        return
+
+    report = run_benchmark(
+        turns=args.turns,
+        scenario=args.scenario,
+        latency=args.latency,
+        jitter=args.jitter,
+        streaming=args.streaming,
+        candidates=args.candidates,
+        use_solver=not args.no_solver,
+        retry_delay=args.retry_delay,
+        use_quote_cache=args.quote_cache,
+        recorded=load_recorded(args.recorded) if args.recorded else None,
+        conversation=args.conversation,
+        history_budget=None if args.no_compact else HISTORY_TOKEN_BUDGET,
+        repair=not args.no_repair,
+    )
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
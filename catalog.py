@@ -0,0 +1,310 @@
+import os
+import json
+import struct
+import hashlib
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from urllib.parse import urlparse
+
+from snapshot import SortedLookup, snapshot_path, read_snapshot, write_snapshot
+
+# --- CONSTANTES ---
+CATALOG_PATH = 'catalogo_kiwigeek.json'
+PRICE_TOLERANCE = 1.0  # S/1 de tolerancia por redondeo del modelo
+
+# Categorias del catalogo agrupadas por tipo de componente (slot)
+SLOT_CATEGORIES = {
+    "gpu": ("GPU / PLACA DE VIDEO",),
+    "cpu": ("CPU / PROCESADOR (AMD)", "CPU / PROCESADOR (INTEL)"),
+    "motherboard": ("PLACA MADRE (AMD)", "PLACA MADRE (INTEL)"),
+    "ram": ("MEMORIA RAM (MEMORIA RAM COMPUTADORA)",),
+    "storage": ("ALMACENAMIENTO INTERNO (SSD INTERNO (NVME / SATA))",),
+    "psu": ("FUENTE DE ALIMENTACIÓN",),
+    "case": ("CASES / GABINETES (GABINETE DE COMPUTADORA)",),
+    "cooler": (
+        "VENTILADORES Y ENFRIAMIENTO PC (REFRIGERACIÓN LÍQUIDA)",
+        "VENTILADORES Y ENFRIAMIENTO PC (REFRIGERACIÓN CPU)",
+    ),
+    "monitor": ("MONITORES Y ACCESORIOS (MONITOR GAMER)",),
+    "keyboard": ("TECLADO Y MOUSE / GAMING (TECLADO GAMER)",),
+    "mouse": ("TECLADO Y MOUSE / GAMING (MOUSE GAMER)",),
+    "headset": ("AURICULARES GAMER",),
+}
+
+CATEGORY_SLOT = {c: slot for slot, cats in SLOT_CATEGORIES.items() for c in cats}
+
+
+def url_slug(url):
+    """
+    Normaliza una URL de producto a su slug.
+    "https://kiwigeekperu.com/product/rtx-4060/" -> "rtx-4060"
+    Retorna "" si la URL no tiene slug.
+    """
+    if not url:
+        return ""
+    path = urlparse(url.strip()).path if "://" in url else url.strip()
+    parts = [p for p in path.split('/') if p]
+    return parts[-1].lower() if parts else ""
+
+
+class CatalogIndex:
+    """
+    Indice en memoria del catalogo con columnas compactas.
+
+    - ids, category_codes, prices: arrays tipados (una fila por producto)
+    - slugs, names, specs: tuplas de strings alineadas por fila
+    - Busqueda O(1) por id y por URL (slug)
+    - content_hash: sha256 del archivo, identifica la version del catalogo
+    - Por categoria y por slot: precios ordenados + filas para consultas
+      de rango con bisect
+    - from_columns(): mismas columnas sobre un snapshot mmap (snapshot.py),
+      sin copiar datos; las busquedas usan bisect sobre claves ordenadas
+    """
+
+    def __init__(self, items, content_hash=""):
+        self.content_hash = content_hash
+        self.categories = sorted({item["c"] for item in items})
+        category_code = {c: i for i, c in enumerate(self.categories)}
+
+        self.ids = array('q', (int(item["id"]) for item in items))
+        self.category_codes = array('H', (category_code[item["c"]] for item in items))
+        self.prices = array('d', (round(float(item["p"]), 2) for item in items))
+        self.slugs = tuple(url_slug(item.get("l", "")) for item in items)
+        self.names = tuple(item.get("n", "") for item in items)
+        self.specs = tuple(item.get("s", "") for item in items)
+
+        self._row_by_id = {pid: row for row, pid in enumerate(self.ids)}
+        self._row_by_slug = {slug: row for row, slug in enumerate(self.slugs) if slug}
+
+        groups = {}
+        for row, code in enumerate(self.category_codes):
+            category = self.categories[code]
+            groups.setdefault(category, []).append(row)
+            slot = CATEGORY_SLOT.get(category)
+            if slot:
+                groups.setdefault(slot, []).append(row)
+
+        self._sorted = {}
+        for key, rows in groups.items():
+            rows.sort(key=lambda r: self.prices[r])
+            self._sorted[key] = (
+                array('d', (self.prices[r] for r in rows)),
+                array('I', rows),
+            )
+
+    @classmethod
+    def from_columns(cls, columns, content_hash=""):
+        """Indice sobre columnas de read_snapshot() (memoryviews y StringColumn)."""
+        index = cls.__new__(cls)
+        index.content_hash = content_hash
+        index.categories = list(columns["categories"])
+        index.ids = columns["ids"]
+        index.category_codes = columns["category_codes"]
+        index.prices = columns["prices"]
+        index.slugs = columns["slugs"]
+        index.names = columns["names"]
+        index.specs = columns["specs"]
+        index._row_by_id = SortedLookup(columns["id_keys"], columns["id_rows"])
+        index._row_by_slug = SortedLookup(columns["slug_keys"], columns["slug_rows"])
+
+        offsets = columns["group_offsets"]
+        index._sorted = {}
+        for i, key in enumerate(columns["group_keys"]):
+            lo, hi = offsets[i], offsets[i + 1]
+            index._sorted[key] = (columns["group_prices"][lo:hi], columns["group_rows"][lo:hi])
+        return index
+
+    def to_columns(self):
+        """Columnas tipadas para write_snapshot(), incluidas las busquedas ya ordenadas."""
+        id_keys = sorted(self._row_by_id.items())
+        slug_keys = sorted(self._row_by_slug.items())
+        group_keys = sorted(self._sorted)
+        group_offsets = array('I', [0])
+        group_prices = array('d')
+        group_rows = array('I')
+        for key in group_keys:
+            prices, rows = self._sorted[key]
+            group_prices.extend(prices)
+            group_rows.extend(rows)
+            group_offsets.append(len(group_rows))
+        return {
+            "ids": array('q', self.ids),
+            "category_codes": array('H', self.category_codes),
+            "prices": array('d', self.prices),
+            "categories": list(self.categories),
+            "slugs": list(self.slugs),
+            "names": list(self.names),
+            "specs": list(self.specs),
+            "id_keys": array('q', (k for k, _ in id_keys)),
+            "id_rows": array('I', (r for _, r in id_keys)),
+            "slug_keys": [k for k, _ in slug_keys],
+            "slug_rows": array('I', (r for _, r in slug_keys)),
+            "group_keys": group_keys,
+            "group_offsets": group_offsets,
+            "group_prices": group_prices,
+            "group_rows": group_rows,
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- BUSQUEDAS PUNTUALES ---
+
+    def row_by_id(self, product_id):
+        try:
+            return self._row_by_id.get(int(product_id))
+        except (TypeError, ValueError):
+            return None
+
+    def row_by_url(self, url):
+        return self._row_by_slug.get(url_slug(url))
+
+    def item(self, row):
+        """Reconstruye el producto de la fila con las claves cortas del catalogo."""
+        return {
+            "id": self.ids[row],
+            "c": self.categories[self.category_codes[row]],
+            "n": self.names[row],
+            "p": self.prices[row],
+            "s": self.specs[row],
+            "l": f"https://kiwigeekperu.com/product/{self.slugs[row]}/",
+        }
+
+    def get(self, product_id):
+        row = self.row_by_id(product_id)
+        return self.item(row) if row is not None else None
+
+    def by_url(self, url):
+        row = self.row_by_url(url)
+        return self.item(row) if row is not None else None
+
+    def category(self, row):
+        return self.categories[self.category_codes[row]]
+
+    def slot(self, row):
+        return CATEGORY_SLOT.get(self.category(row))
+
+    def find_component(self, component):
+        """
+        Ubica un componente de cotizacion ({'name','price','url'[, 'id']})
+        en el catalogo. Retorna la fila o None.
+        """
+        row = None
+        if component.get("id") is not None:
+            row = self.row_by_id(component["id"])
+        if row is None and component.get("url"):
+            row = self.row_by_url(component["url"])
+        return row
+
+    # --- CONSULTAS POR RANGO DE PRECIO ---
+
+    def price_range_rows(self, key, min_price=0, max_price=float('inf')):
+        """
+        Filas de una categoria (nombre exacto de 'c') o slot ("gpu", "cpu", ...)
+        con precio en [min_price, max_price], ordenadas por precio ascendente.
+        """
+        entry = self._sorted.get(key)
+        if not entry:
+            return []
+        prices, rows = entry
+        lo = bisect_left(prices, min_price)
+        hi = bisect_right(prices, max_price)
+        return list(rows[lo:hi])
+
+    def price_range(self, key, min_price=0, max_price=float('inf')):
+        return [self.item(r) for r in self.price_range_rows(key, min_price, max_price)]
+
+    def sorted_prices(self, key):
+        """Retorna (precios, filas) ordenados por precio para la categoria o slot."""
+        return self._sorted.get(key, (array('d'), array('I')))
+
+    # --- VERIFICACION DE PRECIOS ---
+
+    def check_component(self, component):
+        """
+        Compara nombre/precio de un componente cotizado contra el catalogo.
+        Retorna un string de error o None si el componente es consistente.
+        """
+        row = self.find_component(component)
+        if row is None:
+            if component.get("url") or component.get("id") is not None:
+                ref = component.get("url") or f"id {component['id']}"
+                return (
+                    f"PRODUCTO NO ENCONTRADO: '{component.get('name', '')}' no existe en el catalogo "
+                    f"({ref}). Usa solo productos e ids del catalogo."
+                )
+            return None
+
+        real_price = self.prices[row]
+        quoted = float(component.get("price", 0))
+        if abs(quoted - real_price) > PRICE_TOLERANCE:
+            return (
+                f"PRECIO INCORRECTO: '{self.names[row]}' cuesta S/ {real_price:,.2f} en el catalogo, "
+                f"no S/ {quoted:,.2f}. Usa el precio exacto del catalogo."
+            )
+        return None
+
+
+def load_catalog_index(path=CATALOG_PATH, use_snapshot=True):
+    """
+    Construye el indice del catalogo. Retorna None si no existe.
+    Con use_snapshot abre el snapshot binario (mmap) si corresponde al JSON
+    actual (mismo tamano y mtime); si no, lee el JSON y regenera el snapshot.
+    """
+    snap = snapshot_path(path)
+    json_exists = os.path.exists(path)
+    if use_snapshot and os.path.exists(snap):
+        try:
+            meta, columns = read_snapshot(snap)
+            if not json_exists:
+                return CatalogIndex.from_columns(columns, meta["content_hash"])
+            stat = os.stat(path)
+            if (meta["source_size"], meta["source_mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                return CatalogIndex.from_columns(columns, meta["content_hash"])
+        except (OSError, ValueError, KeyError, struct.error):
+            pass  # snapshot corrupto o de otra version: se regenera
+    if not json_exists:
+        return None
+
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    index = CatalogIndex(json.loads(raw.decode('utf-8')), hashlib.sha256(raw).hexdigest())
+    if use_snapshot:
+        try:
+            save_catalog_snapshot(index, path, stat)
+        except OSError:
+            pass  # sin permisos de escritura: se usa el indice en memoria
+    return index
+
+
+def save_catalog_snapshot(index, path=CATALOG_PATH, stat=None):
+    """Compila el indice a su snapshot binario junto al JSON. Retorna la ruta."""
+    stat = stat or os.stat(path)
+    snap = snapshot_path(path)
+    write_snapshot(snap, index.to_columns(), len(index), index.content_hash,
+                   (stat.st_size, stat.st_mtime_ns))
+    return snap
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_catalog_index(path=CATALOG_PATH):
+    """Indice compartido por todo el proceso (se carga una sola vez)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_catalog_index(path)
+    return _index
+
+
+def set_catalog_index(index):
+    """Reemplaza el indice compartido (recarga en caliente). Retorna el anterior."""
+    global _index
+    with _index_lock:
+        previous, _index = _index, index
+    return previous
@@ -0,0 +1,198 @@
+"""
+Codificacion compacta del catalogo para el contexto del modelo.
+
+El JSON original repite la URL completa de cada producto y specs largas con
+claves que no sirven para cotizar ("Marca=", "Color=", "Puertos USB="...).
+Aqui cada categoria es una tabla "id|nombre|precio|specs" con solo las specs
+que usan las reglas (socket, DDR, watts, VRAM...), los productos se citan por
+id (la URL se completa localmente) y las categorias que no son de PC solo
+entran si el mensaje las pide.
+
+Reporte de tokens (estimado; --count-tokens usa el contador de la API):
+    python catalog_encoding.py [catalogo.json] [--count-tokens]
+"""
+import os
+import re
+import argparse
+import unicodedata
+from functools import lru_cache
+
+from catalog import CATALOG_PATH, CATEGORY_SLOT, load_catalog_index
+from specs import parse_spec_blob
+from history import estimate_tokens
+
+# --- CONSTANTES ---
+# Specs que se conservan por slot: (etiqueta corta, clave del catalogo)
+QUOTE_SPEC_KEYS = {
+    "gpu": (("VRAM", "Memoria de video"), ("Fuente rec.", "Potencia recomendada GPU")),
+    "cpu": (("Socket", "Socket de CPU"), ("Nucleos", "Número de Núcleos"),
+            ("RAM", "Tipo de memoria RAM"), ("TDP", "Potencia de Diseño Térmico (TDP)"),
+            ("Graficos", "Gráficos Integrados"), ("Cooler", "Dispositivo de Refrigeración")),
+    "motherboard": (("Socket", "Socket de CPU"), ("Chipset", "Chipset"),
+                    ("RAM", "Tipo de memoria RAM"), ("Formato", "Factor de forma (placa base)")),
+    "ram": (("Tipo", "Tipo de memoria RAM"), ("Capacidad", "Capacidad RAM total")),
+    "storage": (("Capacidad", "Almacenamiento"), ("Protocolo", "Protocolo"),
+                ("Lectura", "Velocidad de lectura secuencial")),
+    "psu": (("Potencia", "Potencia nominal"), ("Eficiencia", "Eficiencia energética")),
+    "case": (("Formato", "Factor de forma (placa base)"), ("Tamano", "Tamaño de gabinete"),
+             ("Fuente", "Fuente de poder")),
+    "cooler": (("Socket", "Socket de CPU"), ("Radiador", "Dimensiones del radiador")),
+    "monitor": (("Pantalla", "Tamaño de pantalla"), ("Resolucion", "Resolución"),
+                ("Hz", "Frecuencia de refresco (Hz)"), ("Panel", "Tipo de pantalla")),
+    "keyboard": (("Tipo", "Tipo de teclado"), ("Formato", "Formato")),
+    "mouse": (("DPI", "DPI máx"), ("Conexion", "Puertos e interfaces de conexión")),
+    "headset": (("Conexion", "Puertos e interfaces de conexión"),),
+}
+# Categorias fuera de PC (laptops, consolas...): todas sus specs menos estas
+GENERIC_SPEC_KEYS = {
+    "Marca", "Color", "Peso", "Puertos USB", "Puertos de audio", "Puertos de Video",
+    "Tipo de iluminación", "Iluminación del ventilador", "Material", "Asistente virtual",
+}
+MAX_SPEC_VALUE = 40  # caracteres por valor de spec
+# Palabras de nombres de categoria que no identifican un pedido ("gaming", "para"...);
+# se comparan sin tildes, en singular y con al menos CATEGORY_MIN_WORD letras
+CATEGORY_STOPWORDS = {"gaming", "gamer", "game", "accesorio", "computadora", "tarjeta", "almacenamiento",
+                      "externo", "interno", "teclado", "mouse", "memoria", "control", "soporte"}
+CATEGORY_MIN_WORD = 5
+
+
+def _spec_value(value):
+    # "Menor a 1 TB | 64 GB" -> "64 GB": el detalle va despues del ultimo '|'
+    value = value.rsplit('|', 1)[-1].strip().replace(';', ',').replace('|', '/')
+    return value if len(value) <= MAX_SPEC_VALUE else value[:MAX_SPEC_VALUE - 1].rstrip() + "…"
+
+
+def compact_specs(catalog, row):
+    """Specs de la fila que importan para cotizar: 'Socket=AM5;RAM=DDR5'."""
+    fields = parse_spec_blob(catalog.specs[row])
+    keys = QUOTE_SPEC_KEYS.get(catalog.slot(row))
+    if keys is None:
+        pairs = [(key, value) for key, value in fields.items() if key not in GENERIC_SPEC_KEYS]
+    else:
+        pairs = [(label, fields[key]) for label, key in keys if fields.get(key)]
+    return ";".join(f"{label}={_spec_value(value)}" for label, value in pairs if value)
+
+
+def is_pc_category(category):
+    return category in CATEGORY_SLOT
+
+
+@lru_cache(maxsize=4)
+def get_row_lines(catalog):
+    """Linea 'id|nombre|precio|specs' de cada fila, una vez por indice de catalogo."""
+    return [
+        f"{catalog.ids[row]}|{catalog.names[row].replace('|', '/')}|{catalog.prices[row]:g}|"
+        f"{compact_specs(catalog, row)}"
+        for row in range(len(catalog))
+    ]
+
+
+def encode_rows(catalog, rows):
+    """
+    Tablas por categoria (en orden del catalogo, filas por precio):
+        ## CATEGORIA
+        id|nombre|precio|specs
+    """
+    row_lines = get_row_lines(catalog)
+    by_category = {}
+    for row in rows:
+        by_category.setdefault(catalog.category(row), []).append(row)
+    blocks = []
+    for category in sorted(by_category, key=catalog.categories.index):
+        lines = [f"## {category}"]
+        lines.extend(row_lines[row] for row in sorted(by_category[category], key=lambda r: catalog.prices[r]))
+        blocks.append("\n".join(lines))
+    return "\n".join(blocks)
+
+
+def catalog_rows(catalog, categories=None):
+    """Filas de las categorias de PC, mas las categorias pedidas explicitamente."""
+    extra = set(categories or ())
+    return [
+        row for row in range(len(catalog))
+        if is_pc_category(catalog.category(row)) or catalog.category(row) in extra
+    ]
+
+
+def encode_catalog(catalog, categories=None):
+    """Catalogo completo para el contexto cacheado (modo "full")."""
+    return (
+        "=== CATALOGO KIWIGEEK (tablas por categoria: id|nombre|precio S/|specs) ===\n"
+        "Usa SOLO estos productos. En cada componente indica el 'id' exacto, el nombre y el precio.\n"
+        + encode_rows(catalog, catalog_rows(catalog, categories))
+    )
+
+
+def _words(text):
+    # Sin tildes y en singular: "Micrófonos" -> "microfono"
+    text = unicodedata.normalize('NFKD', text.lower()).encode('ascii', 'ignore').decode('ascii')
+    words = {w[:-1] if w.endswith('s') else w for w in re.findall(r'[a-z]{%d,}' % CATEGORY_MIN_WORD, text)}
+    return words - CATEGORY_STOPWORDS
+
+
+def requested_categories(text, catalog):
+    """Categorias fuera de PC nombradas en el mensaje ('laptop', 'consola', 'microfono'...)."""
+    words = _words(text)
+    if not words:
+        return []
+    return [
+        category for category in catalog.categories
+        if not is_pc_category(category) and _words(category) & words
+    ]
+
+
+# --- REPORTE DE TOKENS ---
+def token_report(catalog, catalog_path=CATALOG_PATH, count_tokens=None):
+    """
+    Tamano del catalogo original (JSON) frente a la codificacion compacta.
+    count_tokens(texto) -> tokens reales (API); si no, se estima por caracteres.
+    """
+    count = count_tokens or estimate_tokens
+    with open(catalog_path, 'r', encoding='utf-8') as f:
+        raw = f.read()
+    compact = encode_catalog(catalog)
+    rows = catalog_rows(catalog)
+    return {
+        "products": len(catalog),
+        "pc_products": len(rows),
+        "raw_chars": len(raw),
+        "compact_chars": len(compact),
+        "raw_tokens": count(raw),
+        "compact_tokens": count(compact),
+        "measured": count_tokens is not None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reporte de tokens del catalogo codificado")
+    parser.add_argument("catalog", nargs="?", default=CATALOG_PATH)
+    parser.add_argument("--count-tokens", action="store_true",
+                        help="contar con la API de Gemini (requiere GEMINI_API_KEY)")
+    parser.add_argument("--print", action="store_true", help="imprimir el catalogo codificado")
+    args = parser.parse_args(argv)
+
+    catalog = load_catalog_index(args.catalog)
+    if catalog is None:
+        raise SystemExit(f"No existe {args.catalog}")
+    if args.print:
+        print(encode_catalog(catalog))
+        return
+
+    count_tokens = None
+    if args.count_tokens:
+        from google import genai
+        from service import MODEL_ID
+
+        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY", ""))
+        count_tokens = lambda text: client.models.count_tokens(model=MODEL_ID, contents=text).total_tokens
+
+    report = token_report(catalog, args.catalog, count_tokens)
+    kind = "tokens" if report["measured"] else "tokens estimados"
+    print(f"productos: {report['products']} ({report['pc_products']} de PC en el contexto)")
+    print(f"JSON original: {report['raw_chars']:,} caracteres, {report['raw_tokens']:,} {kind}")
+    print(f"compacto:      {report['compact_chars']:,} caracteres, {report['compact_tokens']:,} {kind} "
+          f"({1 - report['compact_tokens'] / report['raw_tokens']:.0%} menos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Recarga en caliente del catalogo.
+
+Un hilo vigila catalogo_kiwigeek.json (tamano + mtime) y cuando cambia:
+1. carga la nueva version (regenera el snapshot) y la compara por id con la actual
+2. si no hay cambios reales no toca nada: todos los caches siguen con el mismo hash
+3. si los hay, reutiliza lo que no depende de lo cambiado (BM25 y columnas de
+   specs si nombres y specs por fila son iguales; cotizaciones cacheadas que no
+   usan productos tocados) y precalienta el resto
+4. reemplaza el indice compartido de forma atomica: los turnos en curso terminan
+   con la version anterior y los siguientes usan la nueva, sin cortar sesiones
+5. avisa a los suscriptores (ej. QuoteService con el catalogo completo en el
+   contexto cacheado) con el diff
+"""
+import os
+import logging
+import threading
+
+from catalog import CATALOG_PATH, get_catalog_index, load_catalog_index, set_catalog_index
+from specs import rekey_spec_columns
+from retrieval import get_bm25_index, rekey_bm25_index
+from compatibility import get_compatibility
+from matcher import get_name_matcher
+from batch_validation import get_batch_columns
+from catalog_encoding import get_row_lines
+from quote_cache import QUOTE_CACHE_ENABLED, get_quote_cache
+from telemetry import METRICS
+
+# --- CONSTANTES ---
+# Cada cuantos segundos se revisa el archivo del catalogo (0 = sin recarga en caliente)
+CATALOG_POLL_INTERVAL = float(os.getenv("KIWI_CATALOG_POLL_INTERVAL", "30"))
+# Campos de los que dependen BM25 y las columnas de specs
+TEXT_FIELDS = {"name", "specs"}
+
+logger = logging.getLogger("kiwi.catalog")
+
+
+def _row_fields(catalog, row):
+    return {
+        "name": catalog.names[row],
+        "url": catalog.slugs[row],
+        "category": catalog.categories[catalog.category_codes[row]],
+        "specs": catalog.specs[row],
+    }
+
+
+class CatalogDiff:
+    """
+    Cambios entre dos versiones del catalogo, por id de producto:
+    - added / removed: ids nuevos y retirados
+    - repriced: {id: (precio anterior, precio nuevo)}
+    - changed: {id: campos distintos} entre name, url, category y specs
+    - rows_aligned: mismos ids en el mismo orden (los indices por fila siguen validos)
+    """
+
+    def __init__(self, old, new):
+        old_ids = list(old.ids) if old is not None else []
+        new_ids = list(new.ids)
+        self.rows_aligned = old_ids == new_ids
+        self.added = [pid for pid in new_ids if new.row_by_id(pid) is not None
+                      and (old is None or old.row_by_id(pid) is None)]
+        self.removed = [pid for pid in old_ids if new.row_by_id(pid) is None]
+        self.repriced = {}
+        self.changed = {}
+        for old_row, pid in enumerate(old_ids):
+            new_row = new.row_by_id(pid)
+            if new_row is None:
+                continue
+            if old.prices[old_row] != new.prices[new_row]:
+                self.repriced[pid] = (old.prices[old_row], new.prices[new_row])
+            before, after = _row_fields(old, old_row), _row_fields(new, new_row)
+            fields = {field for field in before if before[field] != after[field]}
+            if fields:
+                self.changed[pid] = fields
+
+    @property
+    def is_empty(self):
+        return not (self.added or self.removed or self.repriced or self.changed) and self.rows_aligned
+
+    @property
+    def fields_changed(self):
+        fields = set()
+        for changed in self.changed.values():
+            fields |= changed
+        return fields
+
+    @property
+    def text_unchanged(self):
+        """BM25 y columnas de specs de la version anterior sirven para la nueva."""
+        return self.rows_aligned and not (self.fields_changed & TEXT_FIELDS)
+
+    @property
+    def affected_ids(self):
+        """Productos cuyas cotizaciones cacheadas ya no son confiables."""
+        return set(self.removed) | set(self.repriced) | set(self.changed)
+
+    def summary(self):
+        return (
+            f"+{len(self.added)} -{len(self.removed)} ~{len(self.repriced)} precios, "
+            f"{len(self.changed)} con otros cambios ({', '.join(sorted(self.fields_changed)) or '-'})"
+        )
+
+
+def quote_touches(data, catalog, product_ids):
+    """True si alguna cotizacion usa un producto de product_ids o uno que no esta en el catalogo."""
+    for quote in data.get("quotes") or []:
+        for item in quote.get("components", []):
+            row = catalog.find_component(item)
+            if row is None or catalog.ids[row] in product_ids:
+                return True
+    return False
+
+
+_listeners = []
+_reload_lock = threading.Lock()
+
+
+def on_catalog_change(callback):
+    """Registra callback(old, new, diff); se llama despues de cada recarga aplicada."""
+    _listeners.append(callback)
+    return callback
+
+
+def reload_catalog(path=CATALOG_PATH):
+    """
+    Carga la version actual del archivo y, si cambio algo, la publica.
+    Retorna el CatalogDiff aplicado o None si no hubo cambios.
+    Un JSON a medio escribir lanza ValueError y deja el catalogo anterior.
+    """
+    with _reload_lock:
+        old = get_catalog_index(path)
+        new = load_catalog_index(path)
+        if new is None or (old is not None and new.content_hash == old.content_hash):
+            return None
+
+        diff = CatalogDiff(old, new)
+        if diff.is_empty:
+            # Solo cambio el formato del archivo: se conserva la version en uso
+            METRICS.inc("kiwi_catalog_reloads_total", outcome="unchanged")
+            return None
+
+        if old is not None:
+            rekey_spec_columns(old, new, diff.text_unchanged)
+            rekey_bm25_index(old, new, diff.text_unchanged)
+            if QUOTE_CACHE_ENABLED:
+                affected = diff.affected_ids
+                kept, dropped = get_quote_cache(old.content_hash).rekey(
+                    old.content_hash, new.content_hash,
+                    lambda data: not quote_touches(data, old, affected)
+                )
+                METRICS.inc("kiwi_quote_cache_rekeyed_total", kept, outcome="kept")
+                METRICS.inc("kiwi_quote_cache_rekeyed_total", dropped, outcome="dropped")
+
+        # Precalentado antes del cambio: el primer turno con la version nueva no paga la construccion
+        get_compatibility(new)
+        get_bm25_index(new)
+        get_name_matcher(new)
+        get_batch_columns(new)
+        get_row_lines(new)
+
+        set_catalog_index(new)
+        for callback in list(_listeners):
+            try:
+                callback(old, new, diff)
+            except Exception:
+                logger.exception("Fallo un suscriptor de recarga del catalogo")
+
+        METRICS.inc("kiwi_catalog_reloads_total", outcome="applied")
+        logger.info("Catalogo %s -> %s: %s", old.content_hash[:12] if old else "-",
+                    new.content_hash[:12], diff.summary())
+        return diff
+
+
+class CatalogWatcher:
+    """Sondea tamano y mtime del catalogo en un hilo daemon y llama a reload_catalog()."""
+
+    def __init__(self, path=CATALOG_PATH, interval=CATALOG_POLL_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.stat = self._read_stat()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _read_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def check(self):
+        """Una pasada: recarga si el archivo cambio. Retorna el diff aplicado o None."""
+        stat = self._read_stat()
+        if stat is None or stat == self.stat:
+            return None
+        try:
+            diff = reload_catalog(self.path)
+        except (ValueError, KeyError) as e:
+            # Archivo copiandose o invalido: se reintenta en la siguiente pasada
+            METRICS.inc("kiwi_catalog_reloads_total", outcome="invalid")
+            logger.warning("Catalogo invalido, se mantiene la version anterior: %s", e)
+            return None
+        self.stat = stat
+        return diff
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.check()
+                except Exception:
+                    logger.exception("Fallo la recarga del catalogo")
+
+        self._thread = threading.Thread(target=loop, name="kiwi-catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def start_catalog_watcher(path=CATALOG_PATH, interval=CATALOG_POLL_INTERVAL):
+    """Watcher compartido por el proceso. None si la recarga en caliente esta desactivada."""
+    global _watcher
+    if interval <= 0:
+        return None
+    if _watcher is None:
+        with _watcher_lock:
+            if _watcher is None:
+                _watcher = CatalogWatcher(path, interval)
+                _watcher.start()
+    return _watcher
@@ -0,0 +1,82 @@
+import re
+from functools import lru_cache
+
+# --- CONSTANTES ---
+CRITICAL_SLOTS = ("gpu", "cpu", "case")
+
+# Un solo regex (alternancia de grupos nombrados) recorre el nombre una vez.
+# Si varios grupos coinciden gana el primero de esta lista:
+# - other: nombres que empiezan con otra categoria ("Memoria ... Intel XMP")
+# - gpu: modelos dedicados ("Intel Arc B570" es GPU, no CPU)
+# - gpu_hint: palabras sueltas que solo cuentan si nada mas coincide
+#   ("Ryzen 5 8600G con Radeon Graphics" es CPU)
+CLASSIFIER_PATTERNS = (
+    ("other", r"^\s*(?:placa\s+(?:madre|base)|motherboard|memoria|fuente|monitor|mouse|teclado"
+              r"|aud[ií]fonos?|auriculares|unidad|disco|ssd|cooler|ventilador|refrigeraci[oó]n"
+              r"|micr[oó]fono|c[aá]mara|control|combo)\b"),
+    ("gpu", r"\b(?:rtx|gtx|geforce|radeon\s+rx|rx\s*\d{3,4}|arc\s+[ab]\d{3}"
+            r"|placa\s+de\s+video|tarjeta\s+de\s+video|gr[aá]fica)\b"),
+    ("cpu", r"\b(?:ryzen|core\s+(?:i[3579]|ultra)|i[3579]-\d{4,5}|pentium|celeron|xeon|athlon"
+            r"|threadripper|procesador|processor|cpu)\b"),
+    ("case", r"\b(?:case|gabinete|caja|chasis|torre)\b"),
+    ("gpu_hint", r"\b(?:gpu|nvidia|radeon|video)\b"),
+)
+GROUP_SLOT = {"other": None, "gpu": "gpu", "cpu": "cpu", "case": "case", "gpu_hint": "gpu"}
+COMPONENT_RE = re.compile(
+    "|".join(f"(?P<{group}>{pattern})" for group, pattern in CLASSIFIER_PATTERNS),
+    re.IGNORECASE
+)
+GROUP_PRIORITY = {group: i for i, (group, _) in enumerate(CLASSIFIER_PATTERNS)}
+
+
+@lru_cache(maxsize=8192)
+def classify_name(name):
+    """Slot critico ('gpu', 'cpu', 'case') detectado en el nombre, o None."""
+    best = None
+    for match in COMPONENT_RE.finditer(name):
+        group = match.lastgroup
+        if best is None or GROUP_PRIORITY[group] < GROUP_PRIORITY[best]:
+            best = group
+            if best == "other":
+                break
+    return GROUP_SLOT[best] if best else None
+
+
+def component_slot(item, catalog=None):
+    """
+    Slot critico de un componente cotizado. Si esta en el catalogo manda su
+    categoria ('c'); si no, se clasifica por nombre.
+    """
+    if catalog is not None:
+        row = catalog.find_component(item)
+        if row is not None:
+            slot = catalog.slot(row)
+            return slot if slot in CRITICAL_SLOTS else None
+    return classify_name(item.get("name", ""))
+
+
+@lru_cache(maxsize=1024)
+def _analyze(key, catalog):
+    prices = {"gpu_price": 0, "cpu_price": 0, "case_price": 0}
+    slots = []
+    for product_id, url, name, price in key:
+        slot = component_slot({"id": product_id, "url": url, "name": name}, catalog)
+        slots.append(slot)
+        if slot:
+            field = f"{slot}_price"
+            prices[field] = max(prices[field], price)
+    prices["slots"] = tuple(slots)
+    return prices
+
+
+def analyze_components(components, catalog=None):
+    """
+    Clasificacion de una cotizacion, memoizada por (componentes, catalogo):
+    validacion y render de la misma cotizacion la calculan una sola vez.
+    Retorna dict con gpu_price, cpu_price, case_price y slots (uno por componente).
+    """
+    key = tuple(
+        (item.get("id"), item.get("url"), item.get("name", ""), float(item.get("price", 0)))
+        for item in components
+    )
+    return _analyze(key, catalog)
@@ -0,0 +1,146 @@
+from functools import lru_cache
+
+from specs import get_spec_columns
+
+# --- CONSTANTES ---
+PSU_MARGIN = 0.20  # Fuente >= (GPU + CPU) * 1.2
+MIN_GPU_WATTS = 75  # Consumo minimo de una GPU dedicada (solo slot PCIe)
+# Consumo estimado de GPU a partir de la fuente recomendada por el fabricante:
+# W = 0.8 * fuente_recomendada - 330 (550 W -> 110 W, 850 W -> 350 W, 1000 W -> 470 W)
+GPU_WATTS_SLOPE = 0.8
+GPU_WATTS_OFFSET = 330
+DEFAULT_CPU_WATTS = 65
+DDR_GENERATIONS = (5, 4, 3)  # Preferencia al elegir generacion de RAM
+
+
+def estimate_gpu_watts(recommended_psu):
+    if not recommended_psu:
+        return MIN_GPU_WATTS
+    return max(MIN_GPU_WATTS, int(GPU_WATTS_SLOPE * recommended_psu - GPU_WATTS_OFFSET))
+
+
+def ddr_label(mask):
+    gens = [f"DDR{g}" for g in sorted(DDR_GENERATIONS) if mask & (1 << g)]
+    return "/".join(gens) or "desconocida"
+
+
+class CompatibilityGraph:
+    """
+    Grafo de compatibilidad precalculado sobre las columnas de specs:
+    - boards_by_socket: socket -> placas madre con ese socket
+    - board -> generacion de RAM (ddr_masks de specs)
+    - watts: consumo estimado por fila (CPU = TDP, GPU = estimado por fuente
+      recomendada) y potencia nominal por fila de fuente
+    """
+
+    def __init__(self, catalog, columns):
+        self.catalog = catalog
+        self.columns = columns
+
+        self.boards_by_socket = {}
+        for row in catalog.sorted_prices("motherboard")[1]:
+            socket = columns.socket(row)
+            if socket:
+                self.boards_by_socket.setdefault(socket, []).append(row)
+
+        self.watts = {}
+        for row in catalog.sorted_prices("gpu")[1]:
+            self.watts[row] = estimate_gpu_watts(columns.watts[row])
+        for row in catalog.sorted_prices("cpu")[1]:
+            self.watts[row] = columns.watts[row] or DEFAULT_CPU_WATTS
+
+    def required_psu_watts(self, gpu_row, cpu_row):
+        gpu = self.watts.get(gpu_row, MIN_GPU_WATTS) if gpu_row is not None else 0
+        cpu = self.watts.get(cpu_row, DEFAULT_CPU_WATTS) if cpu_row is not None else 0
+        return (gpu + cpu) * (1 + PSU_MARGIN)
+
+    def compatible_boards(self, cpu_row, ddr_mask=0):
+        """Placas (ordenadas por precio) con el socket del CPU y, opcionalmente, esa RAM."""
+        rows = self.boards_by_socket.get(self.columns.socket(cpu_row), [])
+        if ddr_mask:
+            rows = [r for r in rows if self.columns.ddr_masks[r] & ddr_mask]
+        return rows
+
+    def preferred_ddr(self, cpu_row):
+        """Generacion de RAM (bit) mas nueva soportada por el CPU con placas disponibles."""
+        cpu_mask = self.columns.ddr_masks[cpu_row]
+        for gen in DDR_GENERATIONS:
+            bit = 1 << gen
+            if cpu_mask & bit and self.compatible_boards(cpu_row, bit):
+                return bit
+        return 0
+
+    def _cheapest(self, rows):
+        if not rows:
+            return ""
+        row = rows[0]
+        return f"{self.catalog.names[row]} (S/ {self.catalog.prices[row]:,.2f})"
+
+    def check_build(self, components):
+        """
+        Chequeo de compatibilidad tecnica (VALIDACION 4).
+        Solo evalua componentes ubicados en el catalogo.
+        Retorna: lista de errores correctivos.
+        """
+        by_slot = {}
+        for item in components:
+            row = self.catalog.find_component(item)
+            if row is not None:
+                by_slot.setdefault(self.catalog.slot(row), row)
+
+        errors = []
+        cpu = by_slot.get("cpu")
+        board = by_slot.get("motherboard")
+        ram = by_slot.get("ram")
+        gpu = by_slot.get("gpu")
+        psu = by_slot.get("psu")
+        names = self.catalog.names
+        columns = self.columns
+
+        if cpu is not None and board is not None:
+            cpu_socket = columns.socket(cpu)
+            board_socket = columns.socket(board)
+            if cpu_socket and board_socket and cpu_socket != board_socket:
+                suggestion = self._cheapest(self.compatible_boards(cpu))
+                errors.append(
+                    f"INCOMPATIBILIDAD DE SOCKET: CPU '{names[cpu]}' ({cpu_socket}) no entra en la placa "
+                    f"'{names[board]}' ({board_socket}). Usa una placa {cpu_socket}"
+                    + (f", por ejemplo {suggestion}." if suggestion else ".")
+                )
+            elif cpu_socket and board_socket:
+                cpu_mask = columns.ddr_masks[cpu]
+                board_mask = columns.ddr_masks[board]
+                if cpu_mask and board_mask and not cpu_mask & board_mask:
+                    errors.append(
+                        f"INCOMPATIBILIDAD DE MEMORIA: CPU '{names[cpu]}' soporta {ddr_label(cpu_mask)} "
+                        f"pero la placa '{names[board]}' usa {ddr_label(board_mask)}."
+                    )
+
+        if board is not None and ram is not None:
+            board_mask = columns.ddr_masks[board]
+            ram_mask = columns.ddr_masks[ram]
+            if board_mask and ram_mask and not board_mask & ram_mask:
+                errors.append(
+                    f"INCOMPATIBILIDAD DE RAM: la placa '{names[board]}' usa {ddr_label(board_mask)} "
+                    f"y la RAM '{names[ram]}' es {ddr_label(ram_mask)}. Cambia la RAM a {ddr_label(board_mask)}."
+                )
+
+        if psu is not None and (gpu is not None or cpu is not None):
+            required = self.required_psu_watts(gpu, cpu)
+            available = columns.watts[psu]
+            if available and available < required:
+                gpu_w = self.watts.get(gpu, 0) if gpu is not None else 0
+                cpu_w = self.watts.get(cpu, 0) if cpu is not None else 0
+                errors.append(
+                    f"FUENTE INSUFICIENTE: '{names[psu]}' entrega {available} W y se necesitan "
+                    f"{required:.0f} W (GPU ~{gpu_w} W + CPU ~{cpu_w} W + {PSU_MARGIN*100:.0f}%). "
+                    f"Usa una fuente de al menos {required:.0f} W."
+                )
+
+        return errors
+
+
+@lru_cache(maxsize=4)
+def get_compatibility(catalog):
+    """Grafo compartido por proceso, uno por indice de catalogo."""
+    return CompatibilityGraph(catalog, get_spec_columns(catalog))
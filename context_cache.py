@@ -0,0 +1,167 @@
+import time
+import hashlib
+import threading
+
+from google.genai import types
+
+# --- CONSTANTES ---
+CONTEXT_CACHE_TTL = 7200  # segundos
+CONTEXT_CACHE_REFRESH_MARGIN = 900  # renovar el TTL 15 min antes de que venza
+CONTEXT_CACHE_PREFIX = "kiwi_"
+# Si crear/buscar el cache falla (ej. contenido bajo el minimo de tokens del modelo)
+# no se reintenta hasta pasado este tiempo; mientras tanto se usa system_instruction
+CONTEXT_CACHE_RETRY_BACKOFF = 600  # segundos
+
+
+def cache_fingerprint(model_id, system_prompt, contents):
+    """Hash del contenido cacheado: mismo prompt + catalogo = mismo cache en el servidor."""
+    digest = hashlib.sha256()
+    for part in (model_id, system_prompt, *contents):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _expire_timestamp(cached, ttl):
+    expire_time = getattr(cached, "expire_time", None)
+    return expire_time.timestamp() if expire_time else time.time() + ttl
+
+
+class ContextCacheManager:
+    """
+    Ciclo de vida del cached content de Gemini:
+    - reutiliza un cache existente con el mismo display_name (hash de prompt + catalogo)
+      en vez de crear uno nuevo en cada reinicio del proceso
+    - renueva el TTL en segundo plano antes de que venza
+    - si el cache desaparecio del servidor lo recrea de forma transparente
+    - sin contenido ademas del prompt (modo "slice") no hay cache: get_name() es None
+    - si la creacion falla, espera CONTEXT_CACHE_RETRY_BACKOFF antes de reintentar
+    """
+
+    def __init__(self, client, model_id, system_prompt, contents=(),
+                 ttl=CONTEXT_CACHE_TTL, refresh_margin=CONTEXT_CACHE_REFRESH_MARGIN,
+                 retry_backoff=CONTEXT_CACHE_RETRY_BACKOFF):
+        self.client = client
+        self.model_id = model_id
+        self.system_prompt = system_prompt
+        self.contents = [c for c in contents if c]
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.retry_backoff = retry_backoff
+        self.display_name = CONTEXT_CACHE_PREFIX + cache_fingerprint(
+            model_id, system_prompt, self.contents
+        )[:32]
+        self.name = None
+        self.expires_at = 0.0
+        self.verify = False  # True = confirmar que el cache sigue en el servidor
+        self.retry_at = 0.0  # tras un fallo, no se vuelve a intentar antes de este momento
+        self.lock = threading.Lock()
+        self._refresher = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self):
+        return bool(self.contents)
+
+    def get_name(self):
+        """
+        Nombre del cache vigente (lo busca, renueva o crea si hace falta).
+        None si no hay contenido que cachear o si un fallo reciente sigue en backoff.
+        """
+        if not self.enabled:
+            return None
+        if self.name and not self.verify and self.expires_at - time.time() > self.refresh_margin:
+            return self.name
+        if time.time() < self.retry_at:
+            return None
+        with self.lock:
+            if time.time() < self.retry_at:
+                return None
+            self._ensure_or_backoff()
+            return self.name
+
+    def _ensure_or_backoff(self):
+        try:
+            self._ensure()
+        except Exception:
+            self.name = None
+            self.retry_at = time.time() + self.retry_backoff
+            raise
+        self.retry_at = 0.0
+
+    def invalidate(self):
+        """Marca el cache como dudoso (ej. tras un error del modelo); se verifica en el proximo uso."""
+        self.verify = True
+
+    def _ensure(self):
+        now = time.time()
+        if self.name and self.verify:
+            try:
+                cached = self.client.caches.get(name=self.name)
+                self.expires_at = _expire_timestamp(cached, self.ttl)
+            except Exception:
+                self.name = None  # borrado o vencido en el servidor
+            self.verify = False
+
+        if self.name is None:
+            self._find_existing(now)
+
+        if self.name is None:
+            self._create()
+        elif self.expires_at - now <= self.refresh_margin:
+            self._refresh()
+
+    def _find_existing(self, now):
+        for cached in self.client.caches.list():
+            if cached.display_name != self.display_name:
+                continue
+            expires_at = _expire_timestamp(cached, self.ttl)
+            if expires_at > now:
+                self.name = cached.name
+                self.expires_at = expires_at
+                return
+
+    def _create(self):
+        cached = self.client.caches.create(
+            model=self.model_id,
+            config=types.CreateCachedContentConfig(
+                display_name=self.display_name,
+                system_instruction=self.system_prompt,
+                contents=self.contents,
+                ttl=f'{self.ttl}s'
+            )
+        )
+        self.name = cached.name
+        self.expires_at = _expire_timestamp(cached, self.ttl)
+
+    def _refresh(self):
+        try:
+            cached = self.client.caches.update(
+                name=self.name,
+                config=types.UpdateCachedContentConfig(ttl=f'{self.ttl}s')
+            )
+            self.expires_at = _expire_timestamp(cached, self.ttl)
+        except Exception:
+            self._create()
+
+    def start_refresher(self):
+        """Hilo daemon que mantiene vivo el cache mientras el proceso este activo."""
+        if self._refresher is not None or not self.enabled:
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._refresher.start()
+
+    def stop_refresher(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            now = time.time()
+            wait = max(30.0, self.expires_at - now - self.refresh_margin, self.retry_at - now)
+            if self._stop.wait(wait):
+                return
+            try:
+                with self.lock:
+                    self._ensure_or_backoff()
+            except Exception:
+                pass  # se reintenta al vencer el backoff
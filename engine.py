@@ -0,0 +1,394 @@
+import json
+import time
+from contextlib import contextmanager
+
+from validation import (
+    MAX_RETRIES, calculate_gpu_cpu_multiplier, get_multiplier_range, error_rule,
+    extract_component_prices, validate_response, check_partial_build, generate_feedback_prompt
+)
+from solver import solve_builds, format_builds_prompt, apply_solver_builds, budget_floor_response
+from retrieval import build_catalog_slice, format_catalog_slice
+from speculative import SPECULATIVE_CANDIDATES, run_race
+from streaming import STREAMING_ENABLED, stream_response, is_component_path
+from history import HISTORY_TOKEN_BUDGET, turn_history, history_tokens, has_quote
+from repair import REPAIR_ENABLED, UNREPAIRABLE_ERROR_PREFIXES, repair_response
+from reference_builds import reference_builds
+from matcher import ground_components, ground_response
+from intents import INTENT_FAST_PATH, asks_for_parts, clarification_response, detect_pc_type
+from catalog_encoding import encode_rows, catalog_rows, requested_categories
+
+# --- CONSTANTES ---
+RETRY_DELAY = 0.3  # pausa entre reintentos secuenciales (segundos)
+
+
+class StageTimer:
+    """
+    Acumula duracion y cantidad de llamadas por etapa del turno.
+    stage() entrega un dict de atributos (tokens, reglas fallidas...) que
+    StageTimer ignora y telemetry.TurnTrace guarda en el span.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+
+    @contextmanager
+    def stage(self, name, **attrs):
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self._record(name, time.perf_counter() - start, attrs)
+
+    def _record(self, name, duration, attrs):
+        self.totals[name] = self.totals.get(name, 0.0) + duration
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+
+def usage_attributes(usage):
+    """usage_metadata de google-genai -> tokens de prompt, cacheados y de salida."""
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", None) or 0,
+        "cached_tokens": getattr(usage, "cached_content_token_count", None) or 0,
+        "output_tokens": getattr(usage, "candidates_token_count", None) or 0,
+    }
+
+
+class TurnResult:
+    """Resultado de un turno: respuesta final, estado de validacion y chat actualizado."""
+
+    def __init__(self, data, is_valid, errors, attempts, text, chat_session, from_cache=False,
+                 local=False, prefetched=False):
+        self.data = data
+        self.is_valid = is_valid
+        self.errors = errors
+        self.attempts = attempts
+        self.text = text
+        self.chat_session = chat_session
+        self.from_cache = from_cache
+        self.local = local  # respondido por el slot filling local (intents.py)
+        self.prefetched = prefetched  # cotizacion generada en segundo plano (prefetch.py)
+
+
+def record_turn(client, model_id, chat_config, chat_session, base_history, prompt, data, catalog,
+                history_budget):
+    """Chat nuevo con el turno respondido sin el modelo, para que conserve el contexto."""
+    if history_budget is not None:
+        history = turn_history(base_history, prompt, data, catalog, history_budget)
+    else:
+        history = chat_session.get_history() + [
+            {"role": "user", "parts": [{"text": prompt}]},
+            {"role": "model", "parts": [{"text": json.dumps(data, ensure_ascii=False)}]},
+        ]
+    return client.chats.create(model=model_id, config=chat_config, history=history)
+
+
+def compose_prompt(prompt, budget, pc_type, catalog, catalog_mode="slice", use_solver=True):
+    """
+    Prompt del primer intento y builds del solver.
+    SOLVER LOCAL: si hay presupuesto y tipo, los componentes salen del catalogo
+    ya validados y el modelo solo redacta title/strategy/insight. Los
+    presupuestos de la tabla precalculada (reference_builds.py) no buscan nada.
+    RETRIEVAL: si no, solo categorias/bandas viables + productos nombrados.
+    En modo "full" el contexto cacheado solo trae las categorias de PC; las
+    otras (laptops, consolas...) se agregan al mensaje si este las nombra.
+    """
+    solver_builds = []
+    if use_solver and budget and pc_type and catalog is not None:
+        solver_builds = reference_builds(budget, pc_type, catalog) or solve_builds(budget, pc_type, catalog)
+    if solver_builds:
+        return prompt + "\n\n" + format_builds_prompt(solver_builds, budget, pc_type), solver_builds
+    if catalog_mode == "slice" and catalog is not None:
+        slice_rows = build_catalog_slice(catalog, prompt, budget, pc_type)
+        if slice_rows:
+            return format_catalog_slice(catalog, slice_rows) + "\n\n" + prompt, solver_builds
+    if catalog_mode == "full" and catalog is not None:
+        categories = requested_categories(prompt, catalog)
+        if categories:
+            rows = [row for row in catalog_rows(catalog, categories) if catalog.category(row) in categories]
+            return (
+                "=== CATALOGO ADICIONAL (id|nombre|precio S/|specs) ===\n"
+                + encode_rows(catalog, rows) + "\n\n" + prompt
+            ), solver_builds
+    return prompt, solver_builds
+
+
+def render_partial_quotes(partial_quotes):
+    """Markdown de las opciones que van llegando por streaming."""
+    text = ""
+    for qi in sorted(partial_quotes):
+        quote = partial_quotes[qi]
+        text += f"### {quote.get('title', 'Opcion')}\n"
+        for item in quote["components"]:
+            text += f"- {item.get('name', '')} - S/ {float(item.get('price', 0)):,.2f}\n"
+        text += "\n"
+    return text
+
+
+def render_quote_markdown(data, budget, catalog=None):
+    """
+    Texto final del asistente para una respuesta validada.
+    Con el mismo catalogo que la validacion reutiliza su clasificacion memoizada.
+    """
+    if data.get("needs_info"):
+        return data.get("message", "Por favor, indicame tu presupuesto y si necesitas Solo Torre o PC Completa.")
+    if not (data.get("is_quote") and data.get("quotes")):
+        return data.get("message", "Entendido. ¿En que mas puedo ayudarte?")
+
+    final_text = data.get("message", "He optimizado tu build con validacion matematica:") + "\n\n---\n"
+
+    for q in data["quotes"]:
+        components = q.get("components", [])
+        total = sum(float(item.get("price", 0)) for item in components)
+
+        # Calcular metricas de validacion
+        prices = extract_component_prices(components, catalog)
+        gpu_price = prices["gpu_price"]
+        cpu_price = prices["cpu_price"]
+        case_price = prices["case_price"]
+
+        multiplier = calculate_gpu_cpu_multiplier(gpu_price, cpu_price) if cpu_price > 0 else 0
+
+        # Encabezado de la opcion
+        final_text += f"### {q.get('title', 'Opcion')}\n"
+        final_text += f"**Estrategia:** {q.get('strategy', 'Balance optimizado')}\n\n"
+
+        # Listar componentes
+        for item in components:
+            link = f" - [Ver Aqui]({item['url']})" if item.get('url') else ""
+            insight = f"\n  💡 *{item['insight']}*" if item.get('insight') else ""
+            final_text += f"- {item['name']} - S/ {item['price']:,.2f}{link}{insight}\n"
+        if q.get("omitted"):
+            final_text += (f"- ⚠️ *Sin {', '.join(q['omitted'])}: ningun producto del catalogo entra en la "
+                           f"banda valida para este presupuesto, se cotiza aparte (no esta en el total).*\n")
+
+        # Totales y metricas
+        final_text += f"\n**💰 TOTAL: S/ {total:,.2f}**"
+
+        if budget:
+            diff = total - budget
+            margin_pct = (diff / budget) * 100
+
+            if abs(margin_pct) <= 10:
+                badge = "✅ Dentro del margen"
+            elif margin_pct > 10:
+                badge = "⚠️ Sobre presupuesto"
+            else:
+                badge = "⚠️ Bajo presupuesto"
+
+            final_text += f" ({margin_pct:+.1f}%) {badge}\n"
+        else:
+            final_text += "\n"
+
+        # Mostrar multiplicador GPU/CPU
+        if multiplier > 0:
+            min_m, max_m, critical_m = get_multiplier_range(budget or 5000)
+
+            if min_m <= multiplier <= max_m:
+                status = "✅ Balance optimo"
+            elif multiplier < min_m:
+                status = "⚠️ GPU debil"
+            elif multiplier > critical_m:
+                status = "❌ Cuello de botella"
+            else:
+                status = "⚠️ Fuera de rango"
+
+            final_text += f"**🔧 Multiplicador GPU/CPU:** {multiplier:.2f}x {status}\n"
+            final_text += f"   • GPU: S/ {gpu_price:,.2f} | CPU: S/ {cpu_price:,.2f}\n"
+
+        # Info del case
+        if case_price > 0 and budget:
+            case_pct = (case_price / budget) * 100
+            final_text += f"**🏠 Case:** S/ {case_price:,.2f} ({case_pct:.1f}% del presupuesto)\n"
+
+        final_text += "\n---\n"
+
+    return final_text
+
+
+def run_quote_turn(client, model_id, chat_session, chat_config, prompt, budget, pc_type, catalog,
+                   catalog_mode="slice", quote_cache=None, cache_key=None, on_progress=None,
+                   timer=None, streaming=STREAMING_ENABLED, candidates=SPECULATIVE_CANDIDATES,
+                   retry_delay=RETRY_DELAY, use_solver=True, history_budget=HISTORY_TOKEN_BUDGET,
+                   repair=REPAIR_ENABLED, fast_path=INTENT_FAST_PATH, max_attempts=MAX_RETRIES,
+                   prefetched=None):
+    """
+    Turno completo de cotizacion: prompt -> modelo -> validacion -> reintentos
+    con feedback -> markdown. No depende de Streamlit.
+    on_progress(texto) recibe el avance parcial cuando hay streaming.
+    history_budget: tokens del historial compactado con que queda el chat
+    (history.py); None conserva el historial completo con los reintentos.
+    repair: antes de gastar un reintento se intenta reparar la respuesta con
+    sustituciones del catalogo (repair.py).
+    fast_path: si falta el presupuesto o el tipo de PC, la pregunta se responde
+    localmente (intents.py) y el modelo recien se llama con ambos datos.
+    max_attempts: llamadas al modelo como maximo (el prefetch usa una sola).
+    prefetched: cotizacion ya generada para este presupuesto y tipo mientras el
+    usuario respondia (prefetch.py); si sigue valida se entrega sin el modelo.
+    use_solver: las builds del solver solo se inyectan en la primera cotizacion
+    de la conversacion y si el usuario no pidio piezas concretas; despues
+    ("cambia la GPU por una 4070") los componentes los elige el modelo.
+    cache_key: la clave no ve la conversacion, asi que el cache de cotizaciones
+    solo se usa en el turno que entrega la primera cotizacion sin piezas
+    pedidas; "gracias, ¿hacen envios?" despues de cotizar va al modelo.
+    """
+    timer = timer or StageTimer()
+    previous = chat_session.get_history()
+    base_history = previous if history_budget is not None else None
+    prior_quote = has_quote(previous)
+    first_quote = not prior_quote and not asks_for_parts(prompt)
+    use_solver = use_solver and first_quote
+    if not first_quote:
+        cache_key = None
+
+    # SLOT FILLING LOCAL: la pregunta "¿Solo Torre o PC Completa?" no necesita al modelo
+    if fast_path:
+        with timer.stage("intent"):
+            clarification = clarification_response(prompt, budget, pc_type)
+            if clarification is None and not prior_quote:
+                # Presupuesto por debajo de la build mas barata del catalogo: ni el modelo podria
+                clarification = budget_floor_response(budget, pc_type, catalog)
+        if clarification is not None:
+            chat_session = record_turn(client, model_id, chat_config, chat_session, base_history,
+                                       prompt, clarification, catalog, history_budget)
+            text = render_quote_markdown(clarification, budget, catalog)
+            return TurnResult(clarification, True, [], 0, text, chat_session, local=True)
+
+    # PREFETCH: la cotizacion se genero en segundo plano mientras el usuario respondia
+    if prefetched is not None:
+        with timer.stage("prefetch"):
+            hit = validate_response(prefetched, budget, catalog)[0]
+        if hit:
+            if quote_cache is not None and cache_key is not None:
+                quote_cache.put(cache_key, prefetched)
+            chat_session = record_turn(client, model_id, chat_config, chat_session, base_history,
+                                       prompt, prefetched, catalog, history_budget)
+            with timer.stage("render"):
+                text = render_quote_markdown(prefetched, budget, catalog)
+            return TurnResult(prefetched, True, [], 0, text, chat_session, prefetched=True)
+
+    # CACHE DE COTIZACIONES: mismo pedido + mismo catalogo = sin llamar al modelo
+    if quote_cache is not None and cache_key is not None:
+        with timer.stage("cache"):
+            cached = quote_cache.get(cache_key)
+            hit = cached is not None and validate_response(cached, budget, catalog)[0]
+        if hit:
+            # El turno queda en el historial para que el modelo conserve el contexto
+            chat_session = record_turn(client, model_id, chat_config, chat_session, base_history,
+                                       prompt, cached, catalog, history_budget)
+            with timer.stage("render"):
+                text = render_quote_markdown(cached, budget, catalog)
+            return TurnResult(cached, True, [], 0, text, chat_session, from_cache=True)
+
+    with timer.stage("prompt"):
+        current_prompt, solver_builds = compose_prompt(
+            prompt, budget, pc_type, catalog, catalog_mode, use_solver
+        )
+
+    def accept(data):
+        if not solver_builds and data.get("quotes"):
+            # ANCLAJE: nombres/URLs aproximados del modelo -> producto, precio y URL reales
+            with timer.stage("ground") as span:
+                span["fixed"] = ground_response(data, catalog) if catalog is not None else 0
+        # Componentes del solver + VALIDACION con matematica de ingenieria
+        with timer.stage("validate") as span:
+            if solver_builds and data.get("is_quote"):
+                data["quotes"] = apply_solver_builds(data.get("quotes"), solver_builds)
+            result = validate_response(data, budget, catalog)
+            span["rules"] = sorted({error_rule(err) for err in result[1]})
+        if result[0] or not repair:
+            return result
+        # REPARACION LOCAL: sustituciones del catalogo en milisegundos antes del reintento
+        with timer.stage("repair") as span:
+            quotes = repair_response(data, budget, catalog)
+            span["repaired"] = quotes is not None
+            if quotes is None:
+                return result
+            data["quotes"] = quotes
+            return validate_response(data, budget, catalog)
+
+    data = None
+    all_valid = False
+    accumulated_errors = []
+    attempts = 0
+
+    while attempts < max_attempts:
+        attempts += 1
+        if candidates > 1:
+            # CARRERA ESPECULATIVA: K candidatos en paralelo, gana el primero valido
+            with timer.stage("llm", attempt=attempts, candidates=candidates):
+                race = run_race(
+                    client, model_id, chat_config, chat_session.get_history(),
+                    current_prompt, accept, candidates=candidates
+                )
+            chat_session = client.chats.create(model=model_id, config=chat_config, history=race.history)
+            data = race.data
+            all_valid, accumulated_errors, last_details = race.is_valid, race.errors, race.details
+        elif streaming:
+            # STREAMING: cada componente se muestra y valida apenas llega
+            partial_quotes = {}
+            # En el ultimo intento no se aborta: siempre hay algo que mostrar
+            can_abort = not solver_builds and attempts < max_attempts
+
+            def on_value(path, value):
+                if len(path) == 3 and path[0] == "quotes" and path[2] == "title":
+                    partial_quotes.setdefault(path[1], {"components": []})["title"] = value
+                elif is_component_path(path) and isinstance(value, dict):
+                    if catalog is not None and not solver_builds:
+                        # Mismo anclaje que accept(): una URL casi correcta no aborta el stream
+                        value = ground_components([value], catalog)[0][0]
+                    quote = partial_quotes.setdefault(path[1], {"components": []})
+                    quote["components"].append(value)
+                    if on_progress:
+                        on_progress(render_partial_quotes(partial_quotes))
+                    if can_abort:
+                        errors = check_partial_build(budget, quote["components"], catalog)
+                        if repair:
+                            # Lo reparable se corrige al final sin otra llamada al modelo
+                            errors = [e for e in errors if e.startswith(UNREPAIRABLE_ERROR_PREFIXES)]
+                        return errors
+                return []
+
+            with timer.stage("llm", attempt=attempts, streaming=True) as span:
+                result = stream_response(chat_session, current_prompt, on_value)
+                span.update(usage_attributes(result.usage))
+                span["aborted"] = bool(result.aborted_errors)
+            if result.aborted_errors:
+                data = None
+                all_valid, accumulated_errors, last_details = False, result.aborted_errors, {}
+            else:
+                data = result.data
+                all_valid, accumulated_errors, last_details = accept(data)
+        else:
+            with timer.stage("llm", attempt=attempts) as span:
+                response = chat_session.send_message(current_prompt)
+                span.update(usage_attributes(getattr(response, "usage_metadata", None)))
+            with timer.stage("parse"):
+                data = json.loads(response.text)
+            all_valid, accumulated_errors, last_details = accept(data)
+
+        if all_valid:
+            if quote_cache is not None and data.get("is_quote"):
+                quote_cache.put(cache_key, data)
+            break
+        if attempts < max_attempts:
+            # Generar feedback tecnico interno
+            current_prompt = generate_feedback_prompt(accumulated_errors, last_details, attempts)
+            if candidates <= 1 and retry_delay:
+                time.sleep(retry_delay)
+
+    if history_budget is not None and data is not None:
+        # HISTORIAL COMPACTO: pedido original + respuesta final, sin los intentos
+        # fallidos ni la porcion del catalogo (se vuelve a adjuntar en cada turno)
+        with timer.stage("history") as span:
+            history = turn_history(base_history, prompt, data, catalog, history_budget)
+            chat_session = client.chats.create(model=model_id, config=chat_config, history=history)
+            span["tokens"] = history_tokens(history)
+
+    text = ""
+    if data:
+        with timer.stage("render"):
+            text = render_quote_markdown(data, budget, catalog)
+    return TurnResult(data, all_valid, accumulated_errors, attempts, text, chat_session)
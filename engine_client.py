@@ -0,0 +1,46 @@
+import json
+import urllib.error
+import urllib.request
+
+# --- CONSTANTES ---
+REQUEST_TIMEOUT = 120  # un turno con reintentos puede tardar varios segundos
+
+
+class RemoteQuoteService:
+    """
+    Cliente HTTP de server.py con la misma interfaz que QuoteService,
+    para que la app de Streamlit (u otro canal) no dependa del proceso del motor.
+    """
+
+    def __init__(self, base_url, timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=body,
+            method=method,
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def handle_message(self, conversation_id, text, on_progress=None):
+        # Sin streaming remoto: on_progress se ignora y llega el turno completo
+        return self._request("POST", f"/v1/conversations/{conversation_id}/messages", {"message": text})
+
+    def warm_conversation(self, conversation_id):
+        self._request("POST", f"/v1/conversations/{conversation_id}")
+
+    def conversation_state(self, conversation_id):
+        try:
+            return self._request("GET", f"/v1/conversations/{conversation_id}")
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    def close_conversation(self, conversation_id):
+        return self._request("DELETE", f"/v1/conversations/{conversation_id}").get("closed", False)
@@ -0,0 +1,145 @@
+"""
+Compactacion del historial del chat.
+
+Sin compactar, cada turno reenvia todo lo anterior: el prompt compuesto con la
+porcion del catalogo, cada JSON de cotizacion completo y los mensajes de
+feedback de los intentos fallidos. Al cerrar un turno el historial se rehace con:
+- el texto original del usuario (sin la porcion del catalogo, que se vuelve a
+  adjuntar en cada turno)
+- solo la respuesta final del modelo: los intentos fallidos y su feedback se descartan
+- las cotizaciones anteriores resumidas a ids + totales
+- una ventana deslizante de tokens: se descartan los turnos mas antiguos
+"""
+import os
+import json
+
+# --- CONSTANTES ---
+# Tokens estimados que puede ocupar el historial reenviado en cada turno
+HISTORY_TOKEN_BUDGET = int(os.getenv("KIWI_HISTORY_TOKENS", "4000"))
+# Respuestas de cotizacion mas recientes que se conservan completas
+HISTORY_FULL_QUOTES = int(os.getenv("KIWI_HISTORY_FULL_QUOTES", "1"))
+CHARS_PER_TOKEN = 4  # estimacion gruesa para texto en espanol + JSON
+SUMMARY_MESSAGE_CHARS = 240
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def content_entry(content):
+    """(rol, texto) de un Content del SDK o de su forma dict."""
+    if isinstance(content, dict):
+        role, parts = content.get("role"), content.get("parts") or []
+        texts = [p.get("text") if isinstance(p, dict) else getattr(p, "text", None) for p in parts]
+    else:
+        role, parts = getattr(content, "role", None), getattr(content, "parts", None) or []
+        texts = [getattr(p, "text", None) for p in parts]
+    return role or "user", "".join(t for t in texts if t)
+
+
+def make_content(role, text):
+    return {"role": role, "parts": [{"text": text}]}
+
+
+def summarize_quote_response(data, catalog=None):
+    """
+    Version compacta de una respuesta con cotizaciones: por cotizacion solo
+    titulo, ids del catalogo (o nombre si no esta) y total. Las respuestas sin
+    componentes (preguntas, resumenes previos) se devuelven tal cual.
+    """
+    quotes = data.get("quotes") or []
+    if not any(quote.get("components") for quote in quotes):
+        return data
+    summary = {
+        "needs_info": data.get("needs_info", False),
+        "is_quote": data.get("is_quote", True),
+        "message": (data.get("message") or "")[:SUMMARY_MESSAGE_CHARS],
+        "quotes": [],
+    }
+    for quote in quotes:
+        refs = []
+        total = 0.0
+        for item in quote.get("components") or []:
+            total += float(item.get("price", 0) or 0)
+            row = catalog.find_component(item) if catalog is not None else None
+            refs.append(catalog.ids[row] if row is not None else item.get("name", ""))
+        summary["quotes"].append({"title": quote.get("title", ""), "ids": refs, "total": round(total, 2)})
+    return summary
+
+
+def _compact_model_text(text, catalog):
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return text
+    if not isinstance(data, dict):
+        return text
+    summary = summarize_quote_response(data, catalog)
+    if summary is data:
+        return text
+    return json.dumps(summary, ensure_ascii=False, separators=(',', ':'))
+
+
+def _is_full_quote(role, text):
+    return role == "model" and '"components"' in text
+
+
+def compact_history(history, catalog=None, token_budget=HISTORY_TOKEN_BUDGET,
+                    full_quotes=HISTORY_FULL_QUOTES):
+    """
+    Historial compactado como lista de contents (dicts) para chats.create(history=...).
+    Idempotente: compactar un historial ya compactado no lo cambia.
+    """
+    entries = [content_entry(content) for content in history]
+
+    keep_full = full_quotes
+    for i in range(len(entries) - 1, -1, -1):
+        role, text = entries[i]
+        if not _is_full_quote(role, text):
+            continue
+        if keep_full > 0:
+            keep_full -= 1
+        else:
+            entries[i] = (role, _compact_model_text(text, catalog))
+
+    # Ventana deslizante: fuera los turnos mas antiguos, conservando siempre el ultimo
+    total = sum(estimate_tokens(text) for _, text in entries)
+    while total > token_budget and len(entries) > 2:
+        total -= estimate_tokens(entries.pop(0)[1])
+        while entries and entries[0][0] != "user" and len(entries) > 2:
+            total -= estimate_tokens(entries.pop(0)[1])
+
+    return [make_content(role, text) for role, text in entries]
+
+
+def turn_history(history, prompt, data, catalog=None, token_budget=HISTORY_TOKEN_BUDGET,
+                 full_quotes=HISTORY_FULL_QUOTES):
+    """
+    Historial al cerrar un turno: el de antes del turno + (pedido del usuario,
+    respuesta final), sin los intentos intermedios, compactado.
+    """
+    entries = list(history) + [
+        make_content("user", prompt),
+        make_content("model", json.dumps(data, ensure_ascii=False)),
+    ]
+    return compact_history(entries, catalog, token_budget, full_quotes)
+
+
+def has_quote(history):
+    """True si el modelo ya entrego una cotizacion en la conversacion (completa o resumida)."""
+    for content in history:
+        role, text = content_entry(content)
+        if role != "model" or '"quotes"' not in text:
+            continue
+        try:
+            data = json.loads(text)
+        except ValueError:
+            continue
+        if isinstance(data, dict) and data.get("is_quote") and data.get("quotes"):
+            return True
+    return False
+
+
+def history_tokens(history):
+    """Tokens estimados de un historial (para metricas y benchmark)."""
+    return sum(estimate_tokens(content_entry(content)[1]) for content in history)
@@ -0,0 +1,103 @@
+import os
+import re
+
+from validation import extract_budget
+
+# --- CONSTANTES ---
+# Sin presupuesto o sin tipo de PC la respuesta es una pregunta fija: no se llama al modelo
+INTENT_FAST_PATH = os.getenv("KIWI_FAST_PATH", "1") == "1"
+
+PC_TYPE_PATTERNS = (
+    ("PC Completa", re.compile(r'\bcomplet[ao]s?\b', re.IGNORECASE)),
+    # "torre de enfriamiento/refrigeracion" es un cooler, no el tipo de PC
+    ("Solo Torre", re.compile(
+        r'\btorres?\b(?!\s+de\s+(?:enfriamiento|refrigeraci))|\bsolo\s+(?:el\s+)?cpu\b', re.IGNORECASE
+    )),
+)
+# Pedidos de piezas o modelos concretos ("cambia la GPU por una 4070", "con Ryzen 7"):
+# las builds del solver no los respetan, los arma el modelo
+PART_REQUEST_PATTERN = re.compile(
+    r'\b(?:gpu|cpu|tarjeta\s+de\s+video|gr[aá]fica|procesador|placa|motherboard|ram|memoria|'
+    r'fuente|ssd|nvme|disco|case|gabinete|cooler|monitor|teclado|mouse|aud[ií]fonos|auriculares|'
+    r'rtx|gtx|rx\s*\d{3,4}|radeon|geforce|ryzen|intel|core\s+(?:i[3579]|ultra)|i[3579]-?\d{4,5}|'
+    r'ddr[345]|\d+\s*[gt]b|c[aá]mbia\w*|cambi[ao]r?|reemplaz\w*)\b', re.IGNORECASE
+)
+USE_CASE_PATTERNS = (
+    ("streaming", re.compile(r'stream\w*|twitch|transmitir|transmisiones', re.IGNORECASE)),
+    ("workstation", re.compile(
+        r'\b(?:workstation|edici[oó]n|editar|render\w*|dise[nñ]o|autocad|blender|'
+        r'modelado|3d|programar|programaci[oó]n|arquitectura)\b', re.IGNORECASE
+    )),
+    ("gaming", re.compile(r'\b(?:gam\w+|jugar|juegos?|fps|esports?)\b', re.IGNORECASE)),
+)
+# Mensajes que piden una cotizacion (o la empiezan) aunque no traigan ningun dato
+QUOTE_INTENT_PATTERN = re.compile(
+    r'\b(?:cotiz\w*|presupuesto|arm[aeo]\w*|pc|computador\w*|equipo|build|soles?)\b|s/', re.IGNORECASE
+)
+GREETING_PATTERN = re.compile(
+    r'^\s*(?:hola|holi|buen[oa]s?(?:\s+(?:dias|d[ií]as|tardes|noches))?|hey|saludos)\W*$', re.IGNORECASE
+)
+USE_CASE_LABELS = {
+    "gaming": "gaming",
+    "streaming": "gaming y streaming",
+    "workstation": "trabajo (edicion/render)",
+}
+
+
+def detect_pc_type(text):
+    """'PC Completa', 'Solo Torre' o None segun el mensaje."""
+    for pc_type, pattern in PC_TYPE_PATTERNS:
+        if pattern.search(text):
+            return pc_type
+    return None
+
+
+def asks_for_parts(text):
+    """True si el mensaje pide piezas o modelos concretos (fuera de la eleccion del tipo de PC)."""
+    for _, pattern in PC_TYPE_PATTERNS:
+        text = pattern.sub(" ", text)  # "solo el cpu" elige el tipo, no una pieza
+    return PART_REQUEST_PATTERN.search(text) is not None
+
+
+def detect_use_case(text):
+    """'streaming', 'workstation', 'gaming' o None (el primero que aparezca en ese orden)."""
+    for use_case, pattern in USE_CASE_PATTERNS:
+        if pattern.search(text):
+            return use_case
+    return None
+
+
+def clarification_response(text, budget, pc_type):
+    """
+    Slot filling local: si el pedido es de cotizacion y falta el presupuesto o
+    el tipo de PC, retorna la respuesta needs_info que el protocolo del modelo
+    daria en ese caso (mismo formato JSON). None si ya estan ambos datos o si
+    el mensaje no parece un pedido de cotizacion (lo responde el modelo).
+    Lo decide el mensaje, no los datos ya conocidos: con presupuesto,
+    "¿hacen envios a Arequipa?" no recibe otra vez la pregunta del tipo.
+    """
+    if budget and pc_type:
+        return None
+    use_case = detect_use_case(text)
+    if not (use_case or detect_pc_type(text) or extract_budget(text)
+            or QUOTE_INTENT_PATTERN.search(text) or GREETING_PATTERN.match(text)):
+        return None
+
+    known = []
+    if use_case:
+        known.append(f"PC para {USE_CASE_LABELS[use_case]}")
+    if pc_type:
+        known.append(pc_type)
+    if budget:
+        known.append(f"presupuesto de S/ {budget:,.0f}")
+    message = f"Perfecto: {', '.join(known)}. " if known else ""
+
+    if not budget and not pc_type:
+        message += ("Para cotizar necesito dos datos: ¿cual es tu presupuesto en soles y deseas "
+                    "solo la Torre o la PC Completa con monitor y perifericos?")
+    elif not budget:
+        message += "¿Cual es tu presupuesto aproximado en soles?"
+    else:
+        message += ("¿Deseas una cotizacion para solo la Torre o la PC Completa con monitor "
+                    "y perifericos?")
+    return {"needs_info": True, "is_quote": False, "message": message}
@@ -0,0 +1,410 @@
+"""
+Cliente de Gemini compartido por el proceso.
+
+- get_client(): un solo genai.Client por API key (su pool HTTP keep-alive se
+  reutiliza en todas las sesiones y reruns)
+- FairLimiter: maximo de llamadas simultaneas al modelo en todo el proceso con
+  cola FIFO acotada; quien espera recibe su posicion ("estas en cola...") y si
+  la cola esta llena se rechaza con Overloaded (backpressure) en vez de sumar
+  429s. Un 429 se reintenta con backoff sin soltar el cupo, frenando la cola.
+- single-flight: prompts identicos en vuelo (mismo modelo, contexto, historial
+  y mensaje) comparten una sola llamada; los seguidores copian la respuesta en
+  su propio historial. Las carreras especulativas (aio) no se agrupan: piden
+  varias muestras del mismo prompt a proposito.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+from history import content_entry, make_content
+from telemetry import METRICS
+
+# --- CONSTANTES ---
+LLM_MAX_CONCURRENT = int(os.getenv("KIWI_LLM_MAX_CONCURRENT", "8"))
+LLM_MAX_QUEUE = int(os.getenv("KIWI_LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("KIWI_LLM_QUEUE_TIMEOUT", "30"))  # segundos esperando cupo
+RATE_LIMIT_RETRIES = 2
+RATE_LIMIT_BACKOFF = 1.0  # segundos, se duplica en cada reintento
+
+logger = logging.getLogger("kiwi.llm")
+
+
+class Overloaded(Exception):
+    """Cola del modelo llena o espera vencida: el turno se rechaza sin llamar a la API."""
+
+
+def is_rate_limited(error):
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return code == 429 or "RESOURCE_EXHAUSTED" in str(error)
+
+
+# Por contexto y no por hilo: cada hilo arranca con el suyo y cada tarea async
+# hereda el de quien la creo (las carreras corren en un loop compartido)
+_on_wait = contextvars.ContextVar("kiwi_on_wait", default=None)
+
+
+@contextmanager
+def queue_listener(callback):
+    """
+    callback(posicion) recibe la posicion en cola de las llamadas de este hilo
+    (o de esta tarea async y las que cree). Las llamadas async la toman al pedir
+    cupo (acquire_async), antes de pasar la espera a otro hilo.
+    """
+    token = _on_wait.set(callback)
+    try:
+        yield
+    finally:
+        _on_wait.reset(token)
+
+
+def current_listener():
+    """Aviso de cola activo en este contexto (None si no hay)."""
+    return _on_wait.get()
+
+
+class FairLimiter:
+    """Semaforo con cola FIFO acotada: el cupo se entrega por orden de llegada."""
+
+    def __init__(self, max_concurrent=LLM_MAX_CONCURRENT, max_queue=LLM_MAX_QUEUE,
+                 timeout=LLM_QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.queue = deque()
+        self.cond = threading.Condition()
+
+    def acquire(self, on_wait=None):
+        """
+        Toma un cupo o espera su turno en la cola. on_wait(posicion) se avisa
+        cada vez que cambia la posicion (por defecto el de queue_listener) y
+        se llama sin el lock: un render lento o con error no frena la cola.
+        """
+        if on_wait is None:
+            on_wait = _on_wait.get()
+        start = time.perf_counter()
+        with self.cond:
+            if self.active < self.max_concurrent and not self.queue:
+                self.active += 1
+                return
+            if len(self.queue) >= self.max_queue:
+                METRICS.inc("kiwi_llm_rejected_total", reason="queue_full")
+                raise Overloaded(f"Cola del modelo llena ({self.max_queue} en espera)")
+            ticket = object()
+            self.queue.append(ticket)
+        granted = False
+        notified = None
+        try:
+            while not granted:
+                position = None
+                with self.cond:
+                    while True:
+                        if self.queue[0] is ticket and self.active < self.max_concurrent:
+                            self.queue.popleft()
+                            self.active += 1
+                            granted = True
+                            if self.queue and self.active < self.max_concurrent:
+                                self.cond.notify_all()  # el siguiente tambien tiene cupo
+                            break
+                        position = self.queue.index(ticket) + 1
+                        if on_wait and position != notified:
+                            break
+                        remaining = start + self.timeout - time.perf_counter()
+                        if remaining <= 0:
+                            METRICS.inc("kiwi_llm_rejected_total", reason="timeout")
+                            raise Overloaded(f"Sin cupo del modelo despues de {self.timeout:g} s")
+                        self.cond.wait(remaining)
+                if not granted:
+                    notified = position
+                    try:
+                        on_wait(position)
+                    except Exception:
+                        logger.exception("Fallo el aviso de posicion en cola")
+        finally:
+            if not granted:
+                with self.cond:
+                    if ticket in self.queue:
+                        self.queue.remove(ticket)
+                        self.cond.notify_all()
+        METRICS.observe("kiwi_llm_queue_seconds", time.perf_counter() - start)
+
+    def free_slots(self):
+        """Cupos libres ahora mismo (0 si hay alguien en cola)."""
+        with self.cond:
+            return 0 if self.queue else max(0, self.max_concurrent - self.active)
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    async def acquire_async(self, on_wait=None):
+        # La espera corre en otro hilo, que no ve el queue_listener de esta
+        # tarea: el aviso se toma aqui y se pasa explicito. Si la tarea se cancela, el
+        # cupo obtenido se devuelve
+        if on_wait is None:
+            on_wait = _on_wait.get()
+        future = asyncio.ensure_future(asyncio.to_thread(self.acquire, on_wait))
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda f: f.cancelled() or f.exception() or self.release())
+            raise
+
+    def call(self, fn, on_wait=None):
+        """fn() con cupo; los 429 se reintentan con backoff sin soltar el cupo."""
+        self.acquire(on_wait)
+        try:
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                try:
+                    return fn()
+                except Exception as e:
+                    if attempt == RATE_LIMIT_RETRIES or not is_rate_limited(e):
+                        raise
+                    METRICS.inc("kiwi_llm_rate_limited_total")
+                    time.sleep(RATE_LIMIT_BACKOFF * 2 ** attempt * random.uniform(0.8, 1.2))
+        finally:
+            self.release()
+
+    def call_stream(self, factory, on_wait=None):
+        """Stream con cupo hasta terminar de consumirlo; un 429 antes del primer chunk se reintenta."""
+        self.acquire(on_wait)
+        try:
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                started = False
+                try:
+                    for chunk in factory():
+                        started = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    if started or attempt == RATE_LIMIT_RETRIES or not is_rate_limited(e):
+                        raise
+                    METRICS.inc("kiwi_llm_rate_limited_total")
+                    time.sleep(RATE_LIMIT_BACKOFF * 2 ** attempt * random.uniform(0.8, 1.2))
+        finally:
+            self.release()
+
+    async def call_async(self, fn, on_wait=None):
+        await self.acquire_async(on_wait)
+        try:
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                try:
+                    return await fn()
+                except Exception as e:
+                    if attempt == RATE_LIMIT_RETRIES or not is_rate_limited(e):
+                        raise
+                    METRICS.inc("kiwi_llm_rate_limited_total")
+                    await asyncio.sleep(RATE_LIMIT_BACKOFF * 2 ** attempt * random.uniform(0.8, 1.2))
+        finally:
+            self.release()
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.ok = False
+
+
+class SingleFlight:
+    """Agrupa llamadas identicas en vuelo: un lider llama, los demas esperan su resultado."""
+
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    def _join(self, key):
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self.flights[key] = _Flight()
+            return flight, True
+
+    def _land(self, key, flight):
+        with self.lock:
+            self.flights.pop(key, None)
+        flight.event.set()
+
+    def run(self, key, fn):
+        """(resultado, compartido). Si el lider falla, cada seguidor llama por su cuenta."""
+        flight, leader = self._join(key)
+        if leader:
+            try:
+                flight.result = fn()
+                flight.ok = True
+                return flight.result, False
+            finally:
+                self._land(key, flight)
+        flight.event.wait()
+        if flight.ok:
+            METRICS.inc("kiwi_llm_coalesced_total")
+            return flight.result, True
+        return fn(), False
+
+    def run_stream(self, key, factory, on_shared):
+        """
+        Version streaming: el lider entrega los chunks a medida que llegan; los
+        seguidores los reciben todos al terminar (on_shared(chunks) al final).
+        Si el lider no consume el stream completo, los seguidores hacen el suyo.
+        """
+        flight, leader = self._join(key)
+        if leader:
+            chunks = []
+            try:
+                for chunk in factory():
+                    chunks.append(chunk)
+                    yield chunk
+                flight.result = chunks
+                flight.ok = True
+            finally:
+                self._land(key, flight)
+            return
+        flight.event.wait()
+        if not flight.ok:
+            yield from factory()
+            return
+        METRICS.inc("kiwi_llm_coalesced_total")
+        yield from flight.result
+        on_shared(flight.result)
+
+
+def flight_key(model, config, history, message):
+    context = getattr(config, "cached_content", None) or str(getattr(config, "system_instruction", ""))
+    digest = hashlib.sha256()
+    parts = (model, context, getattr(config, "temperature", None),
+             json.dumps([content_entry(c) for c in history], ensure_ascii=False), message)
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class PooledChat:
+    """Chat con cupo global y single-flight; misma interfaz que el chat del SDK."""
+
+    def __init__(self, pool, create, model, config, history):
+        self.pool = pool
+        self.create = create
+        self.model = model
+        self.config = config
+        self.chat = create(model=model, config=config, history=history)
+
+    def get_history(self):
+        return self.chat.get_history()
+
+    def __getattr__(self, name):
+        return getattr(self.chat, name)
+
+    def _record(self, message, text):
+        # El seguidor no llamo a la API: se agrega el intercambio a su propio historial
+        self.chat = self.create(
+            model=self.model,
+            config=self.config,
+            history=self.chat.get_history() + [make_content("user", message), make_content("model", text)]
+        )
+
+    def send_message(self, message):
+        key = flight_key(self.model, self.config, self.chat.get_history(), message)
+        response, shared = self.pool.flights.run(
+            key, lambda: self.pool.limiter.call(lambda: self.chat.send_message(message))
+        )
+        if shared:
+            self._record(message, response.text or "")
+        return response
+
+    def send_message_stream(self, message):
+        key = flight_key(self.model, self.config, self.chat.get_history(), message)
+        return self.pool.flights.run_stream(
+            key,
+            lambda: self.pool.limiter.call_stream(lambda: self.chat.send_message_stream(message)),
+            lambda chunks: self._record(message, "".join(c.text or "" for c in chunks))
+        )
+
+
+class PooledAsyncChat:
+    """Chat asincrono con cupo global (sin single-flight: ver docstring del modulo)."""
+
+    def __init__(self, pool, create, model, config, history):
+        self.pool = pool
+        self.chat = create(model=model, config=config, history=history)
+
+    def get_history(self):
+        return self.chat.get_history()
+
+    async def send_message(self, message):
+        return await self.pool.limiter.call_async(lambda: self.chat.send_message(message))
+
+
+class _PooledChats:
+    def __init__(self, pool, chats, chat_class):
+        self.pool = pool
+        self.chats = chats
+        self.chat_class = chat_class
+
+    def create(self, model=None, config=None, history=None):
+        return self.chat_class(self.pool, self.chats.create, model, config, history)
+
+
+class _PooledAio:
+    def __init__(self, pool, aio):
+        self.aio = aio
+        self.chats = _PooledChats(pool, aio.chats, PooledAsyncChat)
+
+    def __getattr__(self, name):
+        return getattr(self.aio, name)
+
+
+class PooledClient:
+    """Envoltura de genai.Client: chats (sync y aio) pasan por el limitador y single-flight."""
+
+    def __init__(self, client, limiter=None):
+        self.client = client
+        self.limiter = limiter or get_limiter()
+        self.flights = SingleFlight()
+        self.chats = _PooledChats(self, client.chats, PooledChat)
+        if getattr(client, "aio", None) is not None:
+            self.aio = _PooledAio(self, client.aio)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)  # caches, models, ...
+
+
+def pooled(client):
+    return client if isinstance(client, PooledClient) else PooledClient(client)
+
+
+_limiter = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_limiter():
+    """Limitador unico del proceso: el cupo es global aunque haya varios clientes."""
+    global _limiter
+    if _limiter is None:
+        with _lock:
+            if _limiter is None:
+                _limiter = FairLimiter()
+    return _limiter
+
+
+def get_client(api_key):
+    """Un PooledClient por API key para todo el proceso."""
+    if api_key not in _clients:
+        from google import genai
+
+        limiter = get_limiter()
+        with _lock:
+            if api_key not in _clients:
+                _clients[api_key] = PooledClient(genai.Client(api_key=api_key), limiter)
+    return _clients[api_key]
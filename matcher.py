@@ -0,0 +1,135 @@
+import os
+from collections import Counter
+from functools import lru_cache
+
+from catalog import url_slug
+from classifier import CRITICAL_SLOTS, classify_name
+from retrieval import tokenize
+
+# --- CONSTANTES ---
+# Confianza minima (Dice sobre trigramas + tokens) para reemplazar un componente
+MATCH_MIN_SCORE = float(os.getenv("KIWI_MATCH_MIN_SCORE", "0.6"))
+MATCH_CANDIDATES = 8  # filas con mas rasgos en comun que se puntuan exactamente
+# Rasgos presentes en mas de esta fraccion del catalogo (" rt", "#gb") no sirven
+# para elegir candidatos y son la mayor parte del costo: solo cuentan en el Dice final
+MATCH_MAX_DF = 0.05
+
+
+def name_features(text):
+    """
+    Rasgos de un nombre o slug: trigramas del texto normalizado (tolera
+    letras cambiadas y palabras pegadas) + tokens completos (modelos como '4060').
+    """
+    tokens = tokenize(text.replace('-', ' '))
+    padded = f" {' '.join(tokens)} "
+    features = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    features.update("#" + token for token in tokens)
+    return features
+
+
+class NameMatcher:
+    """
+    Indice invertido rasgo -> filas sobre nombre (n) y slug de URL (l).
+    match() cuenta rasgos poco frecuentes compartidos con Counter (en C),
+    puntua los mejores MATCH_CANDIDATES con Dice exacto sobre todos los rasgos
+    y retorna (fila, confianza).
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.features = []
+        postings = {}
+        for row in range(len(catalog)):
+            features = frozenset(name_features(catalog.names[row] + " " + catalog.slugs[row]))
+            self.features.append(features)
+            for feature in features:
+                postings.setdefault(feature, []).append(row)
+        self.postings = {feature: tuple(rows) for feature, rows in postings.items()}
+        max_rows = max(1, int(len(catalog) * MATCH_MAX_DF))
+        self.selective = {feature: rows for feature, rows in self.postings.items() if len(rows) <= max_rows}
+
+    def match(self, name="", url=""):
+        query = name_features(f"{name} {url_slug(url)}")
+        if not query:
+            return None, 0.0
+        counts = Counter()
+        for postings in (self.selective, self.postings):
+            for feature in query:
+                rows = postings.get(feature)
+                if rows:
+                    counts.update(rows)
+            if counts:
+                break  # solo si ningun rasgo es selectivo se cuentan los frecuentes
+
+        best_row, best_score = None, 0.0
+        for row, _ in counts.most_common(MATCH_CANDIDATES):
+            features = self.features[row]
+            score = 2 * len(query & features) / (len(query) + len(features))
+            if score > best_score:
+                best_row, best_score = row, score
+        return best_row, best_score
+
+
+@lru_cache(maxsize=4)
+def get_name_matcher(catalog):
+    """Indice compartido por proceso, uno por indice de catalogo."""
+    return NameMatcher(catalog)
+
+
+def match_component(item, catalog, min_score=MATCH_MIN_SCORE):
+    """
+    Fila del catalogo para un componente cotizado y su confianza:
+    1.0 si el id/URL existe tal cual; si no, la mejor coincidencia difusa de
+    nombre + slug, descartada si no alcanza min_score o si el nombre indica
+    otro slot critico (una GPU no se ancla a un CPU parecido).
+    """
+    row = catalog.find_component(item)
+    if row is not None:
+        return row, 1.0
+    name = item.get("name", "")
+    row, score = get_name_matcher(catalog).match(name, item.get("url", ""))
+    if row is None or score < min_score:
+        return None, score
+    expected = classify_name(name)
+    slot = catalog.slot(row)
+    if expected and slot in CRITICAL_SLOTS and slot != expected:
+        return None, score
+    return row, score
+
+
+def ground_components(components, catalog, min_score=MATCH_MIN_SCORE):
+    """
+    Ancla cada componente a su producto del catalogo: nombre, precio y URL
+    reales, conservando el insight del modelo. Los que no alcanzan la
+    confianza minima quedan tal cual (la validacion los reporta).
+    Retorna (componentes, cantidad de componentes corregidos).
+    """
+    grounded = []
+    fixed = 0
+    for item in components:
+        row = catalog.find_component(item)
+        if row is not None:
+            # Citado por id (catalogo compacto): la URL se completa aqui
+            grounded.append(item if item.get("url") else dict(item, url=catalog.item(row)["l"]))
+            continue
+        row, _ = match_component(item, catalog, min_score)
+        if row is None:
+            grounded.append(item)
+            continue
+        grounded.append(dict(
+            item,
+            name=catalog.names[row],
+            price=catalog.prices[row],
+            url=catalog.item(row)["l"],
+        ))
+        fixed += 1
+    return grounded, fixed
+
+
+def ground_response(data, catalog, min_score=MATCH_MIN_SCORE):
+    """Aplica ground_components() a cada cotizacion de la respuesta. Retorna los corregidos."""
+    fixed = 0
+    for quote in data.get("quotes") or []:
+        quote["components"], n = ground_components(quote.get("components") or [], catalog, min_score)
+        fixed += n
+    return fixed
@@ -0,0 +1,219 @@
+"""
+Prefetch especulativo: cuando el usuario ya dio el presupuesto pero falta el
+tipo de PC, mientras responde "¿Solo Torre o PC Completa?" se generan y
+validan en segundo plano las dos cotizaciones. Al responder, la que
+corresponde se entrega sin esperar al modelo y la otra se cancela.
+
+Limites del gasto especulativo:
+- PREFETCH_WORKERS turnos especulativos en vuelo por proceso y a lo mas
+  PREFETCH_MAX_PENDING en cola (si no caben, no se especula)
+- un solo intento por cotizacion: sin reintentos con feedback (la reparacion
+  local si se aplica); si no queda valida se descarta
+- solo arranca si el modelo tiene mas de PREFETCH_RESERVED_SLOTS cupos libres
+  y nadie en cola (los turnos reales tienen prioridad, llm_client.py)
+- como maximo PREFETCH_PER_MINUTE turnos especulativos por minuto
+
+Si la elegida sigue en vuelo se espera a lo mas PREFETCH_WAIT segundos (mas o
+menos una vuelta al modelo): la espera corre con la conversacion tomada, asi
+que un trabajo lento no puede costar mas que el turno normal que lo reemplaza.
+
+Cancelacion: la opcion no elegida, las conversaciones cerradas o expiradas y
+las respuestas con algo mas que el tipo ("solo torre pero con RTX 4070"). Un
+trabajo que aun no empezo se descarta; uno en vuelo corta el stream en el
+siguiente componente.
+"""
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from retrieval import tokenize, STOPWORDS
+from telemetry import METRICS
+
+# --- CONSTANTES ---
+PREFETCH_ENABLED = os.getenv("KIWI_PREFETCH", "1") == "1"
+PREFETCH_WORKERS = int(os.getenv("KIWI_PREFETCH_WORKERS", "2"))
+PREFETCH_MAX_PENDING = int(os.getenv("KIWI_PREFETCH_MAX_PENDING", "16"))
+PREFETCH_PER_MINUTE = int(os.getenv("KIWI_PREFETCH_PER_MINUTE", "30"))
+PREFETCH_RESERVED_SLOTS = int(os.getenv("KIWI_PREFETCH_RESERVED_SLOTS", "2"))
+PREFETCH_TTL = float(os.getenv("KIWI_PREFETCH_TTL", "600"))  # segundos que vale una cotizacion especulativa
+PREFETCH_WAIT = float(os.getenv("KIWI_PREFETCH_WAIT", "3"))  # espera por una que sigue en vuelo
+PREFETCH_PC_TYPES = ("Solo Torre", "PC Completa")
+# Palabras de cortesia o del presupuesto que no cambian el pedido ("la completa, gracias")
+ANSWER_FILLER = {"favor", "porfa", "gracias", "nomas", "ok", "si", "bueno", "dale", "entonces",
+                 "perfecto", "mejor", "opcion", "esa", "eso", "s", "mil", "k"}
+
+
+class PrefetchCancelled(Exception):
+    """El trabajo especulativo se cancelo mientras generaba."""
+
+
+def is_plain_answer(text):
+    """True si el mensaje solo elige el tipo de PC ('solo torre', 'PC completa, gracias')."""
+    return all(
+        token in STOPWORDS or token in ANSWER_FILLER or token.replace('.', '').isdigit()
+        for token in tokenize(text)
+    )
+
+
+class PrefetchJob:
+    """Una cotizacion especulativa (conversacion, presupuesto, tipo, version del catalogo)."""
+
+    def __init__(self, conversation_id, budget, pc_type, catalog_hash):
+        self.conversation_id = conversation_id
+        self.budget = budget
+        self.pc_type = pc_type
+        self.catalog_hash = catalog_hash
+        self.created = time.time()
+        self.started = False
+        self.data = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check(self, *_):
+        # Se pasa como on_progress del turno: corta el stream al cancelar
+        if self.cancelled.is_set():
+            raise PrefetchCancelled()
+
+
+class Prefetcher:
+    """Pool de trabajos especulativos por conversacion con limites de gasto."""
+
+    def __init__(self, limiter=None, workers=PREFETCH_WORKERS, max_pending=PREFETCH_MAX_PENDING,
+                 per_minute=PREFETCH_PER_MINUTE, reserved_slots=PREFETCH_RESERVED_SLOTS,
+                 ttl=PREFETCH_TTL, wait=PREFETCH_WAIT):
+        self.limiter = limiter
+        self.max_pending = max_pending
+        self.per_minute = per_minute
+        self.reserved_slots = reserved_slots
+        self.ttl = ttl
+        self.wait = wait
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kiwi-prefetch")
+        self.jobs = {}  # conversation_id -> {pc_type: PrefetchJob}
+        self.pending = 0
+        self.starts = deque()  # inicios del ultimo minuto
+        self.lock = threading.Lock()
+
+    def schedule(self, conversation_id, budget, catalog_hash, run):
+        """
+        Encola Solo Torre y PC Completa para la conversacion (una vez por
+        presupuesto y catalogo). run(pc_type, on_progress) -> TurnResult.
+        """
+        now = time.time()
+        with self.lock:
+            self._purge(now)
+            jobs = self.jobs.get(conversation_id)
+            if jobs and all(job.budget == budget and job.catalog_hash == catalog_hash
+                            for job in jobs.values()):
+                return False
+            for job in (jobs or {}).values():
+                job.cancel()
+            if self.pending + len(PREFETCH_PC_TYPES) > self.max_pending:
+                self.jobs.pop(conversation_id, None)
+                METRICS.inc("kiwi_prefetch_total", outcome="dropped")
+                return False
+            jobs = {
+                pc_type: PrefetchJob(conversation_id, budget, pc_type, catalog_hash)
+                for pc_type in PREFETCH_PC_TYPES
+            }
+            self.jobs[conversation_id] = jobs
+            self.pending += len(jobs)
+        for job in jobs.values():
+            self.executor.submit(self._run, job, run)
+        return True
+
+    def _purge(self, now):
+        # Conversaciones que nunca respondieron: sus trabajos se cancelan y se olvidan
+        expired = [cid for cid, jobs in self.jobs.items()
+                   if any(now - job.created > self.ttl for job in jobs.values())]
+        for cid in expired:
+            for job in self.jobs.pop(cid).values():
+                job.cancel()
+
+    def _admit(self):
+        """None si el trabajo puede arrancar; si no, el motivo ('rate' | 'busy')."""
+        now = time.time()
+        with self.lock:
+            while self.starts and now - self.starts[0] > 60:
+                self.starts.popleft()
+            if len(self.starts) >= self.per_minute:
+                return "rate"
+            if self.limiter is not None and self.limiter.free_slots() <= self.reserved_slots:
+                return "busy"
+            self.starts.append(now)
+        return None
+
+    def _run(self, job, run):
+        with self.lock:
+            self.pending -= 1
+        outcome = "cancelled"
+        try:
+            if job.cancelled.is_set():
+                return
+            if time.time() - job.created > self.ttl:
+                outcome = "expired"
+                return
+            reason = self._admit()
+            if reason:
+                outcome = f"skipped_{reason}"
+                return
+            job.started = True
+            turn = run(job.pc_type, job.check)
+            if job.cancelled.is_set():
+                return
+            if turn.is_valid and turn.data and turn.data.get("is_quote"):
+                job.data = turn.data
+                outcome = "ready"
+            else:
+                outcome = "invalid"
+        except PrefetchCancelled:
+            outcome = "cancelled"
+        except Exception:
+            outcome = "error"
+        finally:
+            job.done.set()
+            METRICS.inc("kiwi_prefetch_total", outcome=outcome)
+
+    def take(self, conversation_id, budget, pc_type, catalog_hash):
+        """
+        Cotizacion especulativa para el tipo elegido, o None. Si sigue en vuelo
+        se espera hasta self.wait segundos y despues se cancela (el turno normal
+        la reemplaza); las demas opciones se cancelan.
+        """
+        with self.lock:
+            jobs = self.jobs.pop(conversation_id, None)
+        if not jobs:
+            return None
+        job = jobs.get(pc_type)
+        for other in jobs.values():
+            if other is not job:
+                other.cancel()
+        if job is None:
+            return None
+        fresh = (job.budget == budget and job.catalog_hash == catalog_hash
+                 and time.time() - job.created <= self.ttl)
+        if not fresh or not (job.started or job.done.is_set()):
+            # Sin empezar (o de otro presupuesto/catalogo): el turno normal hace el mismo trabajo
+            job.cancel()
+            METRICS.inc("kiwi_prefetch_served_total", outcome="miss")
+            return None
+        if not job.done.wait(self.wait):
+            job.cancel()
+            METRICS.inc("kiwi_prefetch_served_total", outcome="late")
+            return None
+        if job.data is None:
+            METRICS.inc("kiwi_prefetch_served_total", outcome="miss")
+            return None
+        METRICS.inc("kiwi_prefetch_served_total", outcome="hit")
+        return job.data
+
+    def discard(self, conversation_id):
+        """Cancela los trabajos de la conversacion (cerrada, expirada o pedido distinto)."""
+        with self.lock:
+            jobs = self.jobs.pop(conversation_id, None)
+        for job in (jobs or {}).values():
+            job.cancel()
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from retrieval import tokenize
+
+# --- CONSTANTES ---
+QUOTE_CACHE_ENABLED = os.getenv("KIWI_QUOTE_CACHE", "1") == "1"
+QUOTE_CACHE_SIZE = int(os.getenv("KIWI_QUOTE_CACHE_SIZE", "256"))
+QUOTE_CACHE_TTL = float(os.getenv("KIWI_QUOTE_CACHE_TTL", "21600"))  # 6 horas
+# Ruta del SQLite (vacio = solo memoria)
+QUOTE_CACHE_DB = os.getenv("KIWI_QUOTE_CACHE_DB", "")
+BUDGET_BUCKET = 100  # S/5000 y S/5040 comparten entrada; el hit se revalida igual
+
+# Sinonimos de uso -> intencion canonica
+USE_CASE_KEYWORDS = {
+    "gamer": "gaming", "gaming": "gaming", "juegos": "gaming", "jugar": "gaming", "juego": "gaming",
+    "edicion": "edicion", "editar": "edicion", "video": "edicion", "render": "edicion",
+    "diseno": "edicion", "3d": "edicion",
+    "stream": "streaming", "streaming": "streaming", "streamear": "streaming",
+    "oficina": "oficina", "trabajo": "oficina", "estudios": "oficina", "estudiar": "oficina",
+    "programacion": "programacion", "programar": "programacion",
+    "ia": "ia", "ai": "ia",
+}
+
+
+def normalize_intent(text):
+    """
+    Usos canonicos del pedido (USE_CASE_KEYWORDS); el resto de palabras no
+    entra en la clave para que el relleno no divida el cache:
+    'hola, tengo 5000 soles para PC gamer por favor' -> ('gaming',)
+    'Tengo 5000 soles' -> () (cotizacion generica)
+    """
+    return tuple(sorted({USE_CASE_KEYWORDS[token] for token in tokenize(text) if token in USE_CASE_KEYWORDS}))
+
+
+def quote_cache_key(text, budget, pc_type, catalog_hash):
+    """
+    Clave (version del catalogo, banda de presupuesto, tipo, intencion). None si
+    no es cacheable. No incluye la conversacion: run_quote_turn solo la usa en
+    el turno de la primera cotizacion.
+    """
+    if not budget or not pc_type:
+        return None
+    bucket = int(round(budget / BUDGET_BUCKET)) * BUDGET_BUCKET
+    return f"{catalog_hash}|{bucket}|{pc_type}|{'+'.join(normalize_intent(text))}"
+
+
+class QuoteCache:
+    """
+    Cache LRU + TTL de respuestas validadas. Con db_path tambien persiste en
+    SQLite para sobrevivir reinicios; al abrir borra entradas de otros catalogos.
+    """
+
+    def __init__(self, max_size=QUOTE_CACHE_SIZE, ttl=QUOTE_CACHE_TTL, db_path=None, catalog_hash=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # clave -> (creado, data)
+        self.lock = threading.Lock()
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS quotes ("
+                "key TEXT PRIMARY KEY, catalog_hash TEXT, created REAL, data TEXT)"
+            )
+            if catalog_hash:
+                self.db.execute("DELETE FROM quotes WHERE catalog_hash != ?", (catalog_hash,))
+            self.db.execute("DELETE FROM quotes WHERE created < ?", (time.time() - ttl,))
+            self.db.commit()
+
+    def get(self, key):
+        """Copia de la respuesta guardada o None (ausente o vencida)."""
+        if key is None:
+            return None
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None and self.db is not None:
+                row = self.db.execute("SELECT created, data FROM quotes WHERE key = ?", (key,)).fetchone()
+                if row:
+                    entry = (row[0], row[1])
+                    self.entries[key] = entry
+            if entry is None:
+                return None
+            if now - entry[0] > self.ttl:
+                self._delete(key)
+                return None
+            self.entries.move_to_end(key)
+            self._evict()
+            return json.loads(entry[1])
+
+    def put(self, key, data):
+        """Guarda una respuesta que ya paso validate_build()."""
+        if key is None:
+            return
+        entry = (time.time(), json.dumps(data, ensure_ascii=False))
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self._evict()
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO quotes (key, catalog_hash, created, data) VALUES (?, ?, ?, ?)",
+                    (key, key.split('|', 1)[0], entry[0], entry[1])
+                )
+                self.db.commit()
+
+    def rekey(self, old_hash, new_hash, keep):
+        """
+        Recarga del catalogo: las entradas de old_hash cuya respuesta sigue
+        vigente (keep(data) -> bool) pasan a new_hash; el resto se descarta.
+        Retorna (conservadas, descartadas).
+        """
+        prefix = old_hash + '|'
+        kept = dropped = 0
+        with self.lock:
+            entries = {k: v for k, v in self.entries.items() if k.startswith(prefix)}
+            if self.db is not None:
+                rows = self.db.execute(
+                    "SELECT key, created, data FROM quotes WHERE catalog_hash = ?", (old_hash,)
+                ).fetchall()
+                for key, created, data in rows:
+                    entries.setdefault(key, (created, data))
+                self.db.execute("DELETE FROM quotes WHERE catalog_hash = ?", (old_hash,))
+
+            for key, (created, data) in entries.items():
+                self.entries.pop(key, None)
+                if not keep(json.loads(data)):
+                    dropped += 1
+                    continue
+                new_key = new_hash + key[len(prefix) - 1:]
+                self.entries[new_key] = (created, data)
+                if self.db is not None:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO quotes (key, catalog_hash, created, data) VALUES (?, ?, ?, ?)",
+                        (new_key, new_hash, created, data)
+                    )
+                kept += 1
+            if self.db is not None:
+                self.db.commit()
+            self._evict()
+        return kept, dropped
+
+    def _delete(self, key):
+        self.entries.pop(key, None)
+        if self.db is not None:
+            self.db.execute("DELETE FROM quotes WHERE key = ?", (key,))
+            self.db.commit()
+
+    def _evict(self):
+        # El SQLite conserva lo expulsado de memoria hasta que venza el TTL
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_quote_cache(catalog_hash=None, db_path=QUOTE_CACHE_DB):
+    """Cache compartida por todo el proceso."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QuoteCache(db_path=db_path or None, catalog_hash=catalog_hash)
+    return _cache
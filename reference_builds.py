@@ -0,0 +1,243 @@
+"""
+Tabla precalculada de builds de referencia por presupuesto y tipo de PC.
+
+Los presupuestos se concentran en pocos valores (S/3,000 - S/10,000 en pasos
+de unos cientos). El build offline resuelve cada escalon x tipo de PC con el
+solver local (o toma respuestas grabadas del modelo), valida cada build y
+guarda la tabla versionada por hash del catalogo. En linea, compose_prompt()
+toma las builds del escalon sin busqueda y el modelo solo redacta el texto.
+
+Build (en paralelo, un proceso por nucleo):
+    python reference_builds.py [--min 2000 --max 12000 --step 100] [--workers N]
+    python reference_builds.py --recorded respuestas.jsonl   # {"budget", "pc_type", "text"} por linea
+"""
+import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog import CATALOG_PATH, load_catalog_index
+from validation import extract_component_prices, calculate_gpu_cpu_multiplier, validate_build
+from solver import PC_TYPE_SLOTS, DEFAULT_TOP_N, solve_builds
+
+# --- CONSTANTES ---
+REFERENCE_TABLE_VERSION = 1
+REFERENCE_MIN_BUDGET = int(os.getenv("KIWI_REFERENCE_MIN", "2000"))
+REFERENCE_MAX_BUDGET = int(os.getenv("KIWI_REFERENCE_MAX", "12000"))
+REFERENCE_STEP = int(os.getenv("KIWI_REFERENCE_STEP", "100"))
+
+
+def reference_table_path(catalog_path=CATALOG_PATH):
+    """catalogo_kiwigeek.json -> catalogo_kiwigeek.references.json (junto al catalogo)."""
+    root, _ = os.path.splitext(catalog_path)
+    return root + '.references.json'
+
+
+def build_from_components(budget, components, catalog):
+    """Build en el formato del solver a partir de una cotizacion valida del modelo."""
+    items = []
+    for item in components:
+        row = catalog.find_component(item)
+        if row is None:
+            return None
+        items.append({
+            "id": catalog.ids[row],
+            "slot": catalog.slot(row),
+            "name": catalog.names[row],
+            "price": catalog.prices[row],
+            "url": catalog.item(row)["l"],
+        })
+    prices = extract_component_prices(items, catalog)
+    multiplier = calculate_gpu_cpu_multiplier(prices["gpu_price"], prices["cpu_price"])
+    return {
+        "components": items,
+        "total": round(sum(item["price"] for item in items), 2),
+        "multiplier": multiplier,
+        "omitted": [],
+        "score": None,
+    }
+
+
+# --- BUILD OFFLINE (PROCESS POOL) ---
+_worker_catalog = None
+
+
+def _init_worker(catalog_path):
+    # Cada proceso abre el snapshot (mmap): las paginas del catalogo se comparten
+    global _worker_catalog
+    _worker_catalog = load_catalog_index(catalog_path)
+
+
+def _solve_step(task):
+    budget, pc_type = task
+    builds = [
+        build for build in solve_builds(budget, pc_type, _worker_catalog)
+        if validate_build(budget, build["components"], _worker_catalog)[0]
+    ]
+    return budget, pc_type, builds
+
+
+def load_recorded_builds(path, catalog, step=REFERENCE_STEP):
+    """
+    Respuestas grabadas del modelo ({"budget", "pc_type", "text"} por linea):
+    solo las cotizaciones que pasan validate_build() en un escalon exacto.
+    Retorna {(budget, pc_type): [builds]}.
+    """
+    recorded = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            budget, pc_type = int(entry.get("budget") or 0), entry.get("pc_type")
+            if not budget or budget % step or pc_type not in PC_TYPE_SLOTS:
+                continue
+            try:
+                data = json.loads(entry["text"])
+            except (KeyError, ValueError):
+                continue
+            for quote in data.get("quotes") or []:
+                components = quote.get("components", [])
+                if not validate_build(budget, components, catalog)[0]:
+                    continue
+                build = build_from_components(budget, components, catalog)
+                if build:
+                    recorded.setdefault((budget, pc_type), []).append(build)
+    return recorded
+
+
+def build_reference_table(catalog_path=CATALOG_PATH, min_budget=REFERENCE_MIN_BUDGET,
+                          max_budget=REFERENCE_MAX_BUDGET, step=REFERENCE_STEP,
+                          workers=None, recorded_path=None, top_n=DEFAULT_TOP_N):
+    """
+    Resuelve todos los escalones x tipos de PC en un pool de procesos y escribe
+    la tabla junto al catalogo. Las builds grabadas validas van primero.
+    Retorna (ruta, estadisticas).
+    """
+    catalog = load_catalog_index(catalog_path)
+    if catalog is None:
+        raise FileNotFoundError(catalog_path)
+
+    recorded = load_recorded_builds(recorded_path, catalog, step) if recorded_path else {}
+    tasks = [(budget, pc_type) for pc_type in PC_TYPE_SLOTS
+             for budget in range(min_budget, max_budget + 1, step)]
+    table = {pc_type: {} for pc_type in PC_TYPE_SLOTS}
+    stats = {"steps": len(tasks), "empty": 0, "recorded": 0}
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(catalog_path,)) as pool:
+        chunksize = max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1)))
+        for budget, pc_type, builds in pool.map(_solve_step, tasks, chunksize=chunksize):
+            mine = recorded.get((budget, pc_type), [])
+            stats["recorded"] += len(mine[:top_n])
+            builds = (mine + builds)[:top_n]
+            if builds:
+                table[pc_type][str(budget)] = builds
+            else:
+                stats["empty"] += 1
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+
+    path = reference_table_path(catalog_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "version": REFERENCE_TABLE_VERSION,
+            "catalog_hash": catalog.content_hash,
+            "min_budget": min_budget,
+            "max_budget": max_budget,
+            "step": step,
+            "generated": time.time(),
+            "builds": table,
+        }, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return path, stats
+
+
+# --- CONSULTA EN LINEA ---
+class ReferenceTable:
+    """Tabla cargada: builds por (tipo de PC, escalon de presupuesto)."""
+
+    def __init__(self, data):
+        self.catalog_hash = data["catalog_hash"]
+        self.min_budget = data["min_budget"]
+        self.max_budget = data["max_budget"]
+        self.step = data["step"]
+        self.builds = data["builds"]
+
+    def lookup(self, budget, pc_type, catalog):
+        """
+        Builds del escalon mas cercano. En un escalon exacto se usan tal cual
+        (ya validadas para ese catalogo); entre escalones se revalidan contra
+        el presupuesto real. [] si la tabla no corresponde o no hay builds.
+        """
+        if catalog is None or catalog.content_hash != self.catalog_hash:
+            return []
+        if not self.min_budget <= budget <= self.max_budget:
+            return []
+        step_budget = self.min_budget + round((budget - self.min_budget) / self.step) * self.step
+        builds = self.builds.get(pc_type, {}).get(str(step_budget), [])
+        if step_budget == budget:
+            return builds
+        return [b for b in builds if validate_build(budget, b["components"], catalog)[0]]
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_reference_table(catalog_path=CATALOG_PATH):
+    """Tabla compartida por proceso; se recarga si el archivo cambio. None si no hay tabla."""
+    path = reference_table_path(catalog_path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _tables.get(path)
+    if cached is None or cached[0] != mtime:
+        with _tables_lock:
+            cached = _tables.get(path)
+            if cached is None or cached[0] != mtime:
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    table = ReferenceTable(data) if data.get("version") == REFERENCE_TABLE_VERSION else None
+                except (OSError, ValueError, KeyError):
+                    table = None  # archivo corrupto o a medio escribir
+                cached = (mtime, table)
+                _tables[path] = cached
+    return cached[1]
+
+
+def reference_builds(budget, pc_type, catalog, catalog_path=CATALOG_PATH):
+    """Builds precalculadas para el presupuesto o [] (se resuelve en linea)."""
+    table = get_reference_table(catalog_path)
+    if table is None or not budget:
+        return []
+    return table.lookup(budget, pc_type, catalog)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precalcula builds de referencia por presupuesto")
+    parser.add_argument("catalog", nargs="?", default=CATALOG_PATH)
+    parser.add_argument("--min", type=int, default=REFERENCE_MIN_BUDGET)
+    parser.add_argument("--max", type=int, default=REFERENCE_MAX_BUDGET)
+    parser.add_argument("--step", type=int, default=REFERENCE_STEP)
+    parser.add_argument("--workers", type=int, default=None, help="procesos (por defecto, uno por nucleo)")
+    parser.add_argument("--recorded", help="JSONL de respuestas grabadas del modelo")
+    args = parser.parse_args(argv)
+
+    try:
+        path, stats = build_reference_table(
+            args.catalog, args.min, args.max, args.step, args.workers, args.recorded
+        )
+    except FileNotFoundError:
+        raise SystemExit(f"No existe {args.catalog}")
+    print(f"{path}: {stats['steps']} escalones, {stats['empty']} sin build, "
+          f"{stats['recorded']} builds grabadas, {stats['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
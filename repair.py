@@ -0,0 +1,242 @@
+import os
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+from compatibility import get_compatibility
+from validation import (
+    CASE_MIN_PERCENTAGE, CASE_MAX_PERCENTAGE, ABSOLUTE_MAX_CASE,
+    get_multiplier_range, validate_build, error_rule
+)
+from solver import SLOT_SHARES, slot_candidates
+from batch_validation import encode_builds, get_batch_columns, validate_builds
+
+# --- CONSTANTES ---
+REPAIR_ENABLED = os.getenv("KIWI_REPAIR", "1") == "1"
+# Tiempo maximo de busqueda por respuesta antes de pedir un reintento al modelo
+REPAIR_TIME_BUDGET = float(os.getenv("KIWI_REPAIR_MS", "10")) / 1000
+REPAIR_NEIGHBORS = 4  # productos vecinos en precio que se prueban por slot
+MAX_REPAIR_STEPS = 6  # sustituciones encadenadas como maximo
+# Errores que una sustitucion del catalogo no puede corregir
+UNREPAIRABLE_ERROR_PREFIXES = ("PRODUCTO NO ENCONTRADO", "ERROR CRITICO", "No se proporcionaron")
+# Slots que se recortan/mejoran para cerrar el presupuesto, de mayor a menor cuota
+BUDGET_SLOTS = sorted(
+    (s for s in SLOT_SHARES if s not in ("gpu", "cpu", "case")), key=SLOT_SHARES.get, reverse=True
+) + ["gpu"]
+
+
+def _neighbors(candidates, target, lo=0.0, hi=float('inf'), keep=None, exclude=None,
+               k=REPAIR_NEIGHBORS):
+    """Hasta k filas del slot con precio mas cercano a target dentro de [lo, hi]."""
+    prices, rows = candidates
+    right = bisect_left(prices, target)
+    left = right - 1
+    found = []
+    while len(found) < k and (left >= 0 or right < len(prices)):
+        take_right = left < 0 or (right < len(prices) and prices[right] - target < target - prices[left])
+        if take_right:
+            i = right
+            right += 1
+            if prices[i] > hi:
+                right = len(prices)
+                continue
+        else:
+            i = left
+            left -= 1
+            if prices[i] < lo:
+                left = -1
+                continue
+        row = rows[i]
+        if lo <= prices[i] <= hi and row != exclude and (keep is None or keep(row)):
+            found.append(row)
+    return found
+
+
+class _Build:
+    """Componentes de una cotizacion como filas del catalogo (None = fuera del catalogo)."""
+
+    def __init__(self, catalog, components, rows):
+        self.catalog = catalog
+        self.components = components
+        self.rows = rows
+        self.slots = [catalog.slot(row) if row is not None else None for row in rows]
+
+    def replace(self, index, row):
+        rows = list(self.rows)
+        rows[index] = row
+        return _Build(self.catalog, self.components, rows)
+
+    def index(self, slot):
+        return self.slots.index(slot) if slot in self.slots else None
+
+    def to_components(self):
+        """Precios del catalogo; los componentes sustituidos pierden el insight del modelo."""
+        result = []
+        for item, row in zip(self.components, self.rows):
+            if row is None:
+                result.append(dict(item))
+            elif row == self.catalog.find_component(item):
+                result.append(dict(item, price=self.catalog.prices[row]))
+            else:
+                result.append({
+                    "name": self.catalog.names[row],
+                    "price": self.catalog.prices[row],
+                    "url": self.catalog.item(row)["l"],
+                })
+        return result
+
+
+def _moves(budget, build, errors, details, catalog):
+    """Sustituciones (indice, fila nueva) que apuntan a las reglas que fallaron."""
+    rules = {error_rule(err) for err in errors}
+    candidates = slot_candidates(catalog)
+    prices = catalog.prices
+    rows = build.rows
+    moves = []
+
+    gpu, cpu = build.index("gpu"), build.index("cpu")
+    board, ram, psu = build.index("motherboard"), build.index("ram"), build.index("psu")
+
+    # Placa/RAM/fuente solo se sustituyen por piezas compatibles con el resto
+    filters = {}
+    if cpu is not None:
+        compat = get_compatibility(catalog)
+        columns = compat.columns
+        socket = columns.socket(rows[cpu])
+        cpu_mask = columns.ddr_masks[rows[cpu]]
+        ram_mask = columns.ddr_masks[rows[ram]] if ram is not None else cpu_mask
+        board_mask = columns.ddr_masks[rows[board]] if board is not None else cpu_mask
+        required = compat.required_psu_watts(rows[gpu] if gpu is not None else None, rows[cpu])
+        filters["motherboard"] = lambda r: (
+            columns.socket(r) == socket and columns.ddr_masks[r] & cpu_mask & ram_mask
+        )
+        filters["ram"] = lambda r: columns.ddr_masks[r] & cpu_mask & board_mask
+        filters["psu"] = lambda r: columns.watts[r] >= required
+
+    def near(slot, target, lo=0.0, hi=float('inf')):
+        i = build.index(slot)
+        if i is not None and slot in candidates:
+            moves.extend(
+                (i, row) for row in _neighbors(candidates[slot], target, lo, hi, filters.get(slot), rows[i])
+            )
+
+    # CASE: el mas cercano al centro de la banda 3-5%
+    if rules & {"CASE SOBREVALORADO", "CASE INFRAUTILIZADO"}:
+        lo = budget * CASE_MIN_PERCENTAGE
+        hi = min(budget * CASE_MAX_PERCENTAGE, ABSOLUTE_MAX_CASE)
+        near("case", (lo + hi) / 2, lo, hi)
+
+    # MULTIPLICADOR: escalon de GPU o CPU hacia el centro del rango de la gama
+    if gpu is not None and cpu is not None:
+        min_m, max_m, _ = get_multiplier_range(budget)
+        mid_m = (min_m + max_m) / 2
+        if "DESBALANCE CRITICO" in rules:
+            near("gpu", prices[rows[cpu]] * mid_m)
+            near("cpu", prices[rows[gpu]] / mid_m)
+        if rules & {"CUELLO DE BOTELLA", "ADVERTENCIA"}:
+            near("cpu", prices[rows[gpu]] / mid_m)
+            near("gpu", prices[rows[cpu]] * mid_m)
+
+    # PRESUPUESTO: recortar (o mejorar) una pieza por la diferencia con el objetivo
+    gap = 0.0
+    if rules & {"PRESUPUESTO EXCEDIDO", "PRESUPUESTO SUBUTILIZADO"}:
+        gap = budget - details.get("total", budget)
+        for slot in BUDGET_SLOTS:
+            i = build.index(slot)
+            if i is not None:
+                near(slot, prices[rows[i]] + gap)
+
+    # COMPATIBILIDAD: pieza compatible de precio similar (o ajustado al presupuesto)
+    if any(r.startswith("INCOMPATIBILIDAD") for r in rules):
+        for slot, i in (("motherboard", board), ("ram", ram)):
+            if i is not None:
+                near(slot, prices[rows[i]] + gap)
+    if "FUENTE INSUFICIENTE" in rules and psu is not None:
+        near("psu", prices[rows[psu]] + gap)
+    return moves
+
+
+def _score(budget, errors, details):
+    return len(errors), abs(details.get("total", 0) - budget)
+
+
+def _evaluate_moves(budget, current, moves, catalog):
+    """
+    Todas las sustituciones de un paso en una sola validacion vectorizada
+    (batch_validation.py): la build actual repetida con un componente cambiado
+    por fila. Retorna BatchValidation alineado con moves.
+    """
+    columns = get_batch_columns(catalog)
+    prices, slots, rows = (np.repeat(m, len(moves), axis=0) for m in encode_builds([current], catalog))
+    index = np.arange(len(moves))
+    position = np.fromiter((i for i, _ in moves), dtype=np.int64, count=len(moves))
+    new_rows = np.fromiter((row for _, row in moves), dtype=np.int64, count=len(moves))
+    rows[index, position] = new_rows
+    prices[index, position] = columns.prices[new_rows]
+    slots[index, position] = columns.slots[new_rows]
+    return validate_builds(budget, prices, slots, rows, catalog)
+
+
+def repair_build(budget, components, catalog, deadline=None):
+    """
+    Reparacion local de una cotizacion que no paso validate_build(): corrige
+    precios al del catalogo y prueba sustituciones minimas por productos del
+    mismo slot con precio cercano (case dentro de la banda 3-5%, escalon de
+    GPU/CPU para el multiplicador, recorte de piezas secundarias, placa/RAM/
+    fuente compatibles). Busqueda greedy acotada por tiempo: las
+    sustituciones de cada paso se puntuan juntas con validate_builds().
+    Retorna los componentes reparados (validos) o None.
+    """
+    if catalog is None or not budget or not components:
+        return None
+    deadline = deadline or time.perf_counter() + REPAIR_TIME_BUDGET
+
+    build = _Build(catalog, components, [catalog.find_component(item) for item in components])
+    current = build.to_components()
+    valid, errors, details = validate_build(budget, current, catalog)
+    for _ in range(MAX_REPAIR_STEPS):
+        if valid:
+            return current
+        if any(err.startswith(UNREPAIRABLE_ERROR_PREFIXES) for err in errors):
+            return None
+
+        moves = _moves(budget, build, errors, details, catalog)
+        if not moves or time.perf_counter() > deadline:
+            return None
+        batch = _evaluate_moves(budget, current, moves, catalog)
+        # La primera sustitucion valida gana (mensajes y detalles solo para esa)
+        for m in np.flatnonzero(batch.valid):
+            candidate_components = build.replace(*moves[m]).to_components()
+            if validate_build(budget, candidate_components, catalog)[0]:
+                return candidate_components
+
+        # Si no, la que deja menos errores y el total mas cerca del presupuesto
+        distance = np.abs(batch.total - budget)
+        m = np.lexsort((distance, batch.error_counts))[0]
+        if (int(batch.error_counts[m]), float(distance[m])) >= _score(budget, errors, details):
+            return None  # ninguna sustitucion mejora: minimo local
+        build = build.replace(*moves[m])
+        current = build.to_components()
+        valid, errors, details = validate_build(budget, current, catalog)
+    return current if valid else None
+
+
+def repair_response(data, budget, catalog, time_budget=REPAIR_TIME_BUDGET):
+    """
+    Repara cada cotizacion invalida de la respuesta, compartiendo el tiempo
+    de busqueda. Retorna la nueva lista de quotes o None si alguna no se pudo
+    reparar (se vuelve al reintento con el modelo).
+    """
+    deadline = time.perf_counter() + time_budget
+    repaired = []
+    for quote in data.get("quotes") or []:
+        components = quote.get("components", [])
+        if validate_build(budget, components, catalog)[0]:
+            repaired.append(quote)
+            continue
+        fixed = repair_build(budget, components, catalog, deadline)
+        if fixed is None:
+            return None
+        repaired.append(dict(quote, components=fixed))
+    return repaired
@@ -0,0 +1,159 @@
+import re
+import math
+import threading
+import unicodedata
+
+from validation import get_multiplier_range
+from solver import PC_TYPE_SLOTS, TOWER_SLOTS, SLOT_SHARES
+from catalog_encoding import encode_rows
+
+# --- CONSTANTES ---
+# Banda de precio por slot como fraccion del presupuesto (min, max)
+SLOT_PRICE_BANDS = {
+    "gpu": (0.20, 0.55),
+    "ram": (0.0, 0.25),
+    "motherboard": (0.0, 0.20),
+    "storage": (0.0, 0.15),
+    "psu": (0.0, 0.15),
+    "case": (0.0, 0.08),
+    "monitor": (0.0, 0.25),
+    "keyboard": (0.0, 0.06),
+    "mouse": (0.0, 0.05),
+    "headset": (0.0, 0.06),
+}
+MAX_ITEMS_PER_SLOT = 15
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_NAME_WEIGHT = 3  # los tokens del nombre pesan mas que los de specs
+BM25_MIN_SCORE = 6.0
+BM25_RELATIVE_SCORE = 0.5  # descarta coincidencias debiles frente al mejor resultado
+BM25_TOP_K = 8
+
+STOPWORDS = {
+    "de", "del", "la", "el", "los", "las", "un", "una", "unos", "y", "o", "con", "para",
+    "por", "en", "mi", "me", "que", "es", "al", "lo", "se", "su", "quiero", "tengo",
+    "necesito", "busco", "soles", "sol", "presupuesto", "pc", "completa", "solo", "torre",
+    "gamer", "gaming", "hola", "armar", "cotizacion", "cotiza", "cotizar",
+}
+
+TOKEN_RE = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+
+
+def tokenize(text):
+    """Minusculas, sin tildes, tokens alfanumericos (conserva '5.0', '4060')."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return TOKEN_RE.findall(text)
+
+
+class BM25Index:
+    """Indice BM25 sobre nombre (n) y specs (s) de cada fila del catalogo."""
+
+    def __init__(self, catalog):
+        self.postings = {}
+        lengths = []
+        for row in range(len(catalog)):
+            tokens = tokenize(catalog.names[row]) * BM25_NAME_WEIGHT + tokenize(catalog.specs[row])
+            lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                self.postings.setdefault(token, []).append((row, tf))
+        self.lengths = lengths
+        self.avg_length = sum(lengths) / len(lengths) if lengths else 0
+        n = len(lengths)
+        self.idf = {
+            token: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5))
+            for token, p in self.postings.items()
+        }
+
+    def search(self, query, top_k=BM25_TOP_K, min_score=BM25_MIN_SCORE):
+        """Retorna [(fila, score)] ordenado por relevancia."""
+        scores = {}
+        for token in set(tokenize(query)) - STOPWORDS:
+            idf = self.idf.get(token)
+            if idf is None:
+                continue
+            for row, tf in self.postings[token]:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[row] / self.avg_length)
+                scores[row] = scores.get(row, 0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        if not ranked:
+            return []
+        cutoff = max(min_score, ranked[0][1] * BM25_RELATIVE_SCORE)
+        return [(row, score) for row, score in ranked[:top_k] if score >= cutoff]
+
+
+_bm25 = {}
+_bm25_lock = threading.Lock()
+
+
+def get_bm25_index(catalog):
+    """Indice compartido por proceso, uno por version (hash) del catalogo."""
+    key = catalog.content_hash
+    if key not in _bm25:
+        with _bm25_lock:
+            if key not in _bm25:
+                _bm25[key] = BM25Index(catalog)
+    return _bm25[key]
+
+
+def rekey_bm25_index(old_catalog, new_catalog, reuse):
+    """
+    Recarga del catalogo: libera el indice de la version anterior y, si
+    nombres y specs por fila no cambiaron (reuse), lo reutiliza tal cual.
+    """
+    with _bm25_lock:
+        index = _bm25.pop(old_catalog.content_hash, None)
+        if reuse and index is not None:
+            _bm25[new_catalog.content_hash] = index
+
+
+def _slot_band(slot, budget):
+    """Rango de precio [min, max] que puede entrar en una build del presupuesto."""
+    if slot == "cpu":
+        # El CPU se deriva de la banda de GPU y el multiplicador de la gama
+        min_m, _, critical_m = get_multiplier_range(budget)
+        gpu_lo, gpu_hi = SLOT_PRICE_BANDS["gpu"]
+        return budget * gpu_lo / critical_m, budget * gpu_hi / min_m
+    lo, hi = SLOT_PRICE_BANDS.get(slot, (0.0, 0.10))
+    return budget * lo, budget * hi
+
+
+def select_candidate_rows(catalog, budget, pc_type):
+    """
+    Filas del catalogo que pueden formar parte de una build para el presupuesto:
+    solo categorias del tipo de PC y solo la banda de precio viable por slot,
+    limitado a los MAX_ITEMS_PER_SLOT mas cercanos a la cuota del slot.
+    """
+    rows = []
+    for slot in PC_TYPE_SLOTS.get(pc_type, TOWER_SLOTS):
+        lo, hi = _slot_band(slot, budget)
+        band = catalog.price_range_rows(slot, lo, hi)
+        if len(band) > MAX_ITEMS_PER_SLOT:
+            target = budget * SLOT_SHARES.get(slot, 0.05)
+            band = sorted(band, key=lambda r: abs(catalog.prices[r] - target))[:MAX_ITEMS_PER_SLOT]
+        rows.extend(band)
+    return rows
+
+
+def build_catalog_slice(catalog, user_text, budget=None, pc_type=None):
+    """
+    Retrieval por turno: filas viables por presupuesto/tipo (si hay presupuesto)
+    mas los productos nombrados por el usuario (BM25 sobre n/s).
+    Retorna lista de filas sin duplicados.
+    """
+    rows = []
+    if budget:
+        rows.extend(select_candidate_rows(catalog, budget, pc_type))
+    rows.extend(row for row, _ in get_bm25_index(catalog).search(user_text))
+    return list(dict.fromkeys(rows))
+
+
+def format_catalog_slice(catalog, rows):
+    """Serializa las filas como tablas compactas por categoria (catalog_encoding)."""
+    return (
+        "=== CATALOGO RELEVANTE PARA ESTE MENSAJE (id|nombre|precio S/|specs; usa SOLO estos productos "
+        "y cita su id) ===\n" + encode_rows(catalog, rows)
+    )
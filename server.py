@@ -0,0 +1,189 @@
+"""
+Servidor HTTP asyncio del motor de cotizacion (sin dependencias extra).
+
+Rutas:
+    POST   /v1/conversations                  -> {"conversation_id": ...}
+    POST   /v1/conversations/{id}             abre el chat en segundo plano (al abrir la sesion)
+    GET    /v1/conversations/{id}             -> mensajes, presupuesto y tipo (restaurar la UI)
+    POST   /v1/conversations/{id}/messages    {"message": "..."} -> resultado del turno
+    DELETE /v1/conversations/{id}
+    GET    /healthz
+    GET    /metrics                           (formato Prometheus)
+
+Uso:
+    GEMINI_API_KEY=... python server.py --host 0.0.0.0 --port 8080
+"""
+import os
+import re
+import json
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import METRICS
+
+# --- CONSTANTES ---
+# Turnos en curso como maximo; el resto espera su turno en la cola del proceso
+MAX_INFLIGHT = int(os.getenv("KIWI_SERVER_MAX_INFLIGHT", "64"))
+# Hilos para las llamadas bloqueantes al modelo (casi todo el tiempo es espera de red)
+WORKER_THREADS = int(os.getenv("KIWI_SERVER_WORKERS", "64"))
+MAX_BODY_BYTES = 64 * 1024
+READ_TIMEOUT = 30  # segundos esperando headers/cuerpo de una peticion
+# Ids aceptados en la ruta (uuid4().hex y similares)
+CONVERSATION_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+STATUS_TEXT = {200: "OK", 201: "Created", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def read_request(reader):
+    """(metodo, ruta, headers, cuerpo) o None si el cliente cerro la conexion."""
+    request_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, "Linea de peticion invalida")
+
+    headers = {}
+    while True:
+        line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "Content-Length invalido")
+    if length < 0:
+        raise HTTPError(400, "Content-Length invalido")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "Cuerpo demasiado grande")
+    body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT) if length else b''
+    return method.upper(), target.split('?', 1)[0], headers, body
+
+
+def encode_response(status, payload, content_type="application/json", keep_alive=True):
+    if content_type == "application/json":
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    else:
+        body = payload.encode('utf-8')
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        f"Content-Type: {content_type}; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode('latin-1') + body
+
+
+class QuoteServer:
+    """Atiende muchas conversaciones concurrentes sobre un solo QuoteService."""
+
+    def __init__(self, service, max_inflight=MAX_INFLIGHT):
+        self.service = service
+        self.inflight = asyncio.Semaphore(max_inflight)
+
+    async def dispatch(self, method, path, body):
+        parts = [p for p in path.split('/') if p]
+        if parts == ["healthz"] and method == "GET":
+            catalog = self.service.catalog
+            return 200, {
+                "status": "ok",
+                "conversations": len(self.service.conversations),
+                "catalog": catalog.content_hash[:12] if catalog is not None else None,
+            }
+        if parts == ["metrics"] and method == "GET":
+            return 200, METRICS.render()
+        if parts[:2] != ["v1", "conversations"]:
+            raise HTTPError(404, "Ruta no encontrada")
+        if len(parts) > 2 and not CONVERSATION_ID_PATTERN.fullmatch(parts[2]):
+            raise HTTPError(400, "Id de conversacion invalido")
+
+        if len(parts) == 2 and method == "POST":
+            conversation = await asyncio.to_thread(self.service.get_conversation)
+            return 201, {"conversation_id": conversation.id}
+        if len(parts) == 3 and method == "POST":
+            warming = self.service.warm_conversation(parts[2])
+            return 202, {"conversation_id": parts[2], "warming": warming}
+        if len(parts) == 3 and method == "GET":
+            state = await asyncio.to_thread(self.service.conversation_state, parts[2])
+            if state is None:
+                raise HTTPError(404, "Conversacion no encontrada")
+            return 200, state
+        if len(parts) == 3 and method == "DELETE":
+            return 200, {"closed": await asyncio.to_thread(self.service.close_conversation, parts[2])}
+        if len(parts) == 4 and parts[3] == "messages" and method == "POST":
+            try:
+                message = json.loads(body or b'{}').get("message", "")
+            except (ValueError, AttributeError):
+                raise HTTPError(400, "JSON invalido")
+            if not isinstance(message, str) or not message.strip():
+                raise HTTPError(400, "Falta 'message'")
+            async with self.inflight:
+                result = await self.service.handle_message_async(parts[2], message)
+            return 200, result
+        raise HTTPError(405, "Metodo no permitido")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    try:
+                        status, payload = await self.dispatch(method, path, body)
+                    except HTTPError as e:
+                        status, payload = e.status, {"error": str(e)}
+                    except Exception as e:
+                        status, payload = 503, {"error": repr(e)}
+                except HTTPError as e:
+                    status, payload, keep_alive = e.status, {"error": str(e)}, False
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                content_type = "text/plain" if isinstance(payload, str) else "application/json"
+                writer.write(encode_response(status, payload, content_type, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP del cotizador Kiwigeek")
+    parser.add_argument("--host", default=os.getenv("KIWI_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("KIWI_SERVER_PORT", "8080")))
+    args = parser.parse_args(argv)
+
+    from llm_client import get_client
+    from service import QuoteService
+
+    service = QuoteService(get_client(os.getenv("GEMINI_API_KEY", "")))
+
+    async def run():
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(WORKER_THREADS))
+        await QuoteServer(service).serve(args.host, args.port)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+
+from google.genai import types
+
+from catalog import get_catalog_index
+from catalog_encoding import encode_catalog
+from validation import extract_budget
+from engine import detect_pc_type, run_quote_turn
+from prompts import SYSTEM_PROMPT, RESPONSE_SCHEMA
+from quote_cache import QUOTE_CACHE_ENABLED, get_quote_cache, quote_cache_key
+from context_cache import ContextCacheManager
+from catalog_watcher import on_catalog_change, start_catalog_watcher
+from telemetry import METRICS, TurnTrace
+from history import content_entry, make_content
+from sessions import SESSION_MAX_MESSAGES, open_session_store
+from llm_client import Overloaded, pooled, queue_listener
+from prefetch import PREFETCH_ENABLED, Prefetcher, is_plain_answer
+
+# --- CONSTANTES ---
+MODEL_ID = os.getenv("KIWI_MODEL_ID", 'models/gemini-2.0-flash')
+# "slice": cada turno adjunta solo la porcion viable del catalogo (retrieval.py)
+# "full": el catalogo completo va en el contexto cacheado
+CATALOG_CONTEXT_MODE = os.getenv("KIWI_CATALOG_MODE", "slice")
+# Conversaciones inactivas se descartan despues de este tiempo (segundos)
+CONVERSATION_TTL = float(os.getenv("KIWI_CONVERSATION_TTL", "7200"))
+# Conversaciones abriendose en segundo plano a la vez (warm_conversation)
+MAX_WARMING = int(os.getenv("KIWI_MAX_WARMING", "16"))
+
+
+class Conversation:
+    """Estado de una conversacion: chat del modelo + presupuesto y tipo detectados."""
+
+    def __init__(self, conversation_id, chat_session=None, chat_config=None):
+        self.id = conversation_id
+        self.chat_session = chat_session
+        self.chat_config = chat_config
+        self.context_cache = None  # manager del cache de contexto con el que se creo el chat
+        self.budget = None
+        self.pc_type = None
+        self.messages = []  # mensajes visibles (rol + markdown) para restaurar la UI
+        self.version = 0  # turnos guardados en el almacen de sesiones
+        self.updated = time.time()
+        self.lock = threading.Lock()  # un turno a la vez por conversacion
+
+    def restore(self, state):
+        self.budget = state.get("budget")
+        self.pc_type = state.get("pc_type")
+        self.messages = state.get("messages", [])
+        self.version = state.get("version", 0)
+
+    def to_state(self):
+        """Estado serializable: el historial ya viene compactado por el motor (history.py)."""
+        history = self.chat_session.get_history() if self.chat_session is not None else []
+        return {
+            "budget": self.budget,
+            "pc_type": self.pc_type,
+            "messages": self.messages[-SESSION_MAX_MESSAGES:],
+            "history": [make_content(*content_entry(content)) for content in history],
+            "version": self.version,
+        }
+
+
+class QuoteService:
+    """
+    Motor de cotizacion sin interfaz: un proceso atiende muchas conversaciones
+    (Streamlit, servidor HTTP, WhatsApp...) compartiendo cliente, catalogo,
+    cache de contexto y cache de cotizaciones.
+
+    Con el catalogo por defecto se suscribe a la recarga en caliente
+    (catalog_watcher.py): los turnos nuevos usan la version nueva y, en modo
+    "full", las conversaciones pasan su historial al cache de contexto nuevo.
+
+    Las conversaciones se guardan en un almacen de sesiones (sessions.py) al
+    final de cada turno; el dict en memoria es solo un cache de chats vivos,
+    asi cualquier replica puede continuar cualquier conversacion.
+
+    Las llamadas al modelo pasan por el cliente compartido (llm_client.py):
+    cupo global con cola justa y prompts identicos en vuelo agrupados.
+
+    Con presupuesto pero sin tipo de PC, las dos cotizaciones posibles se
+    generan en segundo plano mientras el usuario responde (prefetch.py).
+    """
+
+    def __init__(self, client, model_id=MODEL_ID, catalog_mode=CATALOG_CONTEXT_MODE,
+                 catalog=None, conversation_ttl=CONVERSATION_TTL, session_store=None,
+                 prefetch=PREFETCH_ENABLED):
+        self.client = pooled(client)
+        self.model_id = model_id
+        self.catalog_mode = catalog_mode
+        self.catalog = catalog or get_catalog_index()
+        self.conversation_ttl = conversation_ttl
+        self.conversations = {}
+        self.warming = set()  # ids abriendose en segundo plano
+        self.lock = threading.Lock()
+        self.sessions = session_store or open_session_store()
+        self.prefetcher = Prefetcher(self.client.limiter) if prefetch else None
+
+        self.context_cache = self._context_cache_manager()
+        self.context_cache.start_refresher()
+        if catalog is None:
+            on_catalog_change(self._on_catalog_change)
+            start_catalog_watcher()
+
+    def _context_cache_manager(self):
+        contents = []
+        if self.catalog_mode == "full" and self.catalog is not None:
+            contents.append(encode_catalog(self.catalog))
+        return ContextCacheManager(self.client, self.model_id, SYSTEM_PROMPT, contents)
+
+    def _on_catalog_change(self, old, new, diff):
+        self.catalog = new
+        if self.catalog_mode != "full":
+            return  # el contexto cacheado solo tiene el prompt: no hay nada que re-tokenizar
+        previous = self.context_cache
+        self.context_cache = self._context_cache_manager()
+        self.context_cache.start_refresher()
+        # El cache anterior vence solo por TTL; los chats que lo usan migran en su siguiente turno
+        previous.stop_refresher()
+
+    def chat_config(self, context_cache=None):
+        context_cache = context_cache or self.context_cache
+        try:
+            cache_name = context_cache.get_name()
+        except Exception:
+            cache_name = None
+        config = types.GenerateContentConfig(
+            temperature=0.1,
+            response_mime_type="application/json",
+            response_schema=RESPONSE_SCHEMA
+        )
+        if cache_name:
+            config.cached_content = cache_name
+        else:
+            config.system_instruction = SYSTEM_PROMPT
+        return config
+
+    def _open_chat(self, conversation, history=None):
+        """Chat nuevo (opcionalmente con historial) sobre el cache de contexto vigente."""
+        context_cache = self.context_cache
+        config = self.chat_config(context_cache)
+        conversation.chat_session = self.client.chats.create(
+            model=self.model_id, config=config, history=history
+        )
+        conversation.chat_config = config
+        conversation.context_cache = context_cache
+
+    def get_conversation(self, conversation_id=None):
+        """
+        Conversacion en memoria, restaurada del almacen de sesiones (otra replica
+        o antes de un reinicio) o una nueva (con id generado si no se indica).
+        """
+        now = time.time()
+        with self.lock:
+            conversation = self.conversations.get(conversation_id)
+            if conversation is not None:
+                conversation.updated = now
+                return conversation
+
+        state = self._load_state(conversation_id) if conversation_id else None
+        with self.lock:
+            conversation = self.conversations.get(conversation_id)
+            if conversation is None:
+                self._evict_idle(now)
+                conversation = Conversation(conversation_id or uuid.uuid4().hex)
+                if state:
+                    conversation.restore(state)
+                self._open_chat(conversation, state["history"] if state else None)
+                self.conversations[conversation.id] = conversation
+            conversation.updated = now
+            return conversation
+
+    def warm_conversation(self, conversation_id):
+        """
+        Al abrir la sesion: restaura o crea la conversacion y su chat en segundo
+        plano. No repite el trabajo si ya esta en memoria o abriendose, y con
+        MAX_WARMING en curso no agrega mas (el primer turno la abre igual).
+        Retorna True si lanzo el hilo.
+        """
+        with self.lock:
+            if (conversation_id in self.conversations or conversation_id in self.warming
+                    or len(self.warming) >= MAX_WARMING):
+                return False
+            self.warming.add(conversation_id)
+
+        def warm():
+            try:
+                self.get_conversation(conversation_id)
+            except Exception:
+                pass  # el primer turno lo vuelve a intentar
+            finally:
+                with self.lock:
+                    self.warming.discard(conversation_id)
+        threading.Thread(target=warm, daemon=True).start()
+        return True
+
+    def _schedule_prefetch(self, conversation, catalog):
+        """Cotizaciones especulativas sobre una copia del chat (el de la conversacion no se toca)."""
+        budget = conversation.budget
+        chat_config = conversation.chat_config
+        history = conversation.chat_session.get_history()
+
+        def run(pc_type, on_progress):
+            chat_session = self.client.chats.create(model=self.model_id, config=chat_config, history=history)
+            return run_quote_turn(
+                self.client,
+                self.model_id,
+                chat_session,
+                chat_config,
+                pc_type,
+                budget,
+                pc_type,
+                catalog,
+                catalog_mode=self.catalog_mode,
+                on_progress=on_progress,
+                streaming=True,  # on_progress por componente: la cancelacion corta el stream
+                candidates=1,
+                max_attempts=1,
+                retry_delay=0,
+                fast_path=False
+            )
+
+        self.prefetcher.schedule(conversation.id, budget, catalog.content_hash, run)
+
+    def _load_state(self, conversation_id):
+        try:
+            return self.sessions.load(conversation_id)
+        except Exception:
+            METRICS.inc("kiwi_session_store_errors_total", op="load")
+            return None  # almacen caido: la conversacion sigue solo en memoria
+
+    def _save_state(self, conversation):
+        conversation.version += 1
+        try:
+            self.sessions.save(conversation.id, conversation.to_state())
+        except Exception:
+            METRICS.inc("kiwi_session_store_errors_total", op="save")
+
+    def _sync(self, conversation):
+        """Si otra replica avanzo la conversacion, se continua desde su estado guardado."""
+        state = self._load_state(conversation.id)
+        if state and state.get("version", 0) > conversation.version:
+            conversation.restore(state)
+            self._open_chat(conversation, state["history"])
+
+    def conversation_state(self, conversation_id):
+        """Mensajes visibles, presupuesto y tipo de una conversacion, o None si no existe."""
+        with self.lock:
+            conversation = self.conversations.get(conversation_id)
+        state = self._load_state(conversation_id)
+        # La copia en memoria puede estar atrasada si otra replica atendio turnos despues
+        if conversation is not None and (state is None or conversation.version >= state.get("version", 0)):
+            state = {"budget": conversation.budget, "pc_type": conversation.pc_type,
+                     "messages": list(conversation.messages)}
+        if state is None:
+            return None
+        return {
+            "conversation_id": conversation_id,
+            "messages": state.get("messages", []),
+            "budget": state.get("budget"),
+            "pc_type": state.get("pc_type"),
+        }
+
+    def reset_conversation(self, conversation_id):
+        """Chat nuevo para la conversacion (ej. tras un error de conexion)."""
+        conversation = self.get_conversation(conversation_id)
+        self._open_chat(conversation)
+        return conversation
+
+    def close_conversation(self, conversation_id):
+        with self.lock:
+            closed = self.conversations.pop(conversation_id, None) is not None
+        if self.prefetcher is not None:
+            self.prefetcher.discard(conversation_id)
+        try:
+            closed = self.sessions.delete(conversation_id) or closed
+        except Exception:
+            METRICS.inc("kiwi_session_store_errors_total", op="delete")
+        return closed
+
+    def _evict_idle(self, now):
+        expired = [cid for cid, c in self.conversations.items() if now - c.updated > self.conversation_ttl]
+        for cid in expired:
+            del self.conversations[cid]
+            if self.prefetcher is not None:
+                self.prefetcher.discard(cid)
+
+    def handle_message(self, conversation_id, text, on_progress=None):
+        """
+        Un turno de la conversacion. Retorna dict serializable:
+        reply (markdown), data, is_valid, errors, attempts, from_cache,
+        budget, pc_type y error ('malformed' | 'busy' | 'connection' | 'unavailable' | None).
+        """
+        conversation = self.get_conversation(conversation_id)
+        with conversation.lock:
+            self._sync(conversation)
+            detected_budget = extract_budget(text)
+            if detected_budget and not conversation.budget:
+                conversation.budget = detected_budget
+            detected_pc_type = detect_pc_type(text)
+            if detected_pc_type:
+                conversation.pc_type = detected_pc_type
+
+            result = {
+                "conversation_id": conversation.id,
+                "reply": "",
+                "data": None,
+                "is_valid": False,
+                "errors": [],
+                "attempts": 0,
+                "from_cache": False,
+                "budget": conversation.budget,
+                "pc_type": conversation.pc_type,
+                "error": None,
+            }
+
+            # TRAZA DEL TURNO: spans de modelo, parseo, validacion y render
+            trace = TurnTrace(budget=conversation.budget, pc_type=conversation.pc_type)
+            catalog = self.catalog  # una sola version del catalogo durante todo el turno
+            try:
+                if conversation.context_cache is not self.context_cache:
+                    # El catalogo cacheado cambio: mismo historial sobre el cache nuevo
+                    self._open_chat(conversation, conversation.chat_session.get_history())
+
+                # CACHE DE COTIZACIONES: clave por intencion + version del catalogo
+                quote_cache = None
+                cache_key = None
+                if QUOTE_CACHE_ENABLED:
+                    quote_cache = get_quote_cache(catalog.content_hash)
+                    cache_key = quote_cache_key(
+                        text, conversation.budget, conversation.pc_type, catalog.content_hash
+                    )
+
+                # PREFETCH: si el usuario solo eligio el tipo, la cotizacion puede estar lista
+                prefetched = None
+                if self.prefetcher is not None and conversation.budget and conversation.pc_type:
+                    if is_plain_answer(text):
+                        with trace.stage("prefetch_wait"):
+                            prefetched = self.prefetcher.take(
+                                conversation.id, conversation.budget, conversation.pc_type,
+                                catalog.content_hash
+                            )
+                    else:
+                        self.prefetcher.discard(conversation.id)
+
+                on_wait = None
+                if on_progress:
+                    on_wait = lambda position: on_progress(f"⏳ Estas en cola (posicion {position})...")
+                with queue_listener(on_wait):
+                    turn = run_quote_turn(
+                        self.client,
+                        self.model_id,
+                        conversation.chat_session,
+                        conversation.chat_config,
+                        text,
+                        conversation.budget,
+                        conversation.pc_type,
+                        catalog,
+                        catalog_mode=self.catalog_mode,
+                        quote_cache=quote_cache,
+                        cache_key=cache_key,
+                        on_progress=on_progress,
+                        timer=trace,
+                        prefetched=prefetched
+                    )
+                conversation.chat_session = turn.chat_session
+                result.update(
+                    reply=turn.text,
+                    data=turn.data,
+                    is_valid=turn.is_valid,
+                    errors=turn.errors,
+                    attempts=turn.attempts,
+                    from_cache=turn.from_cache,
+                )
+                if turn.local:
+                    outcome = "local"
+                elif turn.prefetched:
+                    outcome = "prefetch"
+                elif turn.from_cache:
+                    outcome = "cache"
+                else:
+                    outcome = "valid" if turn.is_valid else "invalid"
+                trace.finish(outcome, turn.attempts)
+                if self.prefetcher is not None and conversation.budget and not conversation.pc_type:
+                    self._schedule_prefetch(conversation, catalog)
+            except Overloaded as e:
+                # Backpressure: el modelo esta saturado, el chat sigue intacto
+                trace.finish("busy", trace.counts.get("llm", 0), error=str(e))
+                result.update(error="busy", errors=[str(e)])
+            except json.JSONDecodeError as e:
+                trace.finish("malformed", trace.counts.get("llm", 0), error=str(e))
+                result.update(error="malformed", errors=[str(e)])
+            except Exception as e:
+                trace.finish("error", trace.counts.get("llm", 0), error=repr(e))
+                # El cache de contexto pudo vencer: se verifica y se recrea el chat
+                self.context_cache.invalidate()
+                try:
+                    self._open_chat(conversation)
+                    result.update(error="connection", errors=[repr(e)])
+                except Exception:
+                    result.update(error="unavailable", errors=[repr(e)])
+
+            # ALMACEN DE SESIONES: la siguiente peticion puede llegar a otra replica
+            conversation.messages.append({"role": "user", "content": text})
+            if result["reply"]:
+                conversation.messages.append({"role": "assistant", "content": result["reply"]})
+            self._save_state(conversation)
+            return result
+
+    async def handle_message_async(self, conversation_id, text):
+        """Version para servidores asyncio: el turno corre en un hilo del executor."""
+        return await asyncio.to_thread(self.handle_message, conversation_id, text)
@@ -0,0 +1,138 @@
+"""
+Almacen de sesiones compartido: el estado de cada conversacion (presupuesto,
+tipo de PC, historial compactado y mensajes visibles) vive fuera del proceso,
+asi un reinicio no pierde conversaciones y varias replicas sin estado pueden
+atender la misma conversacion detras de un balanceador. El chat de Gemini se
+reconstruye a demanda desde el historial guardado.
+
+KIWI_SESSION_STORE:
+    sqlite:///kiwi_sessions.db   (por defecto; WAL, compartido por los procesos del host)
+    redis://host:6379/0          (requiere el paquete redis; compartido entre hosts)
+    memory                       (solo el proceso actual)
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# --- CONSTANTES ---
+SESSION_STORE_URL = os.getenv("KIWI_SESSION_STORE", "sqlite:///kiwi_sessions.db")
+# Sesiones sin actividad por mas de este tiempo se eliminan (segundos)
+SESSION_TTL = float(os.getenv("KIWI_SESSION_TTL", "86400"))
+SESSION_MAX_MESSAGES = 60  # mensajes visibles que se guardan por conversacion
+PURGE_INTERVAL = 300  # cada cuanto el almacen SQLite borra sesiones vencidas
+REDIS_KEY_PREFIX = "kiwi:session:"
+
+
+class MemorySessionStore:
+    """Sesiones en un dict del proceso (desarrollo y benchmark)."""
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self.sessions = OrderedDict()  # id -> (guardado, estado), del mas viejo al mas reciente
+        self.lock = threading.Lock()
+
+    def load(self, session_id):
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self.sessions[session_id]
+                return None
+            return json.loads(entry[1])
+
+    def save(self, session_id, state):
+        now = time.time()
+        with self.lock:
+            self.sessions[session_id] = (now, json.dumps(state, ensure_ascii=False))
+            self.sessions.move_to_end(session_id)
+            # Las vencidas estan al inicio: se corta en la primera vigente
+            while self.sessions and now - next(iter(self.sessions.values()))[0] > self.ttl:
+                self.sessions.popitem(last=False)
+
+    def delete(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+
+class SQLiteSessionStore:
+    """Sesiones en SQLite con WAL: lecturas concurrentes de varios procesos del mismo host."""
+
+    def __init__(self, path, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, updated REAL, version INTEGER, data TEXT)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+        self.db.commit()
+        self.last_purge = 0.0
+
+    def load(self, session_id):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT data FROM sessions WHERE id = ? AND updated >= ?",
+                (session_id, time.time() - self.ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, session_id, state):
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO sessions (id, updated, version, data) VALUES (?, ?, ?, ?)",
+                (session_id, now, state.get("version", 0), json.dumps(state, ensure_ascii=False))
+            )
+            if now - self.last_purge > PURGE_INTERVAL:
+                self.db.execute("DELETE FROM sessions WHERE updated < ?", (now - self.ttl,))
+                self.last_purge = now
+            self.db.commit()
+
+    def delete(self, session_id):
+        with self.lock:
+            deleted = self.db.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount
+            self.db.commit()
+        return deleted > 0
+
+
+class RedisSessionStore:
+    """Sesiones en Redis (o compatible) con vencimiento nativo por TTL."""
+
+    def __init__(self, url, ttl=SESSION_TTL):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("KIWI_SESSION_STORE=redis:// requiere 'pip install redis'")
+        self.ttl = ttl
+        self.client = redis.Redis.from_url(url)
+
+    def load(self, session_id):
+        data = self.client.get(REDIS_KEY_PREFIX + session_id)
+        return json.loads(data) if data else None
+
+    def save(self, session_id, state):
+        self.client.set(
+            REDIS_KEY_PREFIX + session_id,
+            json.dumps(state, ensure_ascii=False),
+            ex=max(1, int(self.ttl))
+        )
+
+    def delete(self, session_id):
+        return bool(self.client.delete(REDIS_KEY_PREFIX + session_id))
+
+
+def open_session_store(url=SESSION_STORE_URL, ttl=SESSION_TTL):
+    """Almacen segun la URL: memory | sqlite:///ruta | redis://..."""
+    if not url or url == "memory":
+        return MemorySessionStore(ttl)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSessionStore(url, ttl)
+    path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else url
+    return SQLiteSessionStore(path, ttl)
@@ -0,0 +1,163 @@
+"""
+Snapshot binario del catalogo: columnas numericas de ancho fijo + tablas de
+strings, listo para mmap de solo lectura. Los workers abren el archivo en
+milisegundos y comparten las paginas via el sistema operativo (zero-copy).
+
+Build:
+    python snapshot.py [catalogo_kiwigeek.json]
+"""
+import os
+import sys
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+
+# --- CONSTANTES ---
+SNAPSHOT_MAGIC = b"KIWICAT\0"
+SNAPSHOT_VERSION = 1
+# magic, version, filas, tamano y mtime_ns del JSON de origen, sha256 (hex), secciones
+HEADER = struct.Struct("<8sIIqq64sI")
+# nombre, typecode ('s' = tabla de strings), offset, largo en bytes, elementos
+SECTION = struct.Struct("<16ss7xQQQ")
+ALIGNMENT = 8
+
+
+def snapshot_path(catalog_path):
+    """catalogo_kiwigeek.json -> catalogo_kiwigeek.snapshot (junto al catalogo)."""
+    root, _ = os.path.splitext(catalog_path)
+    return root + '.snapshot'
+
+
+class StringColumn:
+    """Tabla de strings sobre el mmap: offsets u32 (n+1) + blob utf-8. Decodifica al acceder."""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class SortedLookup:
+    """Reemplazo de dict.get() para claves ordenadas del snapshot (busqueda binaria)."""
+
+    def __init__(self, keys, rows):
+        self.keys = keys
+        self.rows = rows
+
+    def get(self, key, default=None):
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.rows[i]
+        return default
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _encode_strings(values):
+    offsets = array('I', [0])
+    blob = bytearray()
+    for value in values:
+        blob += value.encode('utf-8')
+        offsets.append(len(blob))
+    return offsets.tobytes() + bytes(blob)
+
+
+def write_snapshot(path, columns, count, content_hash, source_stat=(0, 0)):
+    """
+    Escribe las columnas ({nombre: array tipado o lista de strings}) de forma atomica.
+    source_stat: (tamano, mtime_ns) del JSON para detectar snapshots desactualizados.
+    """
+    payloads = []
+    for name, values in columns.items():
+        if isinstance(values, array):
+            payloads.append((name, values.typecode, values.tobytes(), len(values)))
+        else:
+            payloads.append((name, 's', _encode_strings(values), len(values)))
+
+    offset = HEADER.size + SECTION.size * len(payloads)
+    table = []
+    body = bytearray()
+    for name, typecode, data, items in payloads:
+        padding = -(offset + len(body)) % ALIGNMENT
+        body += b"\0" * padding
+        table.append(SECTION.pack(
+            name.encode('ascii'), typecode.encode('ascii'), offset + len(body), len(data), items
+        ))
+        body += data
+
+    header = HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, count, source_stat[0], source_stat[1],
+        content_hash.encode('ascii'), len(payloads)
+    )
+    # Temporal por proceso: varios workers pueden regenerar el snapshot a la vez
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(b"".join(table))
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path):
+    """
+    Abre el snapshot con mmap de solo lectura.
+    Retorna (meta, columnas) donde las columnas numericas son memoryviews
+    tipadas y las de texto StringColumn, todas sin copiar datos.
+    """
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    magic, version, count, source_size, source_mtime, content_hash, sections = HEADER.unpack_from(view, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot incompatible: {path}")
+
+    columns = {}
+    for i in range(sections):
+        name, typecode, offset, length, items = SECTION.unpack_from(view, HEADER.size + i * SECTION.size)
+        name = name.rstrip(b"\0").decode('ascii')
+        typecode = typecode.decode('ascii')
+        data = view[offset:offset + length]
+        if typecode == 's':
+            split = 4 * (items + 1)
+            columns[name] = StringColumn(data[:split].cast('I'), data[split:])
+        else:
+            columns[name] = data.cast(typecode)
+
+    meta = {
+        "count": count,
+        "source_size": source_size,
+        "source_mtime_ns": source_mtime,
+        "content_hash": content_hash.decode('ascii'),
+    }
+    return meta, columns
+
+
+def main(argv=None):
+    from catalog import CATALOG_PATH, load_catalog_index, save_catalog_snapshot
+
+    argv = sys.argv[1:] if argv is None else argv
+    catalog_path = argv[0] if argv else CATALOG_PATH
+    index = load_catalog_index(catalog_path, use_snapshot=False)
+    if index is None:
+        raise SystemExit(f"No existe {catalog_path}")
+    path = save_catalog_snapshot(index, catalog_path)
+    print(f"{path}: {len(index)} productos, {os.path.getsize(path):,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+
+from compatibility import get_compatibility
+from validation import (
+    BUDGET_MARGIN, CASE_MIN_PERCENTAGE, CASE_MAX_PERCENTAGE, ABSOLUTE_MAX_CASE,
+    get_multiplier_range, validate_build
+)
+from classifier import classify_name
+
+# --- CONSTANTES ---
+TOWER_SLOTS = ("gpu", "cpu", "motherboard", "ram", "storage", "psu", "case")
+PERIPHERAL_SLOTS = ("monitor", "keyboard", "mouse", "headset")
+PC_TYPE_SLOTS = {
+    "Solo Torre": TOWER_SLOTS,
+    "PC Completa": TOWER_SLOTS + PERIPHERAL_SLOTS,
+}
+
+# Porcentaje objetivo del presupuesto por slot (JERARQUIA DE INVERSION)
+SLOT_SHARES = {
+    "gpu": 0.35, "cpu": 0.22, "ram": 0.13, "monitor": 0.12, "motherboard": 0.09,
+    "storage": 0.06, "psu": 0.06, "keyboard": 0.02, "mouse": 0.01, "headset": 0.02,
+    "case": 0.04,
+}
+
+DEFAULT_TOP_N = 3
+MAX_PAIRS = 60
+MAX_ADJUST_STEPS = 24
+
+
+@lru_cache(maxsize=4)
+def slot_candidates(catalog):
+    """
+    Por slot: (precios, filas) ordenados, descartando productos cuyo nombre
+    seria clasificado en otro slot sin catalogo (classify_name).
+    Se calcula una vez por indice de catalogo.
+    """
+    candidates = {}
+    for slot in SLOT_SHARES:
+        prices, rows = catalog.sorted_prices(slot)
+        keep = [i for i, row in enumerate(rows) if classify_name(catalog.names[row]) in (None, slot)]
+        candidates[slot] = (
+            array('d', (prices[i] for i in keep)),
+            array('I', (rows[i] for i in keep)),
+        )
+    return candidates
+
+
+def nearest_index(prices, target):
+    """Indice del precio mas cercano a target en un array ordenado."""
+    i = bisect_left(prices, target)
+    if i == 0:
+        return 0
+    if i == len(prices):
+        return len(prices) - 1
+    return i if prices[i] - target < target - prices[i - 1] else i - 1
+
+
+def _fill_secondary(candidates, slots, target, min_total, max_total):
+    """
+    Elige un producto por slot secundario cerca de su cuota del monto restante
+    y luego sube/baja de a un escalon de precio hasta entrar en [min_total, max_total].
+    Retorna {slot: indice} o None.
+    """
+    share_sum = sum(SLOT_SHARES[s] for s in slots)
+    picks = {}
+    for slot in slots:
+        prices = candidates[slot][0]
+        picks[slot] = nearest_index(prices, target * SLOT_SHARES[slot] / share_sum)
+
+    def total():
+        return sum(candidates[s][0][picks[s]] for s in slots)
+
+    current = total()
+    for _ in range(MAX_ADJUST_STEPS):
+        if min_total <= current <= max_total:
+            return picks
+        best = None
+        for slot in slots:
+            prices = candidates[slot][0]
+            i = picks[slot]
+            j = i + 1 if current < min_total else i - 1
+            if not 0 <= j < len(prices):
+                continue
+            new_total = current + prices[j] - prices[i]
+            gap = max(min_total - new_total, new_total - max_total, 0)
+            if best is None or gap < best[0]:
+                best = (gap, slot, j, new_total)
+        if best is None:
+            return None
+        _, slot, j, current = best
+        picks[slot] = j
+    return picks if min_total <= current <= max_total else None
+
+
+def _compatible_candidates(compat, candidates, gpu_row, cpu_row, memo):
+    """
+    Candidatos de placa/RAM/fuente compatibles con el par GPU/CPU:
+    placa del socket del CPU y de su RAM preferida, RAM de esa generacion y
+    fuente >= (GPU + CPU) + 20%. Retorna None si algun slot queda vacio.
+    """
+    columns = compat.columns
+    socket = columns.socket(cpu_row)
+    ddr = compat.preferred_ddr(cpu_row) if socket else 0
+    if not ddr:
+        return None
+
+    key = (socket, ddr)
+    if key not in memo:
+        filtered = {}
+        for slot, keep in (
+            ("motherboard", lambda r: columns.socket(r) == socket and columns.ddr_masks[r] & ddr),
+            ("ram", lambda r: columns.ddr_masks[r] & ddr),
+        ):
+            prices, rows = candidates[slot]
+            idx = [i for i, r in enumerate(rows) if keep(r)]
+            filtered[slot] = (array('d', (prices[i] for i in idx)), array('I', (rows[i] for i in idx)))
+        memo[key] = filtered
+    overrides = dict(memo[key])
+
+    required = compat.required_psu_watts(gpu_row, cpu_row)
+    prices, rows = candidates["psu"]
+    idx = [i for i, r in enumerate(rows) if columns.watts[r] >= required]
+    overrides["psu"] = (array('d', (prices[i] for i in idx)), array('I', (rows[i] for i in idx)))
+
+    if any(not len(prices) for prices, _ in overrides.values()):
+        return None
+    return overrides
+
+
+def _component(catalog, row, slot):
+    return {
+        "id": catalog.ids[row],
+        "slot": slot,
+        "name": catalog.names[row],
+        "price": catalog.prices[row],
+        "url": catalog.item(row)["l"],
+    }
+
+
+def solve_builds(budget, pc_type, catalog, top_n=DEFAULT_TOP_N):
+    """
+    Solver local: arma builds del catalogo que pasan validate_build().
+
+    Busqueda acotada (branch-and-bound):
+    1. Case: el mas cercano al centro de la banda 3-5% (<= S/500). Si ningun
+       case del catalogo entra en la banda se omite y se reporta en 'omitted'.
+    2. Pares GPU/CPU dentro del rango de multiplicador de la gama, podando los
+       que no pueden cerrar el ±10% con los slots secundarios.
+    3. Placa/RAM/fuente compatibles con el par (socket, DDR, watts) y slots
+       secundarios por cuota de inversion, ajustados al rango valido.
+
+    Retorna: lista de hasta top_n builds (mejor primero) con
+    components, total, multiplier, omitted y score.
+    """
+    if not budget or catalog is None:
+        return []
+
+    slots = PC_TYPE_SLOTS.get(pc_type, TOWER_SLOTS)
+    candidates = slot_candidates(catalog)
+    if any(not len(candidates[s][0]) for s in slots if s != "case"):
+        return []
+
+    min_total = budget * (1 - BUDGET_MARGIN)
+    max_total = budget * (1 + BUDGET_MARGIN)
+    min_m, max_m, _ = get_multiplier_range(budget)
+    mid_m = (min_m + max_m) / 2
+
+    # 1. CASE
+    omitted = []
+    case_pick = None
+    case_price = 0
+    if "case" in slots:
+        case_prices, case_rows = candidates["case"]
+        case_min = budget * CASE_MIN_PERCENTAGE
+        case_max = min(budget * CASE_MAX_PERCENTAGE, ABSOLUTE_MAX_CASE)
+        if len(case_prices) and case_min <= case_max:
+            i = nearest_index(case_prices, (case_min + case_max) / 2)
+            if case_min <= case_prices[i] <= case_max:
+                case_pick = case_rows[i]
+                case_price = case_prices[i]
+        if case_pick is None:
+            omitted.append("case")
+
+    secondary = [s for s in slots if s not in ("gpu", "cpu", "case")]
+    sec_min = sum(candidates[s][0][0] for s in secondary)
+    sec_max = sum(candidates[s][0][-1] for s in secondary)
+
+    # 2. PARES GPU/CPU
+    gpu_prices, gpu_rows = candidates["gpu"]
+    cpu_prices, cpu_rows = candidates["cpu"]
+    core_target = budget * (SLOT_SHARES["gpu"] + SLOT_SHARES["cpu"]) / sum(SLOT_SHARES[s] for s in slots)
+
+    pairs = []
+    for gi, gpu_price in enumerate(gpu_prices):
+        if gpu_price + gpu_price / max_m + sec_min + case_price > max_total:
+            break  # GPUs ordenadas por precio: las siguientes tampoco caben
+        lo = bisect_left(cpu_prices, gpu_price / max_m)
+        for ci in range(lo, len(cpu_prices)):
+            cpu_price = cpu_prices[ci]
+            if cpu_price > gpu_price / min_m:
+                break
+            fixed = gpu_price + cpu_price + case_price
+            if fixed + sec_max < min_total or fixed + sec_min > max_total:
+                continue
+            pairs.append((abs(gpu_price + cpu_price - core_target), gi, ci))
+    pairs.sort()
+
+    # 3. SLOTS SECUNDARIOS COMPATIBLES + VALIDACION FINAL
+    compat = get_compatibility(catalog)
+    memo = {}
+    builds = []
+    seen_gpu_prices = set()
+    for _, gi, ci in pairs[:MAX_PAIRS]:
+        if gpu_prices[gi] in seen_gpu_prices:
+            continue  # una opcion por escalon de GPU para variar las builds
+        overrides = _compatible_candidates(compat, candidates, gpu_rows[gi], cpu_rows[ci], memo)
+        if overrides is None:
+            continue
+        pair_candidates = {**candidates, **overrides}
+        fixed = gpu_prices[gi] + cpu_prices[ci] + case_price
+        picks = _fill_secondary(
+            pair_candidates, secondary, budget - fixed, min_total - fixed, max_total - fixed
+        )
+        if picks is None:
+            continue
+
+        components = [
+            _component(catalog, gpu_rows[gi], "gpu"),
+            _component(catalog, cpu_rows[ci], "cpu"),
+        ]
+        components += [_component(catalog, pair_candidates[s][1][picks[s]], s) for s in secondary]
+        if case_pick is not None:
+            components.append(_component(catalog, case_pick, "case"))
+
+        is_valid, _, details = validate_build(budget, components, catalog=catalog)
+        if not is_valid:
+            continue
+
+        multiplier = details.get("multiplier", 0)
+        score = abs(details["total"] - budget) / budget + 0.5 * abs(multiplier - mid_m) / mid_m
+        builds.append({
+            "components": components,
+            "total": details["total"],
+            "multiplier": multiplier,
+            "omitted": list(omitted),
+            "score": score,
+        })
+        seen_gpu_prices.add(gpu_prices[gi])
+
+    builds.sort(key=lambda b: b["score"])
+    return builds[:top_n]
+
+
+def catalog_floor(pc_type, catalog):
+    """
+    Cota inferior del precio de una build con el catalogo: el producto mas
+    economico de cada slot del tipo de PC, sin el case (si no entra en la
+    banda el solver lo omite).
+    """
+    candidates = slot_candidates(catalog)
+    return sum(
+        candidates[slot][0][0] for slot in PC_TYPE_SLOTS.get(pc_type, TOWER_SLOTS)
+        if slot != "case" and len(candidates[slot][0])
+    )
+
+
+def budget_floor_response(budget, pc_type, catalog):
+    """
+    Respuesta needs_info si ninguna build del tipo entra en el presupuesto
+    (+10%) con el catalogo actual: el modelo tampoco podria cotizarla. None si
+    el presupuesto alcanza.
+    """
+    if not budget or not pc_type or catalog is None:
+        return None
+    floor = catalog_floor(pc_type, catalog)
+    if floor <= budget * (1 + BUDGET_MARGIN):
+        return None
+    message = (f"Con S/ {budget:,.0f} no alcanza para una {pc_type} con nuestro catalogo actual: "
+               f"la mas economica cuesta desde S/ {floor:,.0f}. ")
+    if pc_type == "PC Completa" and catalog_floor("Solo Torre", catalog) <= budget * (1 + BUDGET_MARGIN):
+        message += "¿Te cotizo solo la Torre o prefieres subir el presupuesto?"
+    else:
+        message += "¿Puedes subir el presupuesto?"
+    return {"needs_info": True, "is_quote": False, "message": message}
+
+
+def format_builds_prompt(builds, budget, pc_type):
+    """
+    Instruccion para el modelo: los componentes ya estan resueltos y
+    validados localmente, solo debe redactar title/strategy/insight.
+    """
+    text = "=== COTIZACIONES PRE-VALIDADAS (NO MODIFICAR COMPONENTES NI PRECIOS) ===\n"
+    text += f"Presupuesto: S/ {budget:,.0f} | Tipo: {pc_type}\n"
+    text += "Devuelve una opcion en 'quotes' por cada build, en el mismo orden, con los mismos componentes.\n"
+    text += "Tu trabajo es SOLO redactar 'title', 'strategy' y un 'insight' corto por componente.\n\n"
+    for i, build in enumerate(builds, 1):
+        text += f"BUILD {i} (Total S/ {build['total']:,.2f} | Multiplicador {build['multiplier']:.2f}x)\n"
+        for item in build["components"]:
+            text += f"- [{item['slot']}] id {item['id']} | {item['name']} | S/ {item['price']:,.2f}\n"
+        if build["omitted"]:
+            text += f"  (Sin {', '.join(build['omitted'])} del catalogo dentro de la banda valida)\n"
+        text += "\n"
+    return text
+
+
+def apply_solver_builds(quotes, builds):
+    """
+    Reemplaza los componentes devueltos por el modelo con los del solver,
+    conservando la redaccion (title/strategy/insight) generada por el modelo.
+    Los slots que el solver no pudo cubrir van en 'omitted' para avisarle al
+    usuario (render_quote_markdown).
+    """
+    quotes = quotes or []
+    merged = []
+    for i, build in enumerate(builds):
+        quote = quotes[i] if i < len(quotes) else {}
+        insights = {}
+        for item in quote.get("components", []):
+            if item.get("insight"):
+                insights[item.get("url") or item.get("name")] = item["insight"]
+        components = []
+        for item in build["components"]:
+            component = {"name": item["name"], "price": item["price"], "url": item["url"]}
+            insight = insights.get(item["url"]) or insights.get(item["name"])
+            if insight:
+                component["insight"] = insight
+            components.append(component)
+        merged_quote = {
+            "title": quote.get("title") or f"Opcion {i + 1}",
+            "strategy": quote.get("strategy") or f"Multiplicador GPU/CPU: {build['multiplier']:.2f}x",
+            "components": components,
+        }
+        if build["omitted"]:
+            merged_quote["omitted"] = list(build["omitted"])
+        merged.append(merged_quote)
+    return merged
@@ -0,0 +1,237 @@
+import os
+import re
+import json
+import threading
+from array import array
+
+from catalog import CATALOG_PATH
+
+# --- CONSTANTES ---
+SPECS_CACHE_VERSION = 1
+
+# Claves del campo 's' usadas por cada atributo
+SOCKET_KEY = "Socket de CPU"
+RAM_TYPE_KEY = "Tipo de memoria RAM"
+WATTS_KEYS = ("Potencia de Diseño Térmico (TDP)", "Potencia recomendada GPU", "Potencia nominal")
+VRAM_KEY = "Memoria de video"
+CAPACITY_KEYS = ("Capacidad RAM total", "Almacenamiento")
+FORM_FACTOR_KEY = "Factor de forma (placa base)"
+
+# Bits de form_factor: una placa tiene un bit, un case el conjunto que soporta
+FORM_FACTORS = ("Mini-ITX", "Micro-ATX", "ATX", "E-ATX")
+FORM_FACTOR_BITS = {name: 1 << i for i, name in enumerate(FORM_FACTORS)}
+
+DDR_RE = re.compile(r'(?<!LP)DDR(\d)')
+NUMBER_RE = re.compile(r'(\d+(?:\.\d+)?)')
+SIZE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(TB|GB)', re.IGNORECASE)
+
+
+def specs_cache_path(catalog_path=CATALOG_PATH):
+    """catalogo_kiwigeek.json -> catalogo_kiwigeek.specs.json (junto al catalogo)."""
+    root, _ = os.path.splitext(catalog_path)
+    return root + '.specs.json'
+
+
+def parse_spec_blob(blob):
+    """
+    "Clave= valor; Clave= valor" -> {"Clave": "valor", ...}
+    Ignora fragmentos sin '='.
+    """
+    fields = {}
+    for part in blob.split(';'):
+        key, sep, value = part.partition('=')
+        if sep:
+            fields[key.strip()] = value.strip()
+    return fields
+
+
+def _last_segment(value):
+    """'501 W – 750 W | 600 W' -> '600 W' (el detalle va despues del ultimo '|')."""
+    return value.rsplit('|', 1)[-1].strip()
+
+
+def parse_socket(value):
+    """'AMD Socket | Socket AM5' -> 'AM5', 'Intel Socket | LGA 1700' -> 'LGA1700'."""
+    if not value or ',' in value:
+        return ""  # listas de sockets (coolers) no son un socket unico
+    socket = re.sub(r'\(.*?\)', '', _last_segment(value))
+    return socket.upper().replace("SOCKET", "").replace(" ", "")
+
+
+def parse_ddr_mask(value):
+    """'DDR5,DDR4' -> bits (1 << 4) | (1 << 5). LPDDR no cuenta (soldada)."""
+    mask = 0
+    for gen in DDR_RE.findall(value or ""):
+        mask |= 1 << int(gen)
+    return mask
+
+
+def parse_watts(value):
+    """'65W' -> 65, '750 W – 849 W | 750 W' -> 750, '501 – 800 W' -> 501."""
+    match = NUMBER_RE.search(_last_segment(value or ""))
+    return int(float(match.group(1))) if match else 0
+
+
+def parse_size_gb(value):
+    """'8 GB GDDR6' -> 8, '1 TB - 5 TB | 2 TB' -> 2000."""
+    match = SIZE_RE.search(_last_segment(value or ""))
+    if not match:
+        return 0
+    size = float(match.group(1))
+    return int(size * 1000) if match.group(2).upper() == "TB" else int(size)
+
+
+def parse_form_factor_mask(value):
+    """'ATX, E-ATX, Micro-ATX' -> bits de FORM_FACTORS; 'Micro ATX (Back Connect)' -> Micro-ATX."""
+    mask = 0
+    for part in (value or "").split(','):
+        text = part.strip().lower().replace(' ', '-')
+        if not text:
+            continue
+        if "itx" in text:
+            mask |= FORM_FACTOR_BITS["Mini-ITX"]
+        elif "micro" in text or "matx" in text:
+            mask |= FORM_FACTOR_BITS["Micro-ATX"]
+        elif "e-atx" in text or "eatx" in text or "ceb" in text or "eeb" in text:
+            mask |= FORM_FACTOR_BITS["E-ATX"]
+        elif "atx" in text:
+            mask |= FORM_FACTOR_BITS["ATX"]
+    return mask
+
+
+def extract_attributes(blob):
+    """Atributos tipados de un campo 's' del catalogo."""
+    fields = parse_spec_blob(blob)
+    watts = next((parse_watts(fields[k]) for k in WATTS_KEYS if k in fields), 0)
+    capacity = next((parse_size_gb(fields[k]) for k in CAPACITY_KEYS if k in fields), 0)
+    return {
+        "socket": parse_socket(fields.get(SOCKET_KEY, "")),
+        "ddr_mask": parse_ddr_mask(fields.get(RAM_TYPE_KEY, "")),
+        "watts": watts,
+        "vram_gb": parse_size_gb(fields.get(VRAM_KEY, "")),
+        "capacity_gb": capacity,
+        "form_factor_mask": parse_form_factor_mask(fields.get(FORM_FACTOR_KEY, "")),
+    }
+
+
+class SpecColumns:
+    """
+    Columnas tipadas alineadas con las filas de CatalogIndex:
+    - socket_codes -> sockets[code] ('' = sin socket)
+    - ddr_masks, watts, vram_gb, capacity_gb, form_factor_masks
+    """
+
+    def __init__(self, columns):
+        self.sockets = list(columns["sockets"])
+        self.socket_codes = array('B', columns["socket_codes"])
+        self.ddr_masks = array('B', columns["ddr_masks"])
+        self.watts = array('H', columns["watts"])
+        self.vram_gb = array('H', columns["vram_gb"])
+        self.capacity_gb = array('I', columns["capacity_gb"])
+        self.form_factor_masks = array('B', columns["form_factor_masks"])
+        self._socket_code = {s: i for i, s in enumerate(self.sockets)}
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        sockets = [""]
+        socket_code = {"": 0}
+        columns = {
+            "socket_codes": [], "ddr_masks": [], "watts": [], "vram_gb": [],
+            "capacity_gb": [], "form_factor_masks": [],
+        }
+        for blob in catalog.specs:
+            attrs = extract_attributes(blob)
+            if attrs["socket"] not in socket_code:
+                socket_code[attrs["socket"]] = len(sockets)
+                sockets.append(attrs["socket"])
+            columns["socket_codes"].append(socket_code[attrs["socket"]])
+            columns["ddr_masks"].append(attrs["ddr_mask"])
+            columns["watts"].append(min(attrs["watts"], 0xFFFF))
+            columns["vram_gb"].append(min(attrs["vram_gb"], 0xFFFF))
+            columns["capacity_gb"].append(attrs["capacity_gb"])
+            columns["form_factor_masks"].append(attrs["form_factor_mask"])
+        columns["sockets"] = sockets
+        return cls(columns)
+
+    def to_dict(self):
+        return {
+            "sockets": self.sockets,
+            "socket_codes": list(self.socket_codes),
+            "ddr_masks": list(self.ddr_masks),
+            "watts": list(self.watts),
+            "vram_gb": list(self.vram_gb),
+            "capacity_gb": list(self.capacity_gb),
+            "form_factor_masks": list(self.form_factor_masks),
+        }
+
+    def socket(self, row):
+        return self.sockets[self.socket_codes[row]]
+
+    def socket_code(self, socket):
+        return self._socket_code.get(socket, -1)
+
+    def rows_with_socket(self, rows, socket):
+        code = self.socket_code(socket)
+        return [r for r in rows if self.socket_codes[r] == code]
+
+    def rows_with_ddr(self, rows, ddr_mask):
+        return [r for r in rows if self.ddr_masks[r] & ddr_mask]
+
+
+def load_spec_columns(catalog, catalog_path=CATALOG_PATH):
+    """
+    Lee las columnas precalculadas junto al catalogo. Si no existen o el hash
+    del catalogo cambio, las recalcula y reescribe el archivo.
+    """
+    cache_path = specs_cache_path(catalog_path)
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if (cached.get("version") == SPECS_CACHE_VERSION
+                    and cached.get("catalog_hash") == catalog.content_hash
+                    and len(cached["columns"]["watts"]) == len(catalog)):
+                return SpecColumns(cached["columns"])
+        except (ValueError, KeyError, OSError):
+            pass  # archivo corrupto: se regenera
+
+    columns = SpecColumns.from_catalog(catalog)
+    try:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": SPECS_CACHE_VERSION,
+                "catalog_hash": catalog.content_hash,
+                "columns": columns.to_dict(),
+            }, f, separators=(',', ':'))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # sin permisos de escritura: se usa la version en memoria
+    return columns
+
+
+_columns = {}
+_columns_lock = threading.Lock()
+
+
+def get_spec_columns(catalog, catalog_path=CATALOG_PATH):
+    """Columnas compartidas por proceso, una por version (hash) del catalogo."""
+    if catalog is None:
+        return None
+    key = catalog.content_hash
+    if key not in _columns:
+        with _columns_lock:
+            if key not in _columns:
+                _columns[key] = load_spec_columns(catalog, catalog_path)
+    return _columns[key]
+
+
+def rekey_spec_columns(old_catalog, new_catalog, reuse):
+    """
+    Recarga del catalogo: libera las columnas de la version anterior y, si
+    las filas y sus specs no cambiaron (reuse), las reutiliza para la nueva.
+    """
+    with _columns_lock:
+        columns = _columns.pop(old_catalog.content_hash, None)
+        if reuse and columns is not None:
+            _columns[new_catalog.content_hash] = columns
@@ -0,0 +1,111 @@
+import os
+import json
+import asyncio
+import threading
+
+# --- CONSTANTES ---
+# Cantidad de generaciones en paralelo por intento (1 = modo secuencial clasico)
+SPECULATIVE_CANDIDATES = int(os.getenv("KIWI_SPECULATIVE_K", "1"))
+# Segundos entre el lanzamiento de cada candidato (0 = todos a la vez)
+HEDGE_DELAY = float(os.getenv("KIWI_HEDGE_DELAY", "0"))
+# Maximo de llamadas simultaneas al modelo por carrera
+MAX_CONCURRENT_CALLS = int(os.getenv("KIWI_MAX_CONCURRENT_CALLS", "4"))
+# Temperatura por candidato: el primero replica la configuracion normal
+CANDIDATE_TEMPERATURES = (0.1, 0.3, 0.5, 0.7, 0.9)
+
+
+class RaceResult:
+    """Resultado de una carrera: data del ganador, historial de su chat y estado."""
+
+    def __init__(self, data, history, is_valid, errors, details, attempts):
+        self.data = data
+        self.history = history
+        self.is_valid = is_valid
+        self.errors = errors
+        self.details = details
+        self.attempts = attempts
+
+
+async def race_quotes(client, model_id, config, history, prompt, accept,
+                      candidates=SPECULATIVE_CANDIDATES, hedge_delay=HEDGE_DELAY,
+                      max_concurrent=MAX_CONCURRENT_CALLS):
+    """
+    Lanza varias generaciones independientes (mismo historial, distinta
+    temperatura) con el cliente async de google-genai. Cada respuesta pasa por
+    accept(data) -> (es_valida, errores, detalles) apenas llega; la primera
+    valida gana y el resto se cancela.
+
+    Si ninguna es valida retorna la primera que llego (para feedback/advertencias).
+    Si todas fallan (JSON invalido, error de red) relanza el ultimo error.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrent))
+
+    async def generate(i):
+        if i and hedge_delay:
+            await asyncio.sleep(hedge_delay * i)
+        temperature = CANDIDATE_TEMPERATURES[i % len(CANDIDATE_TEMPERATURES)]
+        async with semaphore:
+            chat = client.aio.chats.create(
+                model=model_id,
+                config=config.model_copy(update={"temperature": temperature}),
+                history=list(history)
+            )
+            response = await chat.send_message(prompt)
+        return json.loads(response.text), chat
+
+    tasks = [asyncio.create_task(generate(i)) for i in range(max(1, candidates))]
+    fallback = None
+    last_error = None
+    attempts = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                data, chat = await next_done
+            except Exception as e:
+                last_error = e
+                continue
+            attempts += 1
+            is_valid, errors, details = accept(data)
+            if is_valid:
+                return RaceResult(data, chat.get_history(), True, errors, details, attempts)
+            if fallback is None:
+                fallback = RaceResult(data, chat.get_history(), False, errors, details, attempts)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if fallback is not None:
+        fallback.attempts = attempts
+        return fallback
+    raise last_error
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    """
+    Loop de eventos persistente en un hilo daemon. El cliente aio de google-genai
+    abre su sesion HTTP atada al loop donde se uso por primera vez: un
+    asyncio.run() por intento la dejaria apuntando a un loop ya cerrado.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="kiwi-race-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def run_race(client, model_id, config, history, prompt, accept, **kwargs):
+    """race_quotes desde codigo sync: corre en el loop persistente y conserva el aviso de cola del hilo que llama."""
+    from llm_client import current_listener, queue_listener  # llm_client -> telemetry -> engine -> speculative
+    on_wait = current_listener()
+
+    async def race():
+        with queue_listener(on_wait):
+            return await race_quotes(client, model_id, config, history, prompt, accept, **kwargs)
+
+    return asyncio.run_coroutine_threadsafe(race(), get_loop()).result()
@@ -0,0 +1,149 @@
+import os
+import json
+
+# --- CONSTANTES ---
+STREAMING_ENABLED = os.getenv("KIWI_STREAMING", "1") == "1"
+
+WHITESPACE = ' \t\r\n'
+
+
+class IncrementalJSONParser:
+    """
+    Parser incremental de JSON: recibe el texto por fragmentos y emite cada
+    valor apenas se cierra, junto con su ruta dentro del documento.
+
+    Ej: '{"quotes":[{"components":[{"name":"RTX"...}' emite
+    (("quotes", 0, "components", 0), {...}) en cuanto cierra ese objeto,
+    sin esperar al resto de la respuesta.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        # Frame por contenedor abierto: [tipo '{' o '[', inicio, clave, indice, esperando_clave]
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.scalar_start = None
+        self.root = None
+
+    def _path(self):
+        return tuple(f[2] if f[0] == '{' else f[3] for f in self.stack)
+
+    def _emit(self, start, end, events):
+        """Cierra el valor buffer[start:end] en la ruta actual."""
+        frame = self.stack[-1] if self.stack else None
+        if frame is not None and frame[0] == '{' and frame[4]:
+            frame[2] = json.loads(self.buffer[start:end])  # era una clave
+            frame[4] = False
+            return
+        value = json.loads(self.buffer[start:end])
+        if frame is None:
+            self.root = value
+        events.append((self._path(), value))
+
+    def feed(self, text):
+        """
+        Agrega un fragmento. Retorna lista de (ruta, valor) completados.
+        Lanza ValueError si el JSON es invalido.
+        """
+        self.buffer += text
+        buf = self.buffer
+        events = []
+        i = self.pos
+        while i < len(buf):
+            ch = buf[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    self._emit(self.string_start, i + 1, events)
+                i += 1
+                continue
+
+            if self.scalar_start is not None:
+                if ch not in ',}]' + WHITESPACE:
+                    i += 1
+                    continue
+                self._emit(self.scalar_start, i, events)
+                self.scalar_start = None
+
+            if ch not in ',:}]' + WHITESPACE and self.stack and self.stack[-1][0] == '[':
+                self.stack[-1][3] += 1  # empieza un nuevo elemento del array
+
+            if ch == '"':
+                self.in_string = True
+                self.string_start = i
+            elif ch in '{[':
+                self.stack.append([ch, i, None, -1, ch == '{'])
+            elif ch in '}]':
+                frame = self.stack.pop()
+                self._emit(frame[1], i + 1, events)
+            elif ch == ',':
+                if self.stack and self.stack[-1][0] == '{':
+                    self.stack[-1][4] = True
+            elif ch not in ':' + WHITESPACE:
+                self.scalar_start = i
+            i += 1
+        self.pos = i
+        return events
+
+    def result(self):
+        """Documento completo (None si aun no cerro)."""
+        if self.root is None and self.scalar_start is not None and not self.stack:
+            return json.loads(self.buffer[self.scalar_start:])
+        return self.root
+
+
+def is_component_path(path):
+    """("quotes", i, "components", j)"""
+    return len(path) == 4 and path[0] == "quotes" and path[2] == "components"
+
+
+def is_quote_path(path):
+    """("quotes", i)"""
+    return len(path) == 2 and path[0] == "quotes"
+
+
+class StreamResult:
+    def __init__(self, data, text, aborted_errors, usage=None):
+        self.data = data
+        self.text = text
+        self.aborted_errors = aborted_errors
+        self.usage = usage  # usage_metadata del ultimo chunk recibido
+
+
+def stream_response(chat_session, prompt, on_value):
+    """
+    Envia el mensaje con send_message_stream y parsea el JSON a medida que llega.
+    on_value(ruta, valor) se llama por cada valor cerrado; si retorna una lista
+    de errores no vacia se corta el stream (la cotizacion ya no puede pasar).
+
+    Retorna StreamResult: data completa (None si se aborto), texto recibido y
+    errores que causaron el corte.
+    """
+    parser = IncrementalJSONParser()
+    usage = None
+    stream = chat_session.send_message_stream(prompt)
+    try:
+        for chunk in stream:
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if not chunk.text:
+                continue
+            for path, value in parser.feed(chunk.text):
+                errors = on_value(path, value)
+                if errors:
+                    return StreamResult(None, parser.buffer, errors, usage)
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()  # corta la conexion si se aborto antes de terminar
+
+    data = parser.result()
+    if data is None:
+        raise json.JSONDecodeError("Respuesta incompleta del modelo", parser.buffer, len(parser.buffer))
+    return StreamResult(data, parser.buffer, [], usage)
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from engine import StageTimer
+
+# --- CONSTANTES ---
+# Archivo JSONL de trazas; opt-in (vacio = sin archivo, solo metricas en memoria)
+TRACE_PATH = os.getenv("KIWI_TRACE_PATH", "")
+TRACE_MAX_BYTES = int(os.getenv("KIWI_TRACE_MAX_BYTES", str(20 * 1024 * 1024)))
+TRACE_BACKUPS = int(os.getenv("KIWI_TRACE_BACKUPS", "5"))
+# Puerto del endpoint /metrics en formato Prometheus (0 = desactivado)
+METRICS_PORT = int(os.getenv("KIWI_METRICS_PORT", "0"))
+# Limites de los histogramas de latencia (segundos)
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40)
+TOKEN_KINDS = ("prompt", "cached", "output")
+
+
+class Metrics:
+    """Contadores e histogramas del proceso, exportables en texto Prometheus."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counters = {}  # (nombre, etiquetas) -> valor
+        self.histograms = {}  # (nombre, etiquetas) -> [conteos por bucket, suma, total]
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def render(self):
+        """Texto de exposicion Prometheus (version 0.0.4)."""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), (counts, total, count) in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+METRICS = Metrics()
+
+_trace_logger = None
+_trace_lock = threading.Lock()
+
+
+def get_trace_logger(path=TRACE_PATH):
+    """Logger JSONL con rotacion por tamano (None si TRACE_PATH esta vacio)."""
+    global _trace_logger
+    if not path:
+        return None
+    if _trace_logger is None:
+        with _trace_lock:
+            if _trace_logger is None:
+                logger = logging.getLogger("kiwi.traces")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                handler = RotatingFileHandler(
+                    path, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS, encoding='utf-8'
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                _trace_logger = logger
+    return _trace_logger
+
+
+class TurnTrace(StageTimer):
+    """
+    Traza de un turno del chat: cada stage() del engine queda como span con su
+    duracion y atributos (tokens de usage_metadata, reglas de validacion que
+    fallaron). finish() escribe la linea JSONL y actualiza las metricas.
+    """
+
+    def __init__(self, **attrs):
+        super().__init__()
+        self.trace_id = uuid.uuid4().hex
+        self.attrs = attrs
+        self.started = time.time()
+        self.spans = []
+
+    def _record(self, name, duration, attrs):
+        super()._record(name, duration, attrs)
+        self.spans.append({
+            "name": name,
+            "start": round(time.time() - duration - self.started, 6),
+            "duration_ms": round(duration * 1000, 3),
+            **attrs,
+        })
+
+    def finish(self, outcome, attempts=0, error=None, metrics=METRICS):
+        duration = time.time() - self.started
+        tokens = {kind: 0 for kind in TOKEN_KINDS}
+        for span in self.spans:
+            metrics.observe("kiwi_stage_seconds", span["duration_ms"] / 1000, stage=span["name"])
+            for kind in TOKEN_KINDS:
+                tokens[kind] += span.get(f"{kind}_tokens", 0)
+            for rule in span.get("rules", ()):
+                metrics.inc("kiwi_validation_failures_total", rule=rule)
+
+        metrics.observe("kiwi_turn_seconds", duration, outcome=outcome)
+        metrics.inc("kiwi_turns_total", outcome=outcome)
+        metrics.inc("kiwi_llm_attempts_total", attempts)
+        metrics.inc("kiwi_retries_total", max(0, attempts - 1))
+        for kind, count in tokens.items():
+            metrics.inc("kiwi_tokens_total", count, kind=kind)
+
+        logger = get_trace_logger()
+        if logger is not None:
+            record = {
+                "trace_id": self.trace_id,
+                "ts": self.started,
+                "outcome": outcome,
+                "attempts": attempts,
+                "duration_ms": round(duration * 1000, 3),
+                "tokens": tokens,
+                **self.attrs,
+                "spans": self.spans,
+            }
+            if error:
+                record["error"] = error
+            logger.info(json.dumps(record, ensure_ascii=False, default=str))
+        return tokens
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # sin ruido en la consola de Streamlit
+
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """Expone /metrics para un scraper local en un hilo daemon. None si port es 0."""
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
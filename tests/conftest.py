@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from catalog import CATALOG_PATH, load_catalog_index
+
+
+@pytest.fixture(scope="session")
+def catalog():
+    """Indice del catalogo real del repo (sin escribir el snapshot)."""
+    return load_catalog_index(os.path.join(ROOT, CATALOG_PATH), use_snapshot=False)
+
+
+def component(catalog, row, **overrides):
+    """Componente cotizado tal como lo devuelve el modelo para una fila del catalogo."""
+    item = catalog.item(row)
+    return dict({"name": item["n"], "price": item["p"], "url": item["l"]}, **overrides)
@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+import pytest
+
+from batch_validation import NO_ROW, catalog_builds, validate_build_lists, validate_builds
+from solver import PC_TYPE_SLOTS, slot_candidates, solve_builds
+from validation import validate_build
+from test_validation import BUILD
+
+
+def _assert_parity(budget, batch, catalog):
+    for i in range(len(batch)):
+        valid, errors, _ = validate_build(budget, batch.components(i), catalog)
+        assert bool(batch.valid[i]) == valid, (i, errors)
+        assert int(batch.error_counts[i]) == len(errors), (i, errors)
+
+
+def test_name_only_builds_match_scalar():
+    over = [dict(item) for item in BUILD]
+    over[0]["price"] = 2500
+    weak = [dict(item) for item in BUILD]
+    weak[0]["price"], weak[1]["price"] = 1100, 1200
+    no_gpu = BUILD[1:]
+    builds = [BUILD, over, weak, no_gpu, []]
+    batch = validate_build_lists(3000, builds)
+    assert batch.valid.tolist() == [True, False, False, False, False]
+    _assert_parity(3000, batch, None)
+    assert batch.explain(2) == validate_build(3000, weak)
+
+
+def test_catalog_builds_match_scalar(catalog):
+    # Como bench.py --validate-batch: builds del solver con un componente cambiado al azar
+    budget = 6000
+    candidates = slot_candidates(catalog)
+    base = [b["components"] for pc_type in PC_TYPE_SLOTS for b in solve_builds(budget, pc_type, catalog)]
+    assert base
+    rng = random.Random(0)
+    rows = np.full((200, max(len(c) for c in base)), NO_ROW, dtype=np.int64)
+    for i in range(len(rows)):
+        components = base[i % len(base)]
+        for j, item in enumerate(components):
+            rows[i, j] = catalog.find_component(item)
+        if i >= len(base):
+            j = rng.randrange(len(components))
+            slot_rows = candidates[catalog.slot(int(rows[i, j]))][1]
+            rows[i, j] = slot_rows[rng.randrange(len(slot_rows))]
+
+    batch = validate_builds(budget, *catalog_builds(rows, catalog), catalog=catalog)
+    assert batch.valid[:len(base)].all()
+    assert not batch.valid.all()
+    _assert_parity(budget, batch, catalog)
+
+
+@pytest.mark.parametrize("budget", [3000, 12000])
+def test_quoted_builds_with_catalog_match_scalar(catalog, budget):
+    builds = [b["components"] for b in solve_builds(budget, "Solo Torre", catalog)]
+    wrong_price = [dict(item) for item in builds[0]]
+    wrong_price[0]["price"] *= 0.5
+    unknown = [dict(item) for item in builds[0]]
+    unknown[1] = dict(unknown[1], id=10 ** 9, url=None)
+    batch = validate_build_lists(budget, builds + [wrong_price, unknown], catalog)
+    assert not batch.valid[-2] and not batch.valid[-1]
+    _assert_parity(budget, batch, catalog)
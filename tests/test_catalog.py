@@ -0,0 +1,56 @@
+from catalog import PRICE_TOLERANCE, CatalogIndex, url_slug
+
+from conftest import component
+
+ITEMS = [
+    {"id": 1, "c": "GPU / PLACA DE VIDEO", "n": "RTX 4060", "p": 1200.0, "s": "",
+     "l": "https://kiwigeekperu.com/product/rtx-4060/"},
+    {"id": 2, "c": "GPU / PLACA DE VIDEO", "n": "RTX 4070", "p": 2500.0, "s": "",
+     "l": "https://kiwigeekperu.com/product/rtx-4070/"},
+    {"id": 3, "c": "CPU / PROCESADOR (AMD)", "n": "Ryzen 5 5600", "p": 450.0, "s": "",
+     "l": "https://kiwigeekperu.com/product/ryzen-5-5600/"},
+]
+
+
+def test_url_slug_normalizes_urls():
+    assert url_slug("https://kiwigeekperu.com/product/RTX-4060/") == "rtx-4060"
+    assert url_slug("product/rtx-4060") == "rtx-4060"
+    assert url_slug("") == ""
+
+
+def test_lookup_by_id_and_url():
+    index = CatalogIndex(ITEMS)
+    assert index.get(2)["n"] == "RTX 4070"
+    assert index.by_url("https://kiwigeekperu.com/product/ryzen-5-5600")["id"] == 3
+    assert index.find_component({"id": 1}) == 0
+    assert index.find_component({"url": "https://otra.com/product/rtx-4070/"}) == 1
+    assert index.find_component({"url": "https://kiwigeekperu.com/product/no-existe/"}) is None
+
+
+def test_price_range_by_slot_is_sorted_and_bounded():
+    index = CatalogIndex(ITEMS)
+    assert [item["id"] for item in index.price_range("gpu")] == [1, 2]
+    assert [item["id"] for item in index.price_range("gpu", 1000, 2000)] == [1]
+    assert index.price_range("psu") == []
+
+
+def test_check_component_accepts_catalog_price(catalog):
+    row = catalog.price_range_rows("gpu")[0]
+    assert catalog.check_component(component(catalog, row)) is None
+    quoted = catalog.prices[row] + PRICE_TOLERANCE / 2
+    assert catalog.check_component(component(catalog, row, price=quoted)) is None
+
+
+def test_check_component_rejects_wrong_price(catalog):
+    row = catalog.price_range_rows("cpu")[0]
+    error = catalog.check_component(component(catalog, row, price=catalog.prices[row] + 50))
+    assert error.startswith("PRECIO INCORRECTO")
+
+
+def test_check_component_rejects_unknown_product(catalog):
+    error = catalog.check_component(
+        {"name": "GPU inventada", "price": 100, "url": "https://kiwigeekperu.com/product/no-existe/"}
+    )
+    assert error.startswith("PRODUCTO NO ENCONTRADO")
+    # Sin URL ni id no hay nada que verificar contra el catalogo
+    assert catalog.check_component({"name": "GPU inventada", "price": 100}) is None
@@ -0,0 +1,59 @@
+import pytest
+
+from catalog_encoding import (
+    catalog_rows, compact_specs, encode_catalog, encode_rows, is_pc_category, requested_categories
+)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("un microfono para stream", ["MICRÓFONO"]),
+    ("y una silla gamer", ["SILLAS GAMING"]),
+    # "torre", "gamer" y los numeros no piden categorias fuera de PC
+    ("torre gamer 4000", []),
+    ("solo torre", []),
+])
+def test_requested_categories(catalog, text, expected):
+    assert requested_categories(text, catalog) == expected
+
+
+def test_requested_laptops(catalog):
+    categories = requested_categories("quiero una laptop", catalog)
+    assert "LAPTOPS (GAMING)" in categories
+    assert all("LAPTOP" in category for category in categories)
+
+
+def test_encode_rows_tables_by_category(catalog):
+    rows = catalog_rows(catalog)[:40]
+    text = encode_rows(catalog, rows)
+    categories = []
+    lines_by_category = {}
+    for line in text.splitlines():
+        if line.startswith("## "):
+            categories.append(line[3:])
+            continue
+        item_id, name, price, specs = line.split("|")
+        lines_by_category.setdefault(categories[-1], []).append((int(item_id), float(price)))
+    assert categories == sorted(categories, key=catalog.categories.index)
+    encoded = [item_id for lines in lines_by_category.values() for item_id, _ in lines]
+    assert sorted(encoded) == sorted(catalog.ids[row] for row in rows)
+    for category, lines in lines_by_category.items():
+        prices = [price for _, price in lines]
+        assert prices == sorted(prices)
+        for item_id, price in lines:
+            row = catalog.find_component({"id": item_id})
+            assert catalog.category(row) == category
+            assert catalog.prices[row] == price
+
+
+def test_compact_specs_keep_quote_keys(catalog):
+    gpu = catalog.sorted_prices("gpu")[1][0]
+    specs = compact_specs(catalog, gpu)
+    assert specs.startswith("VRAM=")
+    assert "Marca=" not in specs
+
+
+def test_encode_catalog_only_pc_unless_requested(catalog):
+    text = encode_catalog(catalog)
+    headers = [line[3:] for line in text.splitlines() if line.startswith("## ")]
+    assert headers and all(is_pc_category(category) for category in headers)
+    assert "## MICRÓFONO" in encode_catalog(catalog, ["MICRÓFONO"])
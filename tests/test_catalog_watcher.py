@@ -0,0 +1,109 @@
+import json
+import os
+
+import pytest
+
+import catalog_watcher
+from catalog import CatalogIndex, get_catalog_index, set_catalog_index
+from catalog_watcher import CatalogDiff, CatalogWatcher, on_catalog_change, quote_touches
+
+ITEMS = [
+    {"id": 1, "c": "GPU / PLACA DE VIDEO", "n": "RTX 4060", "p": 1200.0, "s": "Memoria de video=8 GB",
+     "l": "https://kiwigeekperu.com/product/rtx-4060/"},
+    {"id": 2, "c": "GPU / PLACA DE VIDEO", "n": "RTX 4070", "p": 2500.0, "s": "Memoria de video=12 GB",
+     "l": "https://kiwigeekperu.com/product/rtx-4070/"},
+    {"id": 3, "c": "CPU / PROCESADOR (AMD)", "n": "Ryzen 5 5600", "p": 450.0, "s": "Socket de CPU=AM4",
+     "l": "https://kiwigeekperu.com/product/ryzen-5-5600/"},
+]
+
+
+def _edit(items, **changes):
+    """Copia de items con cambios por producto: id1={"p": 999.0} (None = retirar el producto)."""
+    result = []
+    for item in items:
+        change = changes.get(f"id{item['id']}", {})
+        if change is not None:
+            result.append({**item, **change})
+    return result
+
+
+def test_diff_of_identical_catalogs_is_empty():
+    diff = CatalogDiff(CatalogIndex(ITEMS), CatalogIndex([dict(item) for item in ITEMS]))
+    assert diff.is_empty and diff.text_unchanged
+    assert diff.affected_ids == set()
+
+
+def test_diff_tracks_prices_fields_and_ids():
+    new_items = _edit(ITEMS, id1={"p": 1100.0}, id2=None, id3={"s": "Socket de CPU=AM5"})
+    new_items.append({"id": 4, "c": "GPU / PLACA DE VIDEO", "n": "RTX 5070", "p": 3000.0, "s": "",
+                      "l": "https://kiwigeekperu.com/product/rtx-5070/"})
+    diff = CatalogDiff(CatalogIndex(ITEMS), CatalogIndex(new_items))
+    assert diff.added == [4] and diff.removed == [2]
+    assert diff.repriced == {1: (1200.0, 1100.0)}
+    assert diff.changed == {3: {"specs"}}
+    assert not diff.rows_aligned and not diff.text_unchanged
+    assert diff.affected_ids == {1, 2, 3}
+
+
+def test_price_only_change_keeps_text_indexes():
+    diff = CatalogDiff(CatalogIndex(ITEMS), CatalogIndex(_edit(ITEMS, id2={"p": 2400.0})))
+    assert not diff.is_empty
+    assert diff.text_unchanged
+    assert diff.affected_ids == {2}
+
+
+def test_quote_touches():
+    index = CatalogIndex(ITEMS)
+    data = {"quotes": [{"components": [
+        {"name": "RTX 4060", "url": "https://kiwigeekperu.com/product/rtx-4060/"},
+        {"name": "Ryzen 5 5600", "id": 3},
+    ]}]}
+    assert not quote_touches(data, index, {2})
+    assert quote_touches(data, index, {3})
+    data["quotes"][0]["components"].append({"name": "X", "url": "https://kiwigeekperu.com/product/x/"})
+    assert quote_touches(data, index, set())
+
+
+@pytest.fixture
+def catalog_file(tmp_path, monkeypatch):
+    """Catalogo chico en un directorio temporal como indice compartido del proceso."""
+    path = tmp_path / "catalogo.json"
+    path.write_text(json.dumps(ITEMS), encoding='utf-8')
+    monkeypatch.setattr(catalog_watcher, "QUOTE_CACHE_ENABLED", False)
+    monkeypatch.setattr(catalog_watcher, "_listeners", [])
+    previous = set_catalog_index(None)
+    get_catalog_index(str(path))
+    yield str(path)
+    set_catalog_index(previous)
+
+
+def test_watcher_reloads_changed_catalog(catalog_file):
+    changes = []
+    on_catalog_change(lambda old, new, diff: changes.append(diff))
+    old = get_catalog_index(catalog_file)
+    watcher = CatalogWatcher(catalog_file, interval=0)
+    assert watcher.check() is None
+
+    # Mismo contenido con otro formato: no se publica una version nueva
+    with open(catalog_file, 'w', encoding='utf-8') as f:
+        json.dump(ITEMS, f, indent=2)
+    assert watcher.check() is None
+    assert get_catalog_index(catalog_file) is old
+
+    with open(catalog_file, 'w', encoding='utf-8') as f:
+        json.dump(_edit(ITEMS, id1={"p": 999.0}), f)
+    diff = watcher.check()
+    assert diff.repriced == {1: (1200.0, 999.0)}
+    assert changes == [diff]
+    assert get_catalog_index(catalog_file).prices[0] == 999.0
+
+
+def test_watcher_keeps_catalog_on_invalid_json(catalog_file):
+    old = get_catalog_index(catalog_file)
+    watcher = CatalogWatcher(catalog_file, interval=0)
+    with open(catalog_file, 'w', encoding='utf-8') as f:
+        f.write('[{"id": 1, "c": "GPU')
+    assert watcher.check() is None
+    assert get_catalog_index(catalog_file) is old
+    # Se reintenta en la siguiente pasada
+    assert watcher.stat != (os.stat(catalog_file).st_size, os.stat(catalog_file).st_mtime_ns)
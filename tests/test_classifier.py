@@ -0,0 +1,47 @@
+import pytest
+
+from classifier import analyze_components, classify_name, component_slot
+
+from conftest import component
+
+
+@pytest.mark.parametrize("name, slot", [
+    ("Tarjeta de video RTX 4060 8GB", "gpu"),
+    ("Intel Arc B570 10GB", "gpu"),
+    ("Procesador AMD Ryzen 5 5600", "cpu"),
+    ("Intel Core i5-12400F", "cpu"),
+    # Graficos integrados: sigue siendo CPU
+    ("AMD Ryzen 5 8600G con Radeon Graphics", "cpu"),
+    ("Case ATX Mid Tower", "case"),
+    ("Gabinete Lian Li con vidrio", "case"),
+    # Empieza con otra categoria aunque nombre una GPU o CPU
+    ("Placa madre B650 para Ryzen", None),
+    ("Memoria RAM DDR5 Intel XMP", None),
+    ("Monitor gamer para RTX", None),
+    ("Fuente 750W 80 Plus Gold", None),
+])
+def test_classify_name(name, slot):
+    assert classify_name(name) == slot
+
+
+def test_catalog_category_wins_over_name(catalog):
+    motherboard = catalog.price_range_rows("motherboard")[0]
+    item = component(catalog, motherboard, name="Procesador Ryzen 7 (placa)")
+    assert classify_name(item["name"]) == "cpu"
+    assert component_slot(item, catalog) is None
+    gpu = catalog.price_range_rows("gpu")[0]
+    assert component_slot(component(catalog, gpu, name="sin nombre"), catalog) == "gpu"
+
+
+def test_analyze_components():
+    components = [
+        {"name": "RTX 4060", "price": 1500},
+        {"name": "Ryzen 5 5600", "price": "800"},
+        {"name": "Placa madre B550", "price": 350},
+        {"name": "Case ATX", "price": 120},
+    ]
+    result = analyze_components(components)
+    assert result["slots"] == ("gpu", "cpu", None, "case")
+    assert (result["gpu_price"], result["cpu_price"], result["case_price"]) == (1500, 800, 120)
+    # Memoizada: la misma cotizacion (otra copia de los dicts) no se reclasifica
+    assert analyze_components([dict(item) for item in components]) is result
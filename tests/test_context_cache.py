@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+from context_cache import ContextCacheManager
+
+
+class FakeCaches:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def list(self):
+        self.calls.append("list")
+        return []
+
+    def create(self, model=None, config=None):
+        self.calls.append("create")
+        if self.fail:
+            raise RuntimeError("400 cached content is too small")
+        return SimpleNamespace(name="cachedContents/1", expire_time=None)
+
+
+def manager(caches, contents=("catalogo",)):
+    return ContextCacheManager(SimpleNamespace(caches=caches), "m", "prompt", contents)
+
+
+def test_without_catalog_content_no_cache_is_used():
+    caches = FakeCaches()
+    cache = manager(caches, contents=())
+    assert cache.get_name() is None
+    cache.start_refresher()
+    assert cache._refresher is None
+    assert caches.calls == []
+
+
+def test_created_cache_is_reused():
+    caches = FakeCaches()
+    cache = manager(caches)
+    assert cache.get_name() == "cachedContents/1"
+    assert cache.get_name() == "cachedContents/1"
+    assert caches.calls == ["list", "create"]
+
+
+def test_failed_creation_backs_off():
+    caches = FakeCaches(fail=True)
+    cache = manager(caches)
+    with pytest.raises(RuntimeError):
+        cache.get_name()
+    assert cache.get_name() is None
+    assert cache.get_name() is None
+    assert caches.calls == ["list", "create"]
+
+    cache.retry_at = 0.0  # vencio el backoff
+    caches.fail = False
+    assert cache.get_name() == "cachedContents/1"
@@ -0,0 +1,141 @@
+import json
+from types import SimpleNamespace
+
+from engine import render_quote_markdown, run_quote_turn
+from history import make_content
+from quote_cache import QuoteCache, quote_cache_key
+from solver import solve_builds
+
+from conftest import component
+
+
+class FakeChat:
+    """Chat que responde en orden los textos de replies (compartidos por todo el cliente)."""
+
+    def __init__(self, client, history):
+        self.client = client
+        self.history = list(history or [])
+
+    def get_history(self):
+        return list(self.history)
+
+    def _reply(self, message):
+        self.client.sent.append(message)
+        text = self.client.replies.pop(0)
+        self.history += [make_content("user", message), make_content("model", text)]
+        return text
+
+    def send_message(self, message):
+        return SimpleNamespace(text=self._reply(message), usage_metadata=None)
+
+    def send_message_stream(self, message):
+        text = self._reply(message)
+        return iter([SimpleNamespace(text=text[i:i + 25], usage_metadata=None) for i in range(0, len(text), 25)])
+
+
+class FakeClient:
+    def __init__(self, replies):
+        self.replies = [r if isinstance(r, str) else json.dumps(r, ensure_ascii=False) for r in replies]
+        self.sent = []
+        self.chats = SimpleNamespace(create=lambda model=None, config=None, history=None: FakeChat(self, history))
+
+
+def turn(client, prompt, budget, pc_type, catalog, history=None, **kwargs):
+    kwargs.setdefault("streaming", False)
+    return run_quote_turn(client, "m", FakeChat(client, history), None, prompt, budget, pc_type, catalog,
+                          candidates=1, retry_delay=0, **kwargs)
+
+
+def quote_reply(components, message="Listo"):
+    return {"needs_info": False, "is_quote": True, "message": message,
+            "quotes": [{"title": "Opcion", "strategy": "s", "components": components}]}
+
+
+def test_first_quote_uses_solver_builds(catalog):
+    builds = solve_builds(6000, "Solo Torre", catalog)
+    client = FakeClient([quote_reply([])])
+    result = turn(client, "Tengo 6000 soles para solo torre", 6000, "Solo Torre", catalog)
+    assert result.is_valid and result.attempts == 1
+    assert "COTIZACIONES PRE-VALIDADAS" in client.sent[0]
+    quote = result.data["quotes"][0]
+    assert [item["url"] for item in quote["components"]] == [item["url"] for item in builds[0]["components"]]
+    if builds[0]["omitted"]:
+        assert quote["omitted"] == builds[0]["omitted"]
+        assert f"Sin {', '.join(builds[0]['omitted'])}" in result.text
+
+
+def test_follow_up_part_request_is_not_overwritten(catalog):
+    build = solve_builds(6000, "Solo Torre", catalog)[0]["components"]
+    previous = [{"name": item["name"], "price": item["price"], "url": item["url"]} for item in build]
+    history = [make_content("user", "6000 soles, solo torre"),
+               make_content("model", json.dumps(quote_reply(previous)))]
+    # El usuario cambia la GPU: la respuesta del modelo se respeta aunque difiera del solver
+    gpu = next(i for i, item in enumerate(build) if item["slot"] == "gpu")
+    current = catalog.find_component(build[gpu])
+    other = next(row for row in catalog.price_range_rows("gpu")
+                 if row != current and abs(catalog.prices[row] - catalog.prices[current]) < 300)
+    components = list(previous)
+    components[gpu] = component(catalog, other)
+    client = FakeClient([quote_reply(components)])
+    result = turn(client, "cambiame la GPU por otra", 6000, "Solo Torre", catalog, history)
+    assert "COTIZACIONES PRE-VALIDADAS" not in client.sent[0]
+    assert result.is_valid
+    assert result.data["quotes"][0]["components"][gpu]["url"] == catalog.item(other)["l"]
+
+
+def test_part_request_on_first_turn_skips_solver(catalog):
+    client = FakeClient([{"needs_info": False, "is_quote": False, "message": "ok"}])
+    turn(client, "6000 soles solo torre con una rtx 4070", 6000, "Solo Torre", catalog)
+    assert "COTIZACIONES PRE-VALIDADAS" not in client.sent[0]
+
+
+def test_budget_below_catalog_floor_is_answered_locally(catalog):
+    client = FakeClient([])
+    result = turn(client, "3500 soles, PC completa", 3500, "PC Completa", catalog)
+    assert result.local and result.attempts == 0
+    assert result.data["needs_info"]
+    assert "solo la Torre" in result.data["message"]
+
+
+def test_render_reports_omitted_slots():
+    data = quote_reply([{"name": "RTX", "price": 1000}])
+    data["quotes"][0]["omitted"] = ["case"]
+    assert "Sin case" in render_quote_markdown(data, 1000)
+
+
+def test_follow_up_question_is_not_served_from_cache(catalog):
+    cache = QuoteCache()
+    key = quote_cache_key("Tengo 6000 soles para solo torre", 6000, "Solo Torre", catalog.content_hash)
+    client = FakeClient([quote_reply([])])
+    first = turn(client, "Tengo 6000 soles para solo torre", 6000, "Solo Torre", catalog,
+                 quote_cache=cache, cache_key=key)
+    assert first.is_valid and not first.from_cache and len(cache) == 1
+
+    # Misma clave (sin palabras de uso), pero ya hay una cotizacion en la conversacion
+    question = "gracias, ¿hacen envíos a Arequipa?"
+    follow_key = quote_cache_key(question, 6000, "Solo Torre", catalog.content_hash)
+    assert follow_key == key
+    answer = {"needs_info": False, "is_quote": False, "message": "Si, enviamos a todo el Peru."}
+    client.replies.append(json.dumps(answer, ensure_ascii=False))
+    second = turn(client, question, 6000, "Solo Torre", catalog, first.chat_session.get_history(),
+                  quote_cache=cache, cache_key=follow_key)
+    assert not second.from_cache
+    assert len(client.sent) == 2
+    assert second.data["message"] == answer["message"]
+
+
+def test_streamed_component_with_fixable_url_is_grounded(catalog):
+    build = solve_builds(6000, "Solo Torre", catalog)[0]["components"]
+    components = [{"name": item["name"], "price": item["price"], "url": item["url"]} for item in build]
+    gpu = next(i for i, item in enumerate(build) if item["slot"] == "gpu")
+    real_url = components[gpu]["url"]
+    components[gpu]["url"] = real_url.rstrip('/') + "-v2"
+    assert catalog.find_component(components[gpu]) is None  # sin anclar seria PRODUCTO NO ENCONTRADO
+    client = FakeClient([quote_reply(components)])
+    progress = []
+    result = turn(client, "Tengo 6000 soles para solo torre", 6000, "Solo Torre", catalog,
+                  streaming=True, use_solver=False, on_progress=progress.append)
+    assert len(client.sent) == 1 and result.attempts == 1
+    assert result.is_valid, result.errors
+    assert result.data["quotes"][0]["components"][gpu]["url"] == real_url
+    assert progress
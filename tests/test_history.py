@@ -0,0 +1,66 @@
+import json
+from types import SimpleNamespace
+
+from history import (
+    compact_history, content_entry, history_tokens, make_content, summarize_quote_response, turn_history
+)
+
+from conftest import component
+
+
+def quote_data(catalog, title="Build"):
+    rows = [catalog.price_range_rows(slot)[0] for slot in ("gpu", "cpu")]
+    components = [component(catalog, row) for row in rows]
+    components.append({"name": "Producto fuera del catalogo", "price": 10})
+    return {"needs_info": False, "is_quote": True, "message": "m" * 1000,
+            "quotes": [{"title": title, "components": components}]}, rows
+
+
+def test_content_entry_accepts_sdk_objects_and_dicts():
+    sdk = SimpleNamespace(role="model", parts=[SimpleNamespace(text="ho"), SimpleNamespace(text=None),
+                                               SimpleNamespace(text="la")])
+    assert content_entry(sdk) == ("model", "hola")
+    assert content_entry({"parts": [{"text": "hola"}]}) == ("user", "hola")
+
+
+def test_summarize_keeps_ids_and_totals(catalog):
+    data, rows = quote_data(catalog)
+    summary = summarize_quote_response(data, catalog)
+    quote = summary["quotes"][0]
+    assert quote["ids"] == [catalog.ids[row] for row in rows] + ["Producto fuera del catalogo"]
+    assert quote["total"] == round(sum(catalog.prices[row] for row in rows) + 10, 2)
+    assert len(summary["message"]) == 240
+    question = {"needs_info": True, "is_quote": False, "message": "¿Cual es tu presupuesto?"}
+    assert summarize_quote_response(question, catalog) is question
+
+
+def test_only_latest_quote_stays_full(catalog):
+    history = []
+    for i in range(3):
+        data, _ = quote_data(catalog, f"Build {i}")
+        history = turn_history(history, f"pedido {i}", data, catalog, token_budget=10 ** 6)
+    texts = [content_entry(content)[1] for content in history]
+    assert texts[0::2] == ["pedido 0", "pedido 1", "pedido 2"]
+    assert all('"components"' not in text and '"ids"' in text for text in texts[1:4:2])
+    assert '"components"' in texts[-1]
+    # Idempotente
+    assert compact_history(history, catalog, token_budget=10 ** 6) == history
+
+
+def test_token_window_drops_oldest_turns_whole():
+    history = []
+    for i in range(10):
+        history += [make_content("user", f"pregunta {i} " + "x" * 400),
+                    make_content("model", f"respuesta {i} " + "y" * 400)]
+    compacted = compact_history(history, token_budget=600)
+    assert history_tokens(compacted) <= 600
+    assert content_entry(compacted[0])[0] == "user"
+    assert content_entry(compacted[-1])[1].startswith("respuesta 9")
+    # Siempre queda el ultimo turno aunque no quepa
+    assert len(compact_history(history, token_budget=1)) == 2
+
+
+def test_non_json_model_text_is_kept():
+    history = [make_content("user", "hola"), make_content("model", 'texto con "components" sin JSON'),
+               make_content("user", "otra"), make_content("model", json.dumps({"quotes": []}))]
+    assert compact_history(history, full_quotes=0) == history
@@ -0,0 +1,68 @@
+import pytest
+
+from intents import clarification_response, detect_pc_type, detect_use_case
+from validation import extract_budget
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("solo torre", "Solo Torre"),
+    ("Quiero las torres nomas", "Solo Torre"),
+    ("solo el cpu por favor", "Solo Torre"),
+    ("la PC completa", "PC Completa"),
+    ("Completo, con monitor", "PC Completa"),
+    ("quiero una pc gamer", None),
+    # "incompleto" no es PC Completa
+    ("me da igual si esta incompleto, 4000 soles", None),
+    # una torre de enfriamiento es un cooler, no Solo Torre
+    ("4000 soles con torre de enfriamiento liquida", None),
+    ("una torre de refrigeración para el i7", None),
+    ("la torre con torre de enfriamiento", "Solo Torre"),
+])
+def test_detect_pc_type(text, expected):
+    assert detect_pc_type(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("para jugar warzone", "gaming"),
+    ("gaming y stream en twitch", "streaming"),
+    ("edición de video en 4k", "workstation"),
+    ("para la oficina", None),
+])
+def test_detect_use_case(text, expected):
+    assert detect_use_case(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "me da igual si esta incompleto, 4000 soles",
+    "4000 soles con torre de enfriamiento liquida",
+])
+def test_budget_without_pc_type_asks_for_type(text):
+    budget = extract_budget(text)
+    assert budget == 4000
+    response = clarification_response(text, budget, detect_pc_type(text))
+    assert response["needs_info"] and not response["is_quote"]
+    assert "S/ 4,000" in response["message"]
+    assert "solo la Torre o la PC Completa" in response["message"]
+
+
+def test_clarification_response():
+    assert clarification_response("hola", None, None)["message"].startswith("Para cotizar necesito")
+    assert "presupuesto" in clarification_response("solo torre", None, "Solo Torre")["message"]
+    # Con ambos datos, o sin pedido de cotizacion, responde el modelo
+    assert clarification_response("solo torre, 4000 soles", 4000, "Solo Torre") is None
+    assert clarification_response("¿que tal el clima?", None, None) is None
+
+
+@pytest.mark.parametrize("text", [
+    "gracias, ¿hacen envíos a Arequipa?",
+    "¿cuánto tiempo de garantía tienen?",
+    "¿aceptan tarjeta?",
+])
+def test_unrelated_question_with_known_budget_goes_to_model(text):
+    assert clarification_response(text, 4000, None) is None
+    assert clarification_response(text, None, "Solo Torre") is None
+
+
+def test_quote_follow_up_with_known_budget_still_asks_for_type():
+    assert "solo la Torre" in clarification_response("para jugar", 4000, None)["message"]
+    assert "presupuesto" in clarification_response("quiero cotizar", None, "Solo Torre")["message"]
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from llm_client import FairLimiter, Overloaded, SingleFlight, queue_listener
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timeout esperando la condicion"
+        time.sleep(0.005)
+
+
+def queued_waiter(limiter, results, name, on_wait=None):
+    def run():
+        try:
+            limiter.acquire(on_wait)
+            results.append(name)
+        except Overloaded:
+            results.append(f"{name}:overloaded")
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_fifo_order():
+    limiter = FairLimiter(max_concurrent=1, max_queue=4, timeout=2)
+    limiter.acquire()
+    results = []
+    threads = []
+    for name in ("a", "b", "c"):
+        threads.append(queued_waiter(limiter, results, name))
+        wait_until(lambda: len(limiter.queue) == len(threads))
+    for _ in threads:
+        limiter.release()
+        wait_until(lambda: limiter.active == 1)
+    for thread in threads:
+        thread.join(1)
+    assert results == ["a", "b", "c"]
+
+
+def test_queue_full_and_timeout():
+    limiter = FairLimiter(max_concurrent=1, max_queue=1, timeout=0.05)
+    limiter.acquire()
+    results = []
+    thread = queued_waiter(limiter, results, "a")
+    wait_until(lambda: len(limiter.queue) == 1)
+    with pytest.raises(Overloaded):
+        limiter.acquire()
+    thread.join(1)
+    assert results == ["a:overloaded"]
+    assert not limiter.queue
+    assert limiter.active == 1
+
+
+def test_on_wait_runs_outside_the_lock():
+    limiter = FairLimiter(max_concurrent=1, max_queue=4, timeout=2)
+    limiter.acquire()
+    positions = []
+
+    def on_wait(position):
+        # Otro hilo (el render, otro turno) debe poder usar el limiter mientras se avisa
+        probe = threading.Thread(target=lambda: positions.append((position, limiter.free_slots())))
+        probe.start()
+        probe.join(0.5)
+        limiter.release()
+
+    results = []
+    thread = queued_waiter(limiter, results, "a", on_wait)
+    thread.join(1)
+    assert results == ["a"]
+    assert positions == [(1, 0)]
+
+
+def test_on_wait_errors_do_not_break_the_queue():
+    limiter = FairLimiter(max_concurrent=1, max_queue=4, timeout=2)
+    limiter.acquire()
+
+    def on_wait(position):
+        raise RuntimeError("render roto")
+
+    results = []
+    thread = queued_waiter(limiter, results, "a", on_wait)
+    wait_until(lambda: len(limiter.queue) == 1)
+    limiter.release()
+    thread.join(1)
+    assert results == ["a"]
+    assert limiter.active == 1 and not limiter.queue
+
+
+def test_async_acquire_reports_position_from_queue_listener():
+    limiter = FairLimiter(max_concurrent=1, max_queue=4, timeout=2)
+    limiter.acquire()
+    positions = []
+    threading.Timer(0.05, limiter.release).start()
+
+    async def call():
+        return await limiter.call_async(lambda: asyncio.sleep(0, result="ok"))
+
+    with queue_listener(positions.append):
+        assert asyncio.run(call()) == "ok"
+    assert positions == [1]
+    assert limiter.active == 0
+
+
+def test_single_flight_coalesces_identical_calls():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return "respuesta"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.run("k", slow)))
+    leader.start()
+    started.wait(1)
+    follower = threading.Thread(target=lambda: results.append(flight.run("k", slow)))
+    follower.start()
+    wait_until(lambda: "k" in flight.flights)
+    time.sleep(0.02)
+    release.set()
+    leader.join(1)
+    follower.join(1)
+    assert len(calls) == 1
+    assert sorted(results) == [("respuesta", False), ("respuesta", True)]
@@ -0,0 +1,47 @@
+from matcher import ground_components, ground_response, match_component, name_features
+
+from conftest import component
+
+
+def test_name_features_include_trigrams_and_tokens():
+    features = name_features("RTX-4060 8GB")
+    assert {"#rtx", "#4060", " rt", "406"} <= features
+
+
+def test_exact_id_or_url_has_full_confidence(catalog):
+    row = catalog.price_range_rows("gpu")[0]
+    item = component(catalog, row)
+    assert match_component(item, catalog) == (row, 1.0)
+    assert match_component({"id": catalog.ids[row], "name": "x"}, catalog) == (row, 1.0)
+
+
+def test_misspelled_name_is_grounded(catalog):
+    row = catalog.price_range_rows("gpu")[-1]
+    name = catalog.names[row]
+    typo = name.replace(" ", "", 1).lower()  # palabras pegadas y otra capitalizacion
+    item = {"name": typo, "price": 1, "url": "https://kiwigeekperu.com/product/inventado/", "insight": "ok"}
+    grounded, fixed = ground_components([item], catalog)
+    assert fixed == 1
+    assert grounded[0]["name"] == name
+    assert grounded[0]["price"] == catalog.prices[row]
+    assert grounded[0]["url"] == catalog.item(row)["l"]
+    assert grounded[0]["insight"] == "ok"
+
+
+def test_low_confidence_and_wrong_slot_are_kept(catalog):
+    unknown = {"name": "Producto inventado xyz", "price": 10}
+    grounded, fixed = ground_components([unknown], catalog)
+    assert fixed == 0 and grounded == [unknown]
+
+    # Un nombre de GPU nunca se ancla a un CPU parecido
+    cpu = catalog.price_range_rows("cpu")[0]
+    as_gpu = {"name": "Tarjeta de video " + catalog.names[cpu], "price": 10}
+    row, _ = match_component(as_gpu, catalog, min_score=0.0)
+    assert row is None or catalog.slot(row) != "cpu"
+
+
+def test_ground_response_fills_url_for_ids(catalog):
+    row = catalog.price_range_rows("cpu")[0]
+    data = {"quotes": [{"components": [{"id": catalog.ids[row], "name": catalog.names[row], "price": 1}]}]}
+    assert ground_response(data, catalog) == 0
+    assert data["quotes"][0]["components"][0]["url"] == catalog.item(row)["l"]
@@ -0,0 +1,127 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from prefetch import Prefetcher, PrefetchCancelled, is_plain_answer
+
+
+def quote(pc_type):
+    return SimpleNamespace(is_valid=True, data={"is_quote": True, "pc_type": pc_type})
+
+
+class FakeLimiter:
+    def __init__(self, free):
+        self.free = free
+
+    def free_slots(self):
+        return self.free
+
+
+def wait_jobs(prefetcher, conversation_id, timeout=2.0):
+    for job in prefetcher.jobs[conversation_id].values():
+        assert job.done.wait(timeout)
+
+
+@pytest.mark.parametrize("text, plain", [
+    ("solo torre", True),
+    ("la PC completa, gracias", True),
+    ("completa, 4000 soles", True),
+    ("solo torre pero con RTX 4070", False),
+    ("completa y agrega una laptop", False),
+])
+def test_is_plain_answer(text, plain):
+    assert is_plain_answer(text) == plain
+
+
+def test_take_returns_ready_quote_and_cancels_the_other():
+    prefetcher = Prefetcher(FakeLimiter(8), reserved_slots=2)
+    assert prefetcher.schedule("c1", 4000, "h", lambda pc_type, check: quote(pc_type))
+    # Mismo presupuesto y catalogo: no se vuelve a encolar
+    assert not prefetcher.schedule("c1", 4000, "h", lambda pc_type, check: quote(pc_type))
+    wait_jobs(prefetcher, "c1")
+    other = prefetcher.jobs["c1"]["Solo Torre"]
+    assert prefetcher.take("c1", 4000, "PC Completa", "h") == {"is_quote": True, "pc_type": "PC Completa"}
+    assert other.cancelled.is_set()
+    assert "c1" not in prefetcher.jobs
+
+
+def test_take_misses_on_other_budget_or_catalog():
+    prefetcher = Prefetcher(FakeLimiter(8))
+    prefetcher.schedule("c1", 4000, "h", lambda pc_type, check: quote(pc_type))
+    wait_jobs(prefetcher, "c1")
+    assert prefetcher.take("c1", 5000, "Solo Torre", "h") is None
+    prefetcher.schedule("c2", 4000, "h", lambda pc_type, check: quote(pc_type))
+    wait_jobs(prefetcher, "c2")
+    assert prefetcher.take("c2", 4000, "Solo Torre", "otro") is None
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"limiter": FakeLimiter(2), "reserved_slots": 2},  # modelo ocupado
+    {"limiter": FakeLimiter(8), "per_minute": 0},  # limite por minuto
+])
+def test_skipped_jobs_are_not_served(kwargs):
+    calls = []
+    prefetcher = Prefetcher(**kwargs)
+    prefetcher.schedule("c1", 4000, "h", lambda pc_type, check: calls.append(pc_type) or quote(pc_type))
+    wait_jobs(prefetcher, "c1")
+    assert calls == []
+    assert prefetcher.take("c1", 4000, "Solo Torre", "h") is None
+
+
+def test_invalid_quote_is_not_served():
+    prefetcher = Prefetcher(FakeLimiter(8))
+    prefetcher.schedule("c1", 4000, "h", lambda pc_type, check: SimpleNamespace(is_valid=False, data=None))
+    wait_jobs(prefetcher, "c1")
+    assert prefetcher.take("c1", 4000, "Solo Torre", "h") is None
+
+
+def test_discard_cancels_jobs_in_flight():
+    started = threading.Barrier(3)
+    outcomes = []
+
+    def run(pc_type, check):
+        started.wait(1)
+        try:
+            while True:
+                check()
+                time.sleep(0.005)
+        except PrefetchCancelled:
+            outcomes.append(pc_type)
+            raise
+
+    prefetcher = Prefetcher(FakeLimiter(8))
+    prefetcher.schedule("c1", 4000, "h", run)
+    jobs = list(prefetcher.jobs["c1"].values())
+    started.wait(1)
+    prefetcher.discard("c1")
+    for job in jobs:
+        assert job.done.wait(1)
+        assert job.data is None
+    assert sorted(outcomes) == ["PC Completa", "Solo Torre"]
+
+
+def test_take_waits_at_most_the_bounded_wait():
+    release = threading.Event()
+
+    def run(pc_type, check):
+        release.wait(2)
+        check()
+        return quote(pc_type)
+
+    prefetcher = Prefetcher(FakeLimiter(8), wait=0.05)
+    prefetcher.schedule("c1", 4000, "h", run)
+    job = prefetcher.jobs["c1"]["Solo Torre"]
+    deadline = time.time() + 1
+    while not job.started:
+        assert time.time() < deadline
+        time.sleep(0.005)
+
+    start = time.perf_counter()
+    assert prefetcher.take("c1", 4000, "Solo Torre", "h") is None
+    assert time.perf_counter() - start < 0.5
+    # El trabajo tardio se cancela: no sigue gastando cupo del modelo
+    release.set()
+    assert job.done.wait(1)
+    assert job.cancelled.is_set() and job.data is None
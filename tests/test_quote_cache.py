@@ -0,0 +1,45 @@
+from quote_cache import QuoteCache, normalize_intent, quote_cache_key
+
+
+def test_intent_ignores_filler_words():
+    assert normalize_intent("tengo 5000 soles para PC gamer") == ("gaming",)
+    assert normalize_intent("hola, tengo 5000 soles para una PC gamer por favor") == ("gaming",)
+    assert normalize_intent("PC para editar video y jugar") == ("edicion", "gaming")
+
+
+def test_intent_without_use_case_is_generic():
+    assert normalize_intent("Tengo 5000 soles, gracias") == ()
+
+
+def test_key_buckets_budget_and_requires_pc_type():
+    key = quote_cache_key("PC gamer", 5020, "Solo Torre", "h")
+    assert key == quote_cache_key("hola, una PC gamer por favor", 4990, "Solo Torre", "h")
+    assert key != quote_cache_key("PC gamer", 5020, "PC Completa", "h")
+    assert key != quote_cache_key("PC gamer", 5020, "Solo Torre", "otro catalogo")
+    assert quote_cache_key("PC gamer", 5000, None, "h") is None
+
+
+def test_cache_returns_copies_and_evicts_lru():
+    cache = QuoteCache(max_size=2)
+    cache.put("a", {"quotes": [1]})
+    cache.put("b", {"quotes": [2]})
+    cache.get("a")["quotes"].append(99)
+    assert cache.get("a") == {"quotes": [1]}
+    cache.put("c", {"quotes": [3]})
+    assert cache.get("b") is None
+    assert cache.get("c") == {"quotes": [3]}
+
+
+def test_cache_expires_entries():
+    cache = QuoteCache(ttl=-1)
+    cache.put("a", {"quotes": []})
+    assert cache.get("a") is None
+
+
+def test_sqlite_cache_survives_restart(tmp_path):
+    path = str(tmp_path / "quotes.db")
+    key = quote_cache_key("PC gamer", 5000, "Solo Torre", "h1")
+    QuoteCache(db_path=path, catalog_hash="h1").put(key, {"quotes": [1]})
+    assert QuoteCache(db_path=path, catalog_hash="h1").get(key) == {"quotes": [1]}
+    # Otro catalogo: las entradas viejas se borran al abrir
+    assert QuoteCache(db_path=path, catalog_hash="h2").get(key) is None
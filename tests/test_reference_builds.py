@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from catalog import CATALOG_PATH, CatalogIndex
+from reference_builds import build_reference_table, get_reference_table, reference_builds
+from solver import solve_builds
+from validation import validate_build
+
+from conftest import ROOT
+
+
+@pytest.fixture(scope="module")
+def table_catalog(tmp_path_factory, catalog):
+    """Tabla chica (S/3,000 - S/3,200) construida junto a una copia del catalogo."""
+    path = str(tmp_path_factory.mktemp("refs") / "catalogo.json")
+    shutil.copy(os.path.join(ROOT, CATALOG_PATH), path)
+    recorded = os.path.join(os.path.dirname(path), "grabadas.jsonl")
+    build = solve_builds(3100, "Solo Torre", catalog)[-1]
+    invalid = [dict(item, price=1) for item in build["components"]]
+    # Valida, con precios falsos y fuera de escalon: solo cuenta la primera
+    entries = [(3100, build["components"]), (3100, invalid), (3150, build["components"])]
+    with open(recorded, 'w', encoding='utf-8') as f:
+        for budget, components in entries:
+            text = json.dumps({"quotes": [{"components": components}]})
+            f.write(json.dumps({"budget": budget, "pc_type": "Solo Torre", "text": text}) + "\n")
+    _, stats = build_reference_table(path, 3000, 3200, 100, workers=1, recorded_path=recorded)
+    return path, stats, build
+
+
+def test_table_stats(table_catalog):
+    _, stats, _ = table_catalog
+    assert stats["steps"] == 6
+    assert stats["recorded"] == 1
+
+
+def test_exact_step_matches_solver(table_catalog, catalog):
+    path, _, _ = table_catalog
+    builds = reference_builds(3000, "PC Completa", catalog, path)
+    expected = [b for b in solve_builds(3000, "PC Completa", catalog)
+                if validate_build(3000, b["components"], catalog)[0]]
+    assert [b["components"] for b in builds] == [b["components"] for b in expected]
+
+
+def test_recorded_builds_go_first(table_catalog, catalog):
+    path, _, recorded = table_catalog
+    builds = reference_builds(3100, "Solo Torre", catalog, path)
+    assert [item["id"] for item in builds[0]["components"]] == [item["id"] for item in recorded["components"]]
+
+
+def test_between_steps_revalidates(table_catalog, catalog):
+    path, _, _ = table_catalog
+    builds = reference_builds(3040, "Solo Torre", catalog, path)
+    assert builds
+    assert all(validate_build(3040, b["components"], catalog)[0] for b in builds)
+
+
+def test_lookup_misses(table_catalog, catalog):
+    path, _, _ = table_catalog
+    assert reference_builds(5000, "Solo Torre", catalog, path) == []
+    assert reference_builds(None, "Solo Torre", catalog, path) == []
+    assert reference_builds(3000, "Solo Torre", CatalogIndex([], "otro"), path) == []
+    assert get_reference_table(os.path.join(os.path.dirname(path), "no_existe.json")) is None
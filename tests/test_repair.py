@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from repair import repair_build, repair_response
+from solver import solve_builds
+from validation import validate_build
+
+from conftest import component
+
+BUDGET = 6000
+
+
+@pytest.fixture
+def build(catalog):
+    return solve_builds(BUDGET, "PC Completa", catalog)[0]["components"]
+
+
+def _index(catalog, components, slot):
+    return next(i for i, item in enumerate(components) if catalog.slot(catalog.find_component(item)) == slot)
+
+
+def _deadline():
+    # Holgado: el test verifica la busqueda, no el presupuesto de 10 ms
+    return time.perf_counter() + 2
+
+
+def test_wrong_price_is_corrected(catalog, build):
+    broken = [dict(item) for item in build]
+    broken[0]["price"] = round(broken[0]["price"] * 0.7, 2)
+    assert not validate_build(BUDGET, broken, catalog)[0]
+    fixed = repair_build(BUDGET, broken, catalog, _deadline())
+    assert fixed is not None
+    assert validate_build(BUDGET, fixed, catalog)[0]
+    assert fixed[0]["price"] == catalog.prices[catalog.find_component(fixed[0])]
+
+
+def test_weak_gpu_is_replaced(catalog, build):
+    gpu = _index(catalog, build, "gpu")
+    broken = [dict(item) for item in build]
+    broken[gpu] = component(catalog, catalog.price_range_rows("gpu")[0])
+    valid, errors, _ = validate_build(BUDGET, broken, catalog)
+    assert not valid and any(error.startswith("DESBALANCE CRITICO") for error in errors)
+    fixed = repair_build(BUDGET, broken, catalog, _deadline())
+    assert fixed is not None
+    assert validate_build(BUDGET, fixed, catalog)[0]
+    assert fixed[gpu]["price"] > broken[gpu]["price"]
+
+
+def test_unknown_product_is_not_repaired(catalog, build):
+    broken = [dict(item) for item in build]
+    broken[0] = dict(broken[0], id=None, url="https://kiwigeekperu.com/product/no-existe/")
+    assert repair_build(BUDGET, broken, catalog, _deadline()) is None
+    assert repair_build(BUDGET, build, None) is None
+    assert repair_build(None, build, catalog) is None
+
+
+def test_repair_response(catalog, build):
+    broken = [dict(item) for item in build]
+    broken[0]["price"] = round(broken[0]["price"] * 0.7, 2)
+    valid_quote = {"title": "A", "components": build}
+    data = {"quotes": [valid_quote, {"title": "B", "components": broken}]}
+    quotes = repair_response(data, BUDGET, catalog, time_budget=2)
+    assert quotes[0] is valid_quote
+    assert quotes[1]["title"] == "B"
+    assert validate_build(BUDGET, quotes[1]["components"], catalog)[0]
+
+    unknown = [dict(broken[0], id=None, url="https://kiwigeekperu.com/product/no-existe/")] + broken[1:]
+    data["quotes"].append({"title": "C", "components": unknown})
+    assert repair_response(data, BUDGET, catalog, time_budget=2) is None
@@ -0,0 +1,20 @@
+from retrieval import build_catalog_slice, select_candidate_rows, tokenize
+from solver import PERIPHERAL_SLOTS
+
+
+def test_tokenize_strips_accents_and_keeps_versions():
+    assert tokenize("Refrigeración PCIe 5.0 RTX-4060") == ["refrigeracion", "pcie", "5.0", "rtx", "4060"]
+
+
+def test_tower_slice_has_no_peripherals(catalog):
+    rows = select_candidate_rows(catalog, 6000, "Solo Torre")
+    assert rows
+    assert not {catalog.slot(row) for row in rows} & set(PERIPHERAL_SLOTS)
+    assert all(catalog.prices[row] <= 6000 * 0.55 for row in rows)
+
+
+def test_slice_includes_named_products(catalog):
+    gpu = catalog.price_range_rows("gpu")[-1]
+    rows = build_catalog_slice(catalog, catalog.names[gpu], 3000, "Solo Torre")
+    assert gpu in rows
+    assert len(rows) == len(set(rows))
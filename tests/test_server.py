@@ -0,0 +1,119 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from server import QuoteServer
+
+
+class FakeService:
+    """Lo que QuoteServer usa de QuoteService, sin modelo."""
+
+    def __init__(self):
+        self.catalog = SimpleNamespace(content_hash="abcdef0123456789")
+        self.conversations = {}
+        self.warmed = []
+
+    def get_conversation(self, conversation_id=None):
+        conversation = SimpleNamespace(id=conversation_id or f"c{len(self.conversations) + 1}")
+        self.conversations[conversation.id] = conversation
+        return conversation
+
+    def warm_conversation(self, conversation_id):
+        self.warmed.append(conversation_id)
+        return True
+
+    def conversation_state(self, conversation_id):
+        if conversation_id not in self.conversations:
+            return None
+        return {"conversation_id": conversation_id, "messages": []}
+
+    def close_conversation(self, conversation_id):
+        return self.conversations.pop(conversation_id, None) is not None
+
+    async def handle_message_async(self, conversation_id, message):
+        return {"conversation_id": conversation_id, "reply": message.upper(), "error": None}
+
+
+async def request(reader, writer, method, path, payload=None, raw=None):
+    body = raw if raw is not None else json.dumps(payload).encode('utf-8') if payload is not None else b''
+    head = f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n\r\n"
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) != b'\r\n':
+        key, _, value = line.decode().partition(':')
+        headers[key.strip().lower()] = value.strip()
+    data = await reader.readexactly(int(headers["content-length"]))
+    if headers["content-type"].startswith("application/json"):
+        return status, json.loads(data)
+    return status, data.decode()
+
+
+def test_routes_over_one_keep_alive_connection():
+    service = FakeService()
+
+    async def run():
+        server = await asyncio.start_server(QuoteServer(service).handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        results = [
+            await request(reader, writer, "GET", "/healthz"),
+            await request(reader, writer, "POST", "/v1/conversations"),
+            await request(reader, writer, "POST", "/v1/conversations/c1"),
+            await request(reader, writer, "POST", "/v1/conversations/c1/messages", {"message": "hola"}),
+            await request(reader, writer, "POST", "/v1/conversations/c1/messages", {"message": " "}),
+            await request(reader, writer, "POST", "/v1/conversations/c1/messages", raw=b"{no es json"),
+            await request(reader, writer, "GET", "/v1/conversations/c1"),
+            await request(reader, writer, "DELETE", "/v1/conversations/c1"),
+            await request(reader, writer, "GET", "/v1/conversations/c1"),
+            await request(reader, writer, "PUT", "/v1/conversations/c1"),
+            await request(reader, writer, "GET", "/otra"),
+            await request(reader, writer, "GET", "/metrics"),
+        ]
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return results
+
+    results = asyncio.run(run())
+    assert results[0] == (200, {"status": "ok", "conversations": 0, "catalog": "abcdef012345"})
+    assert results[1] == (201, {"conversation_id": "c1"})
+    assert results[2] == (202, {"conversation_id": "c1", "warming": True}) and service.warmed == ["c1"]
+    assert results[3] == (200, {"conversation_id": "c1", "reply": "HOLA", "error": None})
+    assert [status for status, _ in results[4:6]] == [400, 400]
+    assert results[6][0] == 200
+    assert results[7] == (200, {"closed": True})
+    assert [status for status, _ in results[8:11]] == [404, 405, 404]
+    assert results[11][0] == 200 and isinstance(results[11][1], str)
+
+
+async def raw_request(port, data):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    writer.close()
+    return status
+
+
+def test_invalid_content_length_and_conversation_id_are_rejected():
+    service = FakeService()
+
+    async def run():
+        server = await asyncio.start_server(QuoteServer(service).handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        statuses = []
+        for length in ("abc", "-5"):
+            head = f"POST /v1/conversations/c1/messages HTTP/1.1\r\nContent-Length: {length}\r\n\r\n"
+            statuses.append(await raw_request(port, head.encode('latin-1')))
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for path in ("/v1/conversations/" + "x" * 65, "/v1/conversations/a.b", "/v1/conversations/a%2F/messages"):
+            statuses.append((await request(reader, writer, "POST", path))[0])
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return statuses
+
+    assert asyncio.run(run()) == [400] * 5
+    assert service.warmed == []
@@ -0,0 +1,59 @@
+import pytest
+
+from sessions import MemorySessionStore, SQLiteSessionStore, open_session_store
+
+STATE = {"version": 3, "budget": 4000, "pc_type": "Solo Torre",
+         "messages": [{"role": "user", "content": "¿Cuánto cuesta?"}]}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store_url(request, tmp_path):
+    return "memory" if request.param == "memory" else f"sqlite:///{tmp_path / 'sesiones.db'}"
+
+
+def test_roundtrip_and_delete(store_url):
+    store = open_session_store(store_url)
+    assert store.load("s1") is None
+    store.save("s1", STATE)
+    assert store.load("s1") == STATE
+    store.save("s1", dict(STATE, budget=5000))
+    assert store.load("s1")["budget"] == 5000
+    assert store.delete("s1")
+    assert not store.delete("s1")
+    assert store.load("s1") is None
+
+
+def test_expired_sessions_are_not_loaded(store_url):
+    store = open_session_store(store_url, ttl=-1)
+    store.save("s1", STATE)
+    assert store.load("s1") is None
+
+
+def test_sqlite_store_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "sesiones.db")
+    SQLiteSessionStore(path).save("s1", STATE)
+    # Otro proceso (otra conexion) ve la misma conversacion
+    assert SQLiteSessionStore(path).load("s1") == STATE
+
+
+def test_open_session_store_kinds(tmp_path):
+    assert isinstance(open_session_store("memory"), MemorySessionStore)
+    assert isinstance(open_session_store(""), MemorySessionStore)
+    assert isinstance(open_session_store(str(tmp_path / "x.db")), SQLiteSessionStore)
+
+
+def test_memory_store_evicts_expired_from_the_oldest(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("sessions.time.time", lambda: now[0])
+    store = MemorySessionStore(ttl=10)
+    store.save("a", STATE)
+    now[0] += 6
+    store.save("b", STATE)
+    now[0] += 2
+    store.save("a", STATE)  # vuelve al final con su hora nueva
+    now[0] += 4
+    store.save("c", STATE)
+    assert list(store.sessions) == ["b", "a", "c"]
+    now[0] += 5
+    store.save("d", STATE)
+    assert list(store.sessions) == ["a", "c", "d"]
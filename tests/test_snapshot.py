@@ -0,0 +1,64 @@
+import os
+import shutil
+from array import array
+
+import pytest
+
+from catalog import CATALOG_PATH, load_catalog_index
+from snapshot import StringColumn, read_snapshot, snapshot_path, write_snapshot
+
+from conftest import ROOT
+
+
+@pytest.fixture
+def catalog_copy(tmp_path):
+    path = tmp_path / "catalogo.json"
+    shutil.copy(os.path.join(ROOT, CATALOG_PATH), path)
+    return str(path)
+
+
+def test_write_and_read_columns(tmp_path):
+    path = str(tmp_path / "cols.snapshot")
+    write_snapshot(path, {"prices": array('d', [1.5, 2.0]), "names": ["RTX", "Ryzen ñ"]}, 2, "a" * 64, (10, 20))
+    meta, columns = read_snapshot(path)
+    assert meta["count"] == 2 and meta["content_hash"] == "a" * 64
+    assert (meta["source_size"], meta["source_mtime_ns"]) == (10, 20)
+    assert list(columns["prices"]) == [1.5, 2.0]
+    assert isinstance(columns["names"], StringColumn)
+    assert list(columns["names"]) == ["RTX", "Ryzen ñ"]
+    assert columns["names"][-1] == "Ryzen ñ"
+
+
+def test_snapshot_roundtrip_matches_json(catalog_copy, catalog):
+    built = load_catalog_index(catalog_copy)
+    assert os.path.exists(snapshot_path(catalog_copy))
+    loaded = load_catalog_index(catalog_copy)
+    assert isinstance(loaded.names, StringColumn)
+    assert loaded.content_hash == catalog.content_hash == built.content_hash
+    assert len(loaded) == len(catalog)
+    assert list(loaded.names) == list(catalog.names)
+    assert list(loaded.prices) == list(catalog.prices)
+    assert list(loaded.ids) == list(catalog.ids)
+    row = catalog.price_range_rows("gpu")[0]
+    item = catalog.item(row)
+    assert loaded.find_component({"url": item["l"]}) == row
+    assert loaded.find_component({"id": item["id"]}) == row
+    assert loaded.price_range_rows("gpu") == catalog.price_range_rows("gpu")
+
+
+def test_stale_or_corrupt_snapshot_is_rebuilt(catalog_copy, catalog):
+    load_catalog_index(catalog_copy)
+    snap = snapshot_path(catalog_copy)
+    with open(snap, 'r+b') as f:
+        f.write(b"BASURA!!")
+    assert list(load_catalog_index(catalog_copy).names) == list(catalog.names)
+    assert read_snapshot(snap)[0]["count"] == len(catalog)
+
+    # JSON modificado (otro tamano): el snapshot viejo no se usa
+    with open(catalog_copy, 'rb') as f:
+        raw = f.read()
+    with open(catalog_copy, 'wb') as f:
+        f.write(raw + b"\n")
+    reloaded = load_catalog_index(catalog_copy)
+    assert reloaded.content_hash != catalog.content_hash
+    assert read_snapshot(snap)[0]["source_size"] == len(raw) + 1
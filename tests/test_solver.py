@@ -0,0 +1,94 @@
+import pytest
+
+from solver import (
+    PC_TYPE_SLOTS, apply_solver_builds, budget_floor_response, catalog_floor, format_builds_prompt,
+    slot_candidates, solve_builds
+)
+from validation import (
+    ABSOLUTE_MAX_CASE, BUDGET_MARGIN, CASE_MAX_PERCENTAGE, CASE_MIN_PERCENTAGE, validate_build
+)
+
+
+@pytest.mark.parametrize("budget, pc_type", [
+    (3000, "Solo Torre"),
+    (6000, "Solo Torre"),
+    (6000, "PC Completa"),
+    (12000, "PC Completa"),
+])
+def test_solver_builds_pass_validation(catalog, budget, pc_type):
+    builds = solve_builds(budget, pc_type, catalog)
+    assert builds
+    for build in builds:
+        valid, errors, _ = validate_build(budget, build["components"], catalog)
+        assert valid, errors
+        slots = {item["slot"] for item in build["components"]}
+        assert slots == set(PC_TYPE_SLOTS[pc_type]) - set(build["omitted"])
+        assert build["total"] == pytest.approx(sum(item["price"] for item in build["components"]))
+
+
+def test_solver_returns_empty_when_budget_cannot_be_met(catalog):
+    assert solve_builds(800, "Solo Torre", catalog) == []
+    assert solve_builds(None, "Solo Torre", catalog) == []
+    assert solve_builds(6000, "Solo Torre", None) == []
+
+
+def test_apply_solver_builds_keeps_model_prose(catalog):
+    builds = solve_builds(6000, "Solo Torre", catalog)
+    gpu = next(item for item in builds[0]["components"] if item["slot"] == "gpu")
+    quotes = [{
+        "title": "Opcion Gamer",
+        "components": [{"name": "otro nombre", "price": 1, "url": gpu["url"], "insight": "Buena GPU"}],
+    }]
+    merged = apply_solver_builds(quotes, builds)
+    assert len(merged) == len(builds)
+    assert merged[0]["title"] == "Opcion Gamer"
+    assert merged[1]["title"] == "Opcion 2"
+    first = merged[0]["components"]
+    assert [item["url"] for item in first] == [item["url"] for item in builds[0]["components"]]
+    assert next(item for item in first if item["url"] == gpu["url"])["insight"] == "Buena GPU"
+
+
+def test_builds_prompt_lists_every_component(catalog):
+    builds = solve_builds(6000, "Solo Torre", catalog)
+    text = format_builds_prompt(builds, 6000, "Solo Torre")
+    assert text.count("\nBUILD ") == len(builds)
+    for item in builds[0]["components"]:
+        assert f"id {item['id']}" in text
+
+
+def _case_fits(catalog, budget):
+    lo, hi = budget * CASE_MIN_PERCENTAGE, min(budget * CASE_MAX_PERCENTAGE, ABSOLUTE_MAX_CASE)
+    return any(lo <= price <= hi for price in slot_candidates(catalog)["case"][0])
+
+
+@pytest.mark.parametrize("budget", [3000, 6000, 12000])
+def test_case_outside_band_is_reported_as_omitted(catalog, budget):
+    # En el catalogo actual ningun case cuesta <= S/ 500: la build lo omite y lo dice
+    builds = solve_builds(budget, "Solo Torre", catalog)
+    omitted = [] if _case_fits(catalog, budget) else ["case"]
+    assert builds and all(build["omitted"] == omitted for build in builds)
+    merged = apply_solver_builds([], builds)
+    assert all(quote.get("omitted", []) == omitted for quote in merged)
+    if omitted:
+        assert "(Sin case del catalogo" in format_builds_prompt(builds, budget, "Solo Torre")
+
+
+@pytest.mark.parametrize("pc_type", ["Solo Torre", "PC Completa"])
+def test_catalog_floor_matches_solver(catalog, pc_type):
+    floor = catalog_floor(pc_type, catalog)
+    below = int(floor / (1 + BUDGET_MARGIN)) - 100
+    # Por debajo del piso no hay build posible y se responde localmente
+    assert solve_builds(below, pc_type, catalog) == []
+    response = budget_floor_response(below, pc_type, catalog)
+    assert response["needs_info"] and f"S/ {floor:,.0f}" in response["message"]
+    # Con holgura sobre el piso el solver si encuentra builds
+    assert budget_floor_response(int(floor * 1.2), pc_type, catalog) is None
+
+
+def test_pc_completa_floor_suggests_tower(catalog):
+    budget = 3500
+    if catalog_floor("PC Completa", catalog) <= budget * (1 + BUDGET_MARGIN):
+        pytest.skip("el catalogo ya permite una PC Completa de S/ 3,500")
+    assert solve_builds(budget, "PC Completa", catalog) == []
+    assert solve_builds(budget, "Solo Torre", catalog)
+    assert "solo la Torre" in budget_floor_response(budget, "PC Completa", catalog)["message"]
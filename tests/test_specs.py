@@ -0,0 +1,42 @@
+from specs import (
+    FORM_FACTOR_BITS, extract_attributes, parse_ddr_mask, parse_form_factor_mask, parse_size_gb,
+    parse_socket, parse_spec_blob, parse_watts
+)
+
+
+def test_parse_spec_blob_ignores_fragments_without_value():
+    assert parse_spec_blob("Marca= MSI; sin valor; Memoria de video= 8 GB") == {
+        "Marca": "MSI", "Memoria de video": "8 GB"
+    }
+
+
+def test_parse_socket():
+    assert parse_socket("AMD Socket | Socket AM5") == "AM5"
+    assert parse_socket("Intel Socket | LGA 1700") == "LGA1700"
+    assert parse_socket("AM4, AM5, LGA 1700") == ""  # lista de un cooler
+
+
+def test_parse_ddr_mask_skips_lpddr():
+    assert parse_ddr_mask("DDR5,DDR4") == (1 << 4) | (1 << 5)
+    assert parse_ddr_mask("LPDDR5") == 0
+
+
+def test_parse_sizes_and_watts():
+    assert parse_watts("750 W – 849 W | 750 W") == 750
+    assert parse_watts("65W") == 65
+    assert parse_size_gb("1 TB - 5 TB | 2 TB") == 2000
+    assert parse_size_gb("8 GB GDDR6") == 8
+
+
+def test_parse_form_factor_mask():
+    mask = parse_form_factor_mask("ATX, E-ATX, Micro ATX (Back Connect)")
+    assert mask == FORM_FACTOR_BITS["ATX"] | FORM_FACTOR_BITS["E-ATX"] | FORM_FACTOR_BITS["Micro-ATX"]
+
+
+def test_extract_attributes_from_catalog_blob():
+    blob = ("Marca= AMD; Socket de CPU= AMD Socket | Socket AM5; Potencia de Diseño Térmico (TDP)= 65W; "
+            "Tipo de memoria RAM= DDR5")
+    attributes = extract_attributes(blob)
+    assert attributes["socket"] == "AM5"
+    assert attributes["watts"] == 65
+    assert attributes["ddr_mask"] == 1 << 5
@@ -0,0 +1,88 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from llm_client import current_listener, queue_listener
+from speculative import race_quotes, run_race
+
+
+class FakeConfig:
+    def __init__(self, temperature=0.1):
+        self.temperature = temperature
+
+    def model_copy(self, update=None):
+        return FakeConfig(**(update or {}))
+
+
+class FakeAsyncChat:
+    def __init__(self, replies, config, history):
+        self.reply = replies[config.temperature]
+        self.history = list(history)
+
+    async def send_message(self, prompt):
+        delay, payload = self.reply
+        await asyncio.sleep(delay)
+        if isinstance(payload, Exception):
+            raise payload
+        self.history.append(payload)
+        return SimpleNamespace(text=json.dumps(payload))
+
+    def get_history(self):
+        return self.history
+
+
+def fake_client(replies):
+    create = lambda model=None, config=None, history=None: FakeAsyncChat(replies, config, history)
+    return SimpleNamespace(aio=SimpleNamespace(chats=SimpleNamespace(create=create)))
+
+
+def accept(data):
+    return data["ok"], [] if data["ok"] else ["invalida"], {}
+
+
+def race(replies, candidates):
+    return asyncio.run(race_quotes(fake_client(replies), "m", FakeConfig(), [], "p", accept,
+                                   candidates=candidates, hedge_delay=0))
+
+
+def test_first_valid_candidate_wins():
+    result = race({0.1: (0.0, {"ok": False, "n": 1}), 0.3: (0.05, {"ok": True, "n": 2}),
+                   0.5: (1.0, {"ok": True, "n": 3})}, candidates=3)
+    assert result.is_valid
+    assert result.data["n"] == 2
+    assert result.history == [{"ok": True, "n": 2}]
+
+
+def test_first_arrival_is_returned_when_none_is_valid():
+    result = race({0.1: (0.05, {"ok": False, "n": 1}), 0.3: (0.0, {"ok": False, "n": 2})}, candidates=2)
+    assert not result.is_valid
+    assert result.data["n"] == 2
+    assert result.attempts == 2
+
+
+def test_error_is_raised_when_every_candidate_fails():
+    with pytest.raises(RuntimeError):
+        race({0.1: (0.0, RuntimeError("red")), 0.3: (0.0, RuntimeError("red"))}, candidates=2)
+
+
+def test_run_race_reuses_one_loop_and_keeps_queue_listener():
+    loops = []
+    listeners = []
+
+    class LoopChat(FakeAsyncChat):
+        async def send_message(self, prompt):
+            loops.append(asyncio.get_running_loop())
+            listeners.append(current_listener())
+            return await super().send_message(prompt)
+
+    create = lambda model=None, config=None, history=None: LoopChat({0.1: (0.0, {"ok": True})}, config, history)
+    client = SimpleNamespace(aio=SimpleNamespace(chats=SimpleNamespace(create=create)))
+    on_wait = lambda position: None
+    with queue_listener(on_wait):
+        first = run_race(client, "m", FakeConfig(), [], "p", accept, candidates=1)
+    second = run_race(client, "m", FakeConfig(), [], "p", accept, candidates=1)
+    assert first.is_valid and second.is_valid
+    assert loops[0] is loops[1] and not loops[0].is_closed()
+    assert listeners == [on_wait, None]
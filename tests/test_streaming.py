@@ -0,0 +1,77 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from streaming import IncrementalJSONParser, is_component_path, stream_response
+
+DOCUMENT = {
+    "is_quote": True,
+    "message": "Opciones con \"comillas\" y \\ barra",
+    "quotes": [
+        {"title": "Opcion 1", "components": [
+            {"name": "RTX 4060", "price": 1500.5, "url": "https://x/a"},
+            {"name": "Ryzen 5", "price": 800, "url": None},
+        ]},
+        {"title": "Opcion 2", "components": [{"name": "RTX 4070", "price": 2500, "ok": False}]},
+    ],
+}
+TEXT = json.dumps(DOCUMENT, ensure_ascii=False)
+
+
+def feed_chunks(text, size):
+    parser = IncrementalJSONParser()
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return parser, events
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 40, len(TEXT)])
+def test_split_chunks_rebuild_the_document(size):
+    parser, events = feed_chunks(TEXT, size)
+    assert parser.result() == DOCUMENT
+    components = [(path, value) for path, value in events if is_component_path(path)]
+    assert components == [
+        (("quotes", 0, "components", 0), DOCUMENT["quotes"][0]["components"][0]),
+        (("quotes", 0, "components", 1), DOCUMENT["quotes"][0]["components"][1]),
+        (("quotes", 1, "components", 0), DOCUMENT["quotes"][1]["components"][0]),
+    ]
+
+
+def test_values_are_emitted_as_soon_as_they_close():
+    parser = IncrementalJSONParser()
+    events = parser.feed('{"quotes":[{"title":"A","components":[{"name":"RTX","price":1}')
+    assert (("quotes", 0, "components", 0), {"name": "RTX", "price": 1}) in events
+    assert parser.result() is None
+
+
+def test_escaped_quote_split_across_chunks():
+    parser = IncrementalJSONParser()
+    parser.feed('{"message":"a\\')
+    parser.feed('"b"}')
+    assert parser.result() == {"message": 'a"b'}
+
+
+class FakeChat:
+    def __init__(self, text, size=10):
+        self.chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        self.sent = 0
+
+    def send_message_stream(self, prompt):
+        for chunk in self.chunks:
+            self.sent += 1
+            yield SimpleNamespace(text=chunk, usage_metadata=None)
+
+
+def test_stream_response_aborts_on_first_error():
+    chat = FakeChat(TEXT)
+    result = stream_response(chat, "p", lambda path, value: ["mala"] if is_component_path(path) else [])
+    assert result.data is None
+    assert result.aborted_errors == ["mala"]
+    assert chat.sent < len(chat.chunks)
+
+
+def test_stream_response_rejects_truncated_json():
+    with pytest.raises(json.JSONDecodeError):
+        stream_response(FakeChat(TEXT[:len(TEXT) // 2]), "p", lambda path, value: [])
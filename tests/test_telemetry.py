@@ -0,0 +1,32 @@
+import telemetry
+from telemetry import Metrics, TurnTrace, get_trace_logger
+
+
+def test_tracing_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert get_trace_logger("") is None
+
+    metrics = Metrics()
+    trace = TurnTrace(conversation="c1")
+    with trace.stage("llm", prompt_tokens=100, output_tokens=20):
+        pass
+    trace.finish("ok", attempts=2, metrics=metrics)
+    if not telemetry.TRACE_PATH:
+        # Sin KIWI_TRACE_PATH no se escribe nada en el directorio de trabajo
+        assert list(tmp_path.iterdir()) == []
+
+    text = metrics.render()
+    assert 'kiwi_turns_total{outcome="ok"} 1' in text
+    assert "kiwi_retries_total 1" in text
+    assert 'kiwi_tokens_total{kind="prompt"} 100' in text
+    assert 'kiwi_turn_seconds_count{outcome="ok"} 1' in text
+
+
+def test_metrics_escape_labels():
+    metrics = Metrics(buckets=(1,))
+    metrics.inc("kiwi_validation_failures_total", rule='PRECIO "MAL"\n')
+    metrics.observe("kiwi_stage_seconds", 2, stage="llm")
+    text = metrics.render()
+    assert 'rule="PRECIO \\"MAL\\"\\n"' in text
+    assert 'kiwi_stage_seconds_bucket{stage="llm",le="1"} 0' in text
+    assert 'kiwi_stage_seconds_bucket{stage="llm",le="+Inf"} 1' in text
@@ -0,0 +1,96 @@
+import pytest
+
+from solver import solve_builds
+from validation import extract_budget, validate_build, validate_response
+
+BUILD = [
+    {"name": "Tarjeta de video RTX 4060 8GB", "price": 1500},
+    {"name": "Procesador AMD Ryzen 5 5600", "price": 800},
+    {"name": "Placa madre B550", "price": 350},
+    {"name": "Memoria RAM DDR4 16GB", "price": 200},
+    {"name": "Fuente 650W 80 Plus", "price": 200},
+    {"name": "Case ATX Mid Tower", "price": 120},
+]
+
+
+@pytest.mark.parametrize("text, budget", [
+    ("S/ 6000", 6000),  # sin (?!\d) se leia S/ 600
+    ("s/6000", 6000),
+    ("S/. 6,000", 6000),
+    ("5,000 soles", 5000),
+    ("presupuesto de 5000", 5000),
+    ("mi budget: 7.500", 7500),
+    ("tengo S/ 12,500 para una torre", 12500),
+    ("Tengo 4000 soles con rtx 4060", 4000),
+])
+def test_extract_budget(text, budget):
+    assert extract_budget(text) == budget
+
+
+@pytest.mark.parametrize("text", ["quiero una rtx 4060", "100 soles", "S/ 60000", "hola"])
+def test_extract_budget_ignores_models_and_out_of_range(text):
+    assert extract_budget(text) is None
+
+
+def _rules(errors):
+    return {error.split(":")[0] for error in errors}
+
+
+def test_balanced_build_is_valid():
+    valid, errors, details = validate_build(3000, BUILD)
+    assert valid, errors
+    assert details["multiplier"] == 1500 / 800
+
+
+def test_empty_build_is_rejected():
+    valid, errors, _ = validate_build(3000, [])
+    assert not valid and errors
+
+
+def test_over_budget_is_rejected():
+    valid, errors, _ = validate_build(2500, BUILD)
+    assert not valid
+    assert "PRESUPUESTO EXCEDIDO" in _rules(errors)
+
+
+def test_weak_gpu_is_rejected():
+    build = [dict(item) for item in BUILD]
+    build[0]["price"], build[1]["price"] = 1100, 1200
+    valid, errors, _ = validate_build(3000, build)
+    assert not valid
+    assert "DESBALANCE CRITICO" in _rules(errors)
+
+
+def test_overpriced_case_is_rejected():
+    build = [dict(item) for item in BUILD]
+    build[-1]["price"] = 400
+    build[0]["price"] = 1300
+    valid, errors, _ = validate_build(3000, build)
+    assert not valid
+    assert "CASE SOBREVALORADO" in _rules(errors)
+
+
+def test_missing_gpu_is_rejected():
+    valid, errors, _ = validate_build(3000, BUILD[1:])
+    assert not valid
+    assert any("No se detecto GPU" in error for error in errors)
+
+
+def test_socket_mismatch_is_rejected(catalog):
+    build = solve_builds(6000, "Solo Torre", catalog)[0]["components"]
+    board = next(item for item in build if item["slot"] == "motherboard")
+    board_socket = "AMD" if "AMD" in catalog.category(catalog.find_component(board)) else "INTEL"
+    other = "PLACA MADRE (INTEL)" if board_socket == "AMD" else "PLACA MADRE (AMD)"
+    row = catalog.price_range_rows(other)[0]
+    swapped = [
+        {"name": catalog.names[row], "price": catalog.prices[row], "url": catalog.item(row)["l"]}
+        if item is board else item
+        for item in build
+    ]
+    valid, errors, _ = validate_build(6000, swapped, catalog)
+    assert not valid
+    assert "INCOMPATIBILIDAD DE SOCKET" in _rules(errors)
+
+
+def test_validate_response_passes_through_non_quotes():
+    assert validate_response({"is_quote": False, "message": "hola"}, 3000)[0]
@@ -0,0 +1,283 @@
+import re
+
+from compatibility import get_compatibility
+from classifier import analyze_components
+
+# --- CONSTANTES ---
+MAX_RETRIES = 3
+BUDGET_MARGIN = 0.10  # ±10%
+CASE_MIN_PERCENTAGE = 0.03  # 3%
+CASE_MAX_PERCENTAGE = 0.05  # 5%
+ABSOLUTE_MAX_CASE = 500  # S/500 limite absoluto
+
+# Errores que ningun componente adicional puede corregir (los precios solo suman)
+DEFINITIVE_ERROR_PREFIXES = (
+    "PRESUPUESTO EXCEDIDO", "CASE SOBREVALORADO", "PRECIO INCORRECTO",
+    "PRODUCTO NO ENCONTRADO", "INCOMPATIBILIDAD", "FUENTE INSUFICIENTE",
+)
+
+# Formatos de presupuesto: "presupuesto de 5000", "S/ 5000", "5,000 soles"
+BUDGET_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(?:presupuesto|budget|tengo|dispongo|cuento con)\s*(?:de|es|:)?\s*[sS]?/?\.?\s*(\d{1,3}(?:[,.]?\d{3})*)(?!\d)',
+    r'[sS]/?\.?\s*(\d{1,3}(?:[,.]?\d{3})*)(?!\d)',
+    r'(\d{1,3}(?:[,.]?\d{3})*)(?!\d)\s*(?:soles?|nuevos soles|pen)',
+))
+
+# --- FUNCIONES DE VALIDACION TECNICA ---
+
+def extract_budget(text):
+    """
+    Extrae el presupuesto numerico del mensaje del usuario.
+    Soporta formatos: "S/ 5000", "5,000 soles", "presupuesto de 5000"
+    """
+    for pattern in BUDGET_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            budget_str = match.group(1).replace(',', '').replace('.', '')
+            try:
+                budget = float(budget_str)
+                if 500 <= budget <= 50000:  # Rango razonable
+                    return budget
+            except ValueError:
+                continue
+    return None
+
+def calculate_gpu_cpu_multiplier(gpu_price, cpu_price):
+    """
+    Calcula el multiplicador M = Precio GPU / Precio CPU
+    Retorna 0 si no se puede calcular
+    """
+    if cpu_price > 0:
+        return gpu_price / cpu_price
+    return 0
+
+def get_multiplier_range(budget):
+    """
+    Retorna el rango permitido de multiplicador GPU/CPU segun el presupuesto.
+    Retorna: (min_multiplier, max_multiplier, critical_max)
+    """
+    if budget < 5000:
+        return (1.7, 2.0, 2.5)  # Gama baja: balance conservador
+    elif 5000 <= budget <= 10000:
+        return (2.2, 3.0, 4.0)  # Gama media: GPU puede ser mas fuerte
+    else:
+        return (2.5, 5.0, 6.0)  # Gama alta: GPU dominante permitida
+
+def extract_component_prices(components, catalog=None):
+    """
+    Extrae precios de GPU, CPU y Case de la lista de componentes.
+    Con catalogo la categoria sale del campo 'c'; si no, del nombre (classifier.py).
+    Retorna: dict con gpu_price, cpu_price, case_price
+    """
+    analysis = analyze_components(components, catalog)
+    return {
+        "gpu_price": analysis["gpu_price"],
+        "cpu_price": analysis["cpu_price"],
+        "case_price": analysis["case_price"]
+    }
+
+def validate_build(budget, components, catalog=None):
+    """
+    Validador matematico de hardware con reglas de ingenieria.
+    
+    Parametros:
+    - budget: Presupuesto del usuario (P)
+    - components: Lista de componentes con 'name' y 'price'
+    - catalog: CatalogIndex opcional para verificar precios/URLs reales
+      y compatibilidad tecnica (socket, RAM, fuente)
+    
+    Retorna: (es_valida: bool, errores: list, detalles: dict)
+    """
+    errors = []
+    details = {}
+    
+    if not components:
+        errors.append("No se proporcionaron componentes para validar.")
+        return False, errors, details
+    
+    # 0. VERIFICAR PRECIOS CONTRA EL CATALOGO
+    if catalog is not None:
+        catalog_errors = [
+            err for err in (catalog.check_component(item) for item in components) if err
+        ]
+        details["catalog_mismatches"] = len(catalog_errors)
+        errors.extend(catalog_errors)
+    
+    # 1. CALCULAR TOTAL
+    total = sum(float(item.get("price", 0)) for item in components)
+    details["total"] = total
+    details["budget"] = budget
+    
+    # 2. VALIDAR MARGEN DE PRESUPUESTO (±10%)
+    min_budget = budget * (1 - BUDGET_MARGIN)
+    max_budget = budget * (1 + BUDGET_MARGIN)
+    
+    if total < min_budget:
+        diff = min_budget - total
+        percentage_diff = ((min_budget - total) / budget) * 100
+        errors.append(
+            f"PRESUPUESTO SUBUTILIZADO: Faltan usar S/ {diff:.2f} ({percentage_diff:.1f}% por debajo). "
+            f"Objetivo: S/ {budget:,.0f} | Rango valido: S/ {min_budget:,.0f} - S/ {max_budget:,.0f}. "
+            f"Mejora GPU o CPU para aprovechar el presupuesto."
+        )
+    elif total > max_budget:
+        diff = total - max_budget
+        percentage_diff = ((total - max_budget) / budget) * 100
+        errors.append(
+            f"PRESUPUESTO EXCEDIDO: Te pasaste S/ {diff:.2f} ({percentage_diff:.1f}% por encima). "
+            f"Maximo permitido: S/ {max_budget:,.0f}. Reduce costos en componentes secundarios."
+        )
+    
+    # 3. EXTRAER PRECIOS DE COMPONENTES CRITICOS
+    prices = extract_component_prices(components, catalog)
+    gpu_price = prices["gpu_price"]
+    cpu_price = prices["cpu_price"]
+    case_price = prices["case_price"]
+    
+    details["gpu_price"] = gpu_price
+    details["cpu_price"] = cpu_price
+    details["case_price"] = case_price
+    
+    # 4. VALIDAR MULTIPLICADOR GPU/CPU (M)
+    if gpu_price > 0 and cpu_price > 0:
+        multiplier = calculate_gpu_cpu_multiplier(gpu_price, cpu_price)
+        details["multiplier"] = multiplier
+        
+        min_m, max_m, critical_m = get_multiplier_range(budget)
+        details["min_multiplier"] = min_m
+        details["max_multiplier"] = max_m
+        
+        if multiplier < min_m:
+            # GPU muy barata para el CPU
+            needed_gpu_price = cpu_price * min_m
+            diff = needed_gpu_price - gpu_price
+            errors.append(
+                f"DESBALANCE CRITICO: GPU muy debil. Multiplicador actual: {multiplier:.2f}x "
+                f"(Minimo requerido: {min_m}x para presupuesto S/ {budget:,.0f}). "
+                f"GPU: S/ {gpu_price:,.0f} | CPU: S/ {cpu_price:,.0f}. "
+                f"Aumenta GPU en ~S/ {diff:.0f} o reduce CPU."
+            )
+        elif multiplier > critical_m:
+            # Cuello de botella: CPU muy debil
+            needed_cpu_price = gpu_price / max_m
+            diff = needed_cpu_price - cpu_price
+            errors.append(
+                f"CUELLO DE BOTELLA: CPU insuficiente para GPU. Multiplicador: {multiplier:.2f}x "
+                f"(Maximo critico: {critical_m}x). "
+                f"GPU: S/ {gpu_price:,.0f} | CPU: S/ {cpu_price:,.0f}. "
+                f"Aumenta CPU en ~S/ {diff:.0f} o reduce GPU para evitar desperdicio."
+            )
+        elif multiplier > max_m:
+            # Advertencia: fuera de rango optimo
+            errors.append(
+                f"ADVERTENCIA: Multiplicador {multiplier:.2f}x esta sobre el optimo ({max_m}x). "
+                f"GPU: S/ {gpu_price:,.0f} | CPU: S/ {cpu_price:,.0f}. "
+                f"Considera mejorar CPU para aprovechar mejor la GPU."
+            )
+    else:
+        if gpu_price == 0:
+            errors.append("ERROR CRITICO: No se detecto GPU en la cotizacion.")
+        if cpu_price == 0:
+            errors.append("ERROR CRITICO: No se detecto CPU en la cotizacion.")
+    
+    # 5. VALIDAR PRIORIDAD DEL CASE (3-5% del presupuesto)
+    if case_price > 0:
+        case_percentage = (case_price / budget) * 100
+        details["case_percentage"] = case_percentage
+        
+        min_case_price = budget * CASE_MIN_PERCENTAGE
+        max_case_price = min(budget * CASE_MAX_PERCENTAGE, ABSOLUTE_MAX_CASE)
+        
+        if case_price > max_case_price:
+            diff = case_price - max_case_price
+            errors.append(
+                f"CASE SOBREVALORADO: Case cuesta S/ {case_price:,.0f} ({case_percentage:.1f}% del presupuesto). "
+                f"Maximo permitido: S/ {max_case_price:.0f} ({CASE_MAX_PERCENTAGE*100:.0f}% o S/ {ABSOLUTE_MAX_CASE}). "
+                f"Reduce S/ {diff:.0f} y reasigna a GPU/CPU."
+            )
+        elif case_price < min_case_price:
+            errors.append(
+                f"CASE INFRAUTILIZADO: Case muy economico (S/ {case_price:,.0f}, {case_percentage:.1f}%). "
+                f"Considera usar al menos S/ {min_case_price:.0f} ({CASE_MIN_PERCENTAGE*100:.0f}%) para mejor calidad."
+            )
+    
+    # 6. VALIDAR COMPATIBILIDAD TECNICA (socket, RAM, fuente)
+    if catalog is not None:
+        compatibility_errors = get_compatibility(catalog).check_build(components)
+        details["compatibility_errors"] = len(compatibility_errors)
+        errors.extend(compatibility_errors)
+    
+    return len(errors) == 0, errors, details
+
+def validate_response(data, budget, catalog=None):
+    """
+    Valida todas las cotizaciones de una respuesta del modelo.
+    Se aceptan sin validar: pedidos de info, respuestas que no son cotizacion
+    y cotizaciones sin presupuesto detectado.
+    
+    Retorna: (es_valida: bool, errores acumulados: list, detalles de la ultima cotizacion fallida: dict)
+    """
+    if data.get("needs_info") or not data.get("is_quote"):
+        return True, [], {}
+    if not data.get("quotes") or not budget:
+        return True, [], {}
+    
+    all_valid = True
+    accumulated_errors = []
+    last_details = {}
+    for quote in data["quotes"]:
+        is_valid, errors, details = validate_build(budget, quote.get("components", []), catalog=catalog)
+        if not is_valid:
+            all_valid = False
+            accumulated_errors.extend(errors)
+            last_details = details
+    
+    return all_valid, accumulated_errors, last_details
+
+def error_rule(error):
+    """Regla que genero el error: 'PRESUPUESTO EXCEDIDO: Te pasaste...' -> 'PRESUPUESTO EXCEDIDO'."""
+    return error.split(':', 1)[0].strip()
+
+def check_partial_build(budget, components, catalog=None):
+    """
+    Valida una cotizacion incompleta (ej. durante streaming).
+    Retorna solo los errores definitivos: los que seguiran fallando sin importar
+    que componentes lleguen despues. Lista vacia = la cotizacion aun puede pasar.
+    """
+    if not components or not budget:
+        return []
+    _, errors, _ = validate_build(budget, components, catalog=catalog)
+    return [err for err in errors if err.startswith(DEFINITIVE_ERROR_PREFIXES)]
+
+def generate_feedback_prompt(errors, details, attempt_num):
+    """
+    Genera un mensaje de feedback tecnico para la IA cuando falla la validacion.
+    """
+    feedback = f"=== VALIDACION FALLIDA (Intento {attempt_num}/{MAX_RETRIES}) ===\n\n"
+    feedback += "Debes corregir los siguientes errores tecnicos:\n\n"
+    
+    for i, error in enumerate(errors, 1):
+        feedback += f"{i}. {error}\n\n"
+    
+    feedback += "--- Diagnostico Actual ---\n"
+    feedback += f"• Total cotizado: S/ {details.get('total', 0):,.2f}\n"
+    feedback += f"• Presupuesto objetivo: S/ {details.get('budget', 0):,.2f}\n"
+    feedback += f"• GPU: S/ {details.get('gpu_price', 0):,.2f}\n"
+    feedback += f"• CPU: S/ {details.get('cpu_price', 0):,.2f}\n"
+    
+    if details.get('multiplier'):
+        feedback += f"• Multiplicador GPU/CPU: {details['multiplier']:.2f}x "
+        feedback += f"(Rango optimo: {details.get('min_multiplier', 0):.1f}x - {details.get('max_multiplier', 0):.1f}x)\n"
+    
+    if details.get('case_price'):
+        feedback += f"• Case: S/ {details.get('case_price', 0):,.2f} ({details.get('case_percentage', 0):.1f}% del presupuesto)\n"
+    
+    feedback += "\n--- INSTRUCCIONES DE CORRECCION ---\n"
+    feedback += "1. Ajusta los precios para cumplir el multiplicador GPU/CPU correcto\n"
+    feedback += "2. Mantén el total dentro del ±10% del presupuesto\n"
+    feedback += "3. Case debe ser 3-5% del presupuesto (max S/500)\n"
+    feedback += "4. Prioriza GPU > CPU > RAM > Placa > SSD > Fuente > Case\n"
+    feedback += "5. CPU y Placa con el mismo socket, RAM del tipo de la placa, Fuente >= (GPU + CPU) + 20%\n\n"
+    feedback += "Genera una nueva cotizacion corregida en formato JSON."
+    
+    return feedback